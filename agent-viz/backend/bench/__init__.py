@@ -0,0 +1,7 @@
+"""Synthetic Clawdbot sessions and ingestion/query benchmarks.
+
+Run from the backend directory:
+
+    python -m bench.generate OUT_DIR --actions 100000
+    python -m bench.run --sizes 10000,100000 --output results.json
+"""
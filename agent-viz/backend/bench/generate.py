@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Generate realistic synthetic Clawdbot session logs.
+
+Each file is a JSONL session in the format `sync_sessions` parses: session
+meta, model_change, a channel entry, a user message (or a subagent
+preamble), then turns of assistant toolCall messages, toolResult entries,
+assistant completions, follow-up user messages and the odd thinking level
+change. Session sizes and the tool mix are configurable.
+"""
+import json
+import os
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# Relative call frequency of each tool (roughly Zipf-shaped, like real usage)
+DEFAULT_TOOLS = {
+    "exec": 30, "read": 25, "write": 12, "edit": 10, "web_search": 6, "browser": 5,
+    "process": 4, "memory_search": 3, "message": 3, "sessions_spawn": 2,
+}
+MODELS = ["claude-opus-4", "claude-sonnet-4", "gpt-4.1"]
+CHANNELS = ["discord", "telegram", "webchat", "slack"]
+
+
+def parse_tools(spec: str) -> dict[str, float]:
+    """Parse a "name=weight,name=weight" tool distribution."""
+    tools = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        tools[name.strip()] = float(weight or 1)
+    return tools
+
+
+def parse_start(value: str) -> datetime:
+    """Parse an ISO 8601 start time, taking naive times as UTC."""
+    start = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+
+
+class SessionGenerator:
+    def __init__(self, seed: int = 0, tools: Optional[dict[str, float]] = None,
+                 error_rate: float = 0.03, max_parallel_calls: int = 3):
+        self.rng = random.Random(seed)
+        self.tools = tools or DEFAULT_TOOLS
+        self.error_rate = error_rate
+        self.max_parallel_calls = max_parallel_calls
+        self.spawned: list[str] = []
+        self.latest: Optional[datetime] = None
+
+    def _id(self) -> str:
+        return uuid.UUID(int=self.rng.getrandbits(128)).hex[:8]
+
+    def _text(self, words: int) -> str:
+        vocab = ["check", "the", "logs", "deploy", "fix", "build", "tests", "config", "server",
+                 "update", "readme", "please", "error", "output", "run", "file", "branch"]
+        return " ".join(self.rng.choice(vocab) for _ in range(words))
+
+    def session_entries(self, session_id: str, actions: int, started_at: datetime,
+                        subagent: bool = False) -> list[dict]:
+        """Entries for one session producing about `actions` parsed actions."""
+        t = started_at
+        model = self.rng.choice(MODELS)
+
+        def ts():
+            return t.isoformat().replace("+00:00", "Z")
+
+        entries = [
+            {"type": "session", "id": session_id, "timestamp": ts(), "cwd": "/home/agent/workspace"},
+            {"type": "model_change", "id": self._id(), "timestamp": ts(),
+             "provider": "anthropic", "modelId": model},
+            {"type": "custom", "customType": "context", "timestamp": ts(),
+             "data": {"channel": self.rng.choice(CHANNELS)}},
+        ]
+        if subagent:
+            # Half of the subagents are spawned by an earlier subagent, giving nested trees
+            child = f"agent:main:subagent:{uuid.UUID(int=self.rng.getrandbits(128))}"
+            requester = self.rng.choice(self.spawned) if self.spawned and self.rng.random() < 0.5 else "agent:main:main"
+            self.spawned.append(child)
+            text = (f"You are a **subagent** spawned for a task.\n"
+                    f"Your session: {child}\n"
+                    f"Requester session: {requester}\n"
+                    f"Label: {self._text(2)}\n")
+        else:
+            text = self._text(8)
+        entries.append({"type": "message", "id": self._id(), "timestamp": ts(),
+                        "message": {"role": "user", "content": [{"type": "text", "text": text}]}})
+        produced = 2  # model_change + user message
+
+        names = list(self.tools)
+        weights = list(self.tools.values())
+        while produced < actions:
+            t += timedelta(seconds=self.rng.uniform(0.5, 20))
+            roll = self.rng.random()
+            if roll < 0.04:
+                entries.append({"type": "thinking_level_change", "id": self._id(), "timestamp": ts(),
+                                "thinkingLevel": self.rng.choice(["low", "medium", "high"])})
+                produced += 1
+                continue
+            if roll < 0.10:
+                entries.append({"type": "message", "id": self._id(), "timestamp": ts(),
+                                "message": {"role": "user",
+                                            "content": [{"type": "text", "text": self._text(6)}]}})
+                produced += 1
+                continue
+
+            # One assistant turn: parallel tool calls, then their results
+            count = self.rng.randint(1, self.max_parallel_calls)
+            calls = []
+            while len(calls) < count:
+                name = self.rng.choices(names, weights)[0]
+                if name not in calls:  # action ids are entry id + tool name
+                    calls.append(name)
+            entries.append({"type": "message", "id": self._id(), "timestamp": ts(), "message": {
+                "role": "assistant", "stopReason": "toolUse", "model": model,
+                "content": [{"type": "toolCall", "id": self._id(), "name": name,
+                             "arguments": {"command": self._text(4)}} for name in calls]}})
+            produced += len(calls)
+            for name in calls:
+                t += timedelta(seconds=self.rng.uniform(0.1, 5))
+                entries.append({"type": "message", "id": self._id(), "timestamp": ts(),
+                                "message": {"role": "toolResult", "toolName": name,
+                                            "content": [{"type": "text", "text": self._text(20)}]},
+                                "isError": self.rng.random() < self.error_rate})
+                produced += 1
+            if self.rng.random() < 0.3:
+                tokens = self.rng.randint(200, 8000)
+                entries.append({"type": "message", "id": self._id(), "timestamp": ts(), "message": {
+                    "role": "assistant", "stopReason": "stop", "model": model,
+                    "content": [{"type": "text", "text": self._text(15)}],
+                    "usage": {"input": tokens, "output": tokens // 10, "totalTokens": tokens + tokens // 10,
+                              "cost": {"total": round(tokens * 3e-6, 6)}}}})
+                produced += 1
+        self.latest = max(self.latest or t, t)
+        return entries
+
+    def write_session(self, path: str, actions: int, started_at: datetime, subagent: bool = False) -> int:
+        """Write one session file; returns its size in bytes."""
+        session_id = os.path.basename(path)[:-len(".jsonl")]
+        entries = self.session_entries(session_id, actions, started_at, subagent)
+        with open(path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        return os.path.getsize(path)
+
+
+def generate_corpus(out_dir: str, total_actions: int, mean_session_actions: int = 300,
+                    subagent_ratio: float = 0.15, seed: int = 0,
+                    tools: Optional[dict[str, float]] = None, start: Optional[datetime] = None) -> dict:
+    """Write session files into `out_dir` totalling about `total_actions` actions.
+
+    Session sizes are drawn from an exponential distribution around
+    `mean_session_actions`, so there are many short sessions and a few long
+    ones. Sessions start 7 minutes apart from `start`, which defaults to
+    a time that ends the corpus around now. Returns a summary of what was
+    written, including the time range it covers.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    gen = SessionGenerator(seed=seed, tools=tools)
+    if start is None:
+        start = datetime.now(timezone.utc) - timedelta(minutes=7 * total_actions / mean_session_actions)
+    files = 0
+    written = 0
+    size = 0
+    while written < total_actions:
+        actions = max(5, min(int(gen.rng.expovariate(1 / mean_session_actions)), total_actions - written))
+        session_id = str(uuid.UUID(int=gen.rng.getrandbits(128)))
+        started_at = start + timedelta(minutes=files * 7)
+        size += gen.write_session(os.path.join(out_dir, f"{session_id}.jsonl"), actions, started_at,
+                                  subagent=gen.rng.random() < subagent_ratio)
+        files += 1
+        written += actions
+    return {"files": files, "actions": written, "bytes": size,
+            "start": start.isoformat(), "end": (gen.latest or start).isoformat()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic Clawdbot session logs")
+    parser.add_argument("out_dir", help="Directory to write *.jsonl session files to")
+    parser.add_argument("--actions", type=int, default=10000, help="Total actions across all sessions")
+    parser.add_argument("--session-actions", type=int, default=300, help="Mean actions per session")
+    parser.add_argument("--subagents", type=float, default=0.15, help="Fraction of subagent sessions")
+    parser.add_argument("--tools", help="Tool distribution, e.g. exec=30,read=25,write=10")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", type=parse_start,
+                        help="ISO 8601 start of the first session (default: end the corpus around now)")
+    args = parser.parse_args()
+
+    summary = generate_corpus(args.out_dir, args.actions, args.session_actions, args.subagents,
+                              args.seed, parse_tools(args.tools) if args.tools else None, args.start)
+    print(f"Wrote {summary['files']} sessions, {summary['actions']} actions, "
+          f"{summary['bytes'] / 1e6:.1f} MB to {args.out_dir}")
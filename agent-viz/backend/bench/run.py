@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Ingestion and query benchmarks over synthetic sessions.
+
+For each corpus size this generates session files (see `bench.generate`),
+then measures:
+
+- parse: entries decoded and actions extracted per second, no store writes,
+  split into JSON decoding and action extraction
+- sync: end-to-end `sync_all_sessions` into an empty store, and the share of
+  the per-file parse + write time its parsing accounts for
+- api: p50/p99 latency of the read endpoints over the synced data, with the
+  response cache cleared before every request. Time windows are taken from
+  the generated corpus (which ends around now) and the graph delta is read
+  from a cursor a few ingests back, so every endpoint returns real data
+
+Results are written as JSON so runs can be compared; `--baseline` prints
+the change against an earlier results file.
+
+    python -m bench.run --sizes 10000,100000 --output bench-results.json
+    python -m bench.run --sizes 1000000 --workers 8 --baseline bench-results.json
+
+By default the run uses a throwaway SQLite store and sync manifest. Set
+STORAGE_BACKEND=neo4j (and NEO4J_*) or pass --backend to benchmark another
+store; a store that already holds data is only cleared with --clear.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+WORKDIR = tempfile.mkdtemp(prefix="agent-viz-bench-")
+
+ENDPOINTS = [
+    "/api/stats",
+    "/api/agents",
+    "/api/agents/tree?depth=3",
+    "/api/sessions?limit=50",
+    "/api/session/{session_id}?limit=200",
+    "/api/graph?limit=100",
+    "/api/graph?limit=100&format=columnar",
+    "/api/graph/delta?since={since}",
+    "/api/tools",
+    "/api/tools?by=agent",
+    "/api/tools?by=day&days={days}",
+    "/api/usage?by=model,agent",
+    "/api/usage?by=day",
+    "/api/activity?resolution=hour&from={activity_from}&to={activity_to}&by=type",
+]
+# The activity endpoint reads (up to) this much of the end of the corpus
+ACTIVITY_WINDOW = timedelta(days=7)
+# Largest delta the benchmarked cursor may lag by (the endpoint's default limit)
+DELTA_LIMIT = 2000
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def bench_parse(corpus: str) -> dict:
+    """Decode and extract every file without touching the store."""
+    from sync_sessions import iter_entries, stream_actions
+
+    files = sorted(os.path.join(corpus, name) for name in os.listdir(corpus) if name.endswith(".jsonl"))
+    size = sum(os.path.getsize(f) for f in files)
+    entries = 0
+    actions = 0
+    decode = 0.0
+    started = time.perf_counter()
+    for filepath in files:
+        decode_started = time.perf_counter()
+        records = list(iter_entries(filepath))
+        decode += time.perf_counter() - decode_started
+        progress = {}
+        for _ in stream_actions(records, None, progress):
+            pass
+        entries += len(records)
+        actions += progress["actions"]
+    elapsed = time.perf_counter() - started
+    return {"files": len(files), "entries": entries, "actions": actions, "bytes": size,
+            "seconds": round(elapsed, 4), "decode_seconds": round(decode, 4),
+            "extract_seconds": round(elapsed - decode, 4),
+            "actions_per_s": round(actions / elapsed, 1), "mb_per_s": round(size / 1e6 / elapsed, 2)}
+
+
+def bench_sync(corpus: str, workers: int, writers: int) -> dict:
+    """Sync the corpus into the (empty) store and time it."""
+    from sync_sessions import sync_all_sessions
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        results = sync_all_sessions(force=False, workers=workers, writers=writers, path=corpus)
+        elapsed = time.perf_counter() - started
+    synced = [r for r in results if r["status"] in ("synced", "appended")]
+    errors = [r for r in results if r["status"] == "error"]
+    actions = sum(r["actions"] for r in synced)
+    # Per-file stage times as the sync itself measured them (summed across workers)
+    parse = sum(r.get("parse_seconds", 0.0) for r in results)
+    write = sum(r.get("write_seconds", 0.0) for r in results)
+    return {"files": len(results), "synced": len(synced), "errors": len(errors), "actions": actions,
+            "seconds": round(elapsed, 4), "files_per_s": round(len(results) / elapsed, 1),
+            "actions_per_s": round(actions / elapsed, 1), "parse_seconds": round(parse, 4),
+            "write_seconds": round(write, 4),
+            "parse_share": round(parse / (parse + write), 3) if parse + write else 0.0}
+
+
+def delta_cursor(store) -> int:
+    """The oldest cursor whose graph delta still fits in DELTA_LIMIT actions."""
+    since = store.get_graph_data(limit=5)["cursor"]
+    while since > 0 and not store.get_graph_delta(since - 1, limit=DELTA_LIMIT)["reset"]:
+        since -= 1
+    return since
+
+
+def query_params(corpus_info: dict, store) -> dict:
+    """Endpoint parameters that cover the generated corpus."""
+    start = datetime.fromisoformat(corpus_info["start"])
+    end = datetime.fromisoformat(corpus_info["end"])
+    now = datetime.now(timezone.utc)
+    return {"since": delta_cursor(store),
+            "days": max(1, (now - start).days + 1),
+            "activity_from": max(start, end - ACTIVITY_WINDOW).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "activity_to": (end + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+
+def bench_api(requests: int, corpus_info: dict) -> dict:
+    """Time each read endpoint `requests` times against the synced store."""
+    from fastapi.testclient import TestClient
+    from response_cache import get_cache
+    from server import app
+    from storage import get_client
+
+    # No `with` block: startup (watcher, event hub) is not needed to serve reads
+    http = TestClient(app)
+    cache = get_cache()
+    store = get_client()
+    sessions = store.get_recent_sessions(limit=1)["sessions"]
+    params = query_params(corpus_info, store)
+    params["session_id"] = sessions[0]["session"]["id"] if sessions else "missing"
+
+    results = {}
+    for endpoint in ENDPOINTS:
+        url = endpoint.format(**params)
+        samples = []
+        size = 0
+        for _ in range(requests):
+            cache.clear()
+            started = time.perf_counter()
+            response = http.get(url)
+            samples.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} returned {response.status_code}: {response.text[:200]}")
+            size = len(response.content)
+        results[endpoint] = {"url": url, "p50_ms": round(percentile(samples, 50), 3),
+                             "p99_ms": round(percentile(samples, 99), 3),
+                             "mean_ms": round(statistics.fmean(samples), 3), "bytes": size}
+    return results
+
+
+def run_size(total_actions: int, args) -> dict:
+    from bench.generate import generate_corpus, parse_tools
+    from storage import get_client
+    from sync_manifest import get_manifest
+
+    corpus = os.path.join(WORKDIR, f"sessions-{total_actions}")
+    print(f"\n== {total_actions} actions ==")
+    started = time.perf_counter()
+    corpus_info = generate_corpus(corpus, total_actions, args.session_actions, args.subagents, args.seed,
+                                  parse_tools(args.tools) if args.tools else None)
+    print(f"generated {corpus_info['files']} files ({corpus_info['bytes'] / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    store = get_client()
+    store.clear_all()
+    get_manifest().clear()
+
+    run = {"actions": total_actions, "corpus": corpus_info}
+    run["parse"] = bench_parse(corpus)
+    print(f"parse: {run['parse']['actions_per_s']:.0f} actions/s, {run['parse']['mb_per_s']} MB/s "
+          f"(decode {run['parse']['decode_seconds']:.2f}s, extract {run['parse']['extract_seconds']:.2f}s)")
+    run["sync"] = bench_sync(corpus, args.workers, args.writers)
+    print(f"sync:  {run['sync']['actions_per_s']:.0f} actions/s, {run['sync']['files_per_s']} files/s "
+          f"({run['sync']['errors']} errors, parsing {run['sync']['parse_share']:.0%} of the time)")
+    run["api"] = bench_api(args.requests, corpus_info)
+    for endpoint, timing in run["api"].items():
+        print(f"  {endpoint:<40} p50 {timing['p50_ms']:>9.2f} ms  p99 {timing['p99_ms']:>9.2f} ms")
+
+    if not args.keep:
+        shutil.rmtree(corpus, ignore_errors=True)
+    return run
+
+
+def compare(results: dict, baseline_path: str):
+    """Print the relative change of each metric against a baseline results file."""
+    with open(baseline_path) as f:
+        baseline = {run["actions"]: run for run in json.load(f)["runs"]}
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"\nCompared to {baseline_path}:")
+    for run in results["runs"]:
+        old = baseline.get(run["actions"])
+        if not old:
+            print(f"  {run['actions']} actions: no baseline")
+            continue
+        print(f"  {run['actions']} actions")
+        for stage in ("parse", "sync"):
+            print(f"    {stage:<6} actions/s {change(run[stage]['actions_per_s'], old[stage]['actions_per_s'])}")
+        for endpoint, timing in run["api"].items():
+            if endpoint in old["api"]:
+                print(f"    {endpoint:<40} p50 {change(timing['p50_ms'], old['api'][endpoint]['p50_ms'])}"
+                      f"  p99 {change(timing['p99_ms'], old['api'][endpoint]['p99_ms'])}")
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session parsing, sync and the read API")
+    parser.add_argument("--sizes", default="10000,100000",
+                        help="Comma-separated corpus sizes in actions (e.g. 10000,100000,1000000)")
+    parser.add_argument("--backend", choices=["sqlite", "neo4j"], help="Storage backend (default sqlite)")
+    parser.add_argument("--workers", type=int, default=1, help="Sync parse workers")
+    parser.add_argument("--writers", type=int, default=1, help="Sync writer threads")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint")
+    parser.add_argument("--session-actions", type=int, default=300, help="Mean actions per session")
+    parser.add_argument("--subagents", type=float, default=0.15, help="Fraction of subagent sessions")
+    parser.add_argument("--tools", help="Tool distribution, e.g. exec=30,read=25,write=10")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench-results.json", help="Results file to write")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--clear", action="store_true", help="Allow clearing a store that already holds data")
+    parser.add_argument("--keep", action="store_true", help=f"Keep generated corpora under {WORKDIR}")
+    args = parser.parse_args()
+
+    # Configure a throwaway store before any backend module reads the environment
+    if args.backend:
+        os.environ["STORAGE_BACKEND"] = args.backend
+    os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+    os.environ.setdefault("SQLITE_PATH", os.path.join(WORKDIR, "bench.db"))
+    os.environ.setdefault("SYNC_MANIFEST", os.path.join(WORKDIR, "manifest.db"))
+    os.environ["WATCH_SESSIONS"] = "false"
+
+    from storage import STORAGE_BACKEND, get_client
+
+    store = get_client()
+    existing = store.get_stats().get("total_sessions", 0)
+    if existing and not args.clear:
+        sys.exit(f"The {STORAGE_BACKEND} store already holds {existing} sessions; "
+                 f"pass --clear to wipe it for the benchmark")
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git": git_revision(),
+            "backend": STORAGE_BACKEND,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "runs": [run_size(int(size), args) for size in args.sizes.split(",")],
+    }
+    store.clear_all()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+    if not args.keep:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Response encodings for the read endpoints.
+
+JSON is rendered with orjson when it is installed. Graph payloads can also
+be served in a columnar layout (one array per node field, edges as integer
+node indexes, repeated strings interned in one table), as JSON or as
+MessagePack. Clients pick an encoding with `?format=` or the Accept header.
+"""
+import gzip
+import json
+import os
+from typing import Any, Optional
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+load_dotenv()
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.agentviz.columnar+json"
+MSGPACK = "application/msgpack"
+
+# ?format= values and the media type each one selects
+FORMATS = {"json": JSON, "columnar": COLUMNAR_JSON, "msgpack": MSGPACK}
+ACCEPT_ALIASES = {"application/x-msgpack": MSGPACK}
+
+# Node fields whose values repeat a lot and are interned in the string table
+INTERNED_FIELDS = ("type", "label", "action_type", "channel", "model")
+NODE_FIELDS = ("id",) + INTERNED_FIELDS + ("details", "timestamp", "started_at")
+
+
+def negotiate(fmt: Optional[str], accept: str, columnar: bool = False) -> str:
+    """Pick a media type from `?format=` or else the Accept header.
+
+    Raises ValueError for an unknown or unavailable `format`. Columnar types are only
+    offered where `columnar` is set (the graph endpoints).
+    """
+    offered = [JSON]
+    if columnar:
+        offered.append(COLUMNAR_JSON)
+        if msgpack is not None:
+            offered.append(MSGPACK)
+    if fmt:
+        media_type = FORMATS.get(fmt)
+        if media_type not in offered:
+            raise ValueError(f"format must be one of: {', '.join(k for k, v in FORMATS.items() if v in offered)}")
+        return media_type
+    for part in accept.split(","):
+        media_type = part.split(";")[0].strip().lower()
+        media_type = ACCEPT_ALIASES.get(media_type, media_type)
+        if media_type in offered and media_type != JSON:
+            return media_type
+    return JSON
+
+
+def to_columnar(graph: dict) -> dict:
+    """Convert a {"nodes", "edges", ...} graph into the columnar layout.
+
+    Interned fields hold indexes into `strings` (null stays null). Edge
+    endpoints are indexes into the node arrays; endpoints that are not in
+    this payload (a delta linking to an action the client already has) are
+    stored in `refs` and encoded as -(index + 1).
+    """
+    strings: list[str] = []
+    string_index: dict[str, int] = {}
+
+    def intern(value):
+        if value is None:
+            return None
+        value = str(value)
+        index = string_index.get(value)
+        if index is None:
+            index = string_index[value] = len(strings)
+            strings.append(value)
+        return index
+
+    nodes = graph.get("nodes", [])
+    columns = {field: [] for field in NODE_FIELDS}
+    for node in nodes:
+        for field in NODE_FIELDS:
+            value = node.get(field)
+            columns[field].append(intern(value) if field in INTERNED_FIELDS else value)
+
+    node_index = {node["id"]: i for i, node in enumerate(nodes)}
+    refs: list[str] = []
+    ref_index: dict[str, int] = {}
+
+    def endpoint(node_id):
+        if node_id in node_index:
+            return node_index[node_id]
+        if node_id not in ref_index:
+            ref_index[node_id] = len(refs)
+            refs.append(node_id)
+        return -(ref_index[node_id] + 1)
+
+    edges = graph.get("edges", [])
+    payload = {key: value for key, value in graph.items() if key not in ("nodes", "edges")}
+    payload.update({
+        "format": "columnar",
+        "nodes": columns,
+        "edges": {
+            "source": [endpoint(e["source"]) for e in edges],
+            "target": [endpoint(e["target"]) for e in edges],
+            "type": [intern(e["type"]) for e in edges],
+        },
+        "refs": refs,
+        "strings": strings,
+    })
+    return payload
+
+
+def dumps_json(data: Any) -> bytes:
+    """Serialize to JSON bytes, with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=str, separators=(",", ":")).encode()
+
+
+def encode(data: Any, media_type: str) -> bytes:
+    """Render a response body in the negotiated media type."""
+    if media_type == COLUMNAR_JSON:
+        return dumps_json(to_columnar(data))
+    if media_type == MSGPACK:
+        return msgpack.packb(to_columnar(data), default=str)
+    return dumps_json(data)
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether the client listed gzip in Accept-Encoding (without q=0)."""
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() == "gzip":
+            return params.replace(" ", "") != "q=0"
+    return False
+
+
+def compress(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=5)
@@ -0,0 +1,112 @@
+"""In-process pub/sub hub that pushes ingest events to dashboard clients.
+
+Sync threads publish through the Neo4j client's ingest listener; each
+connected client (one SSE stream) owns a bounded asyncio queue on the
+server's event loop. A client that falls `EVENT_QUEUE_SIZE` events behind
+has its backlog dropped and replaced by a single "resync" event, so a slow
+consumer costs a refetch on its side and never memory or latency here.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+EVENT_HEARTBEAT = float(os.getenv("EVENT_HEARTBEAT", "15"))
+
+
+class Subscriber:
+    def __init__(self, max_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, event: dict):
+        """Queue an event, collapsing the backlog into "resync" when full (loop thread only)."""
+        if self.queue.full():
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+            return
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    def __init__(self, max_queue: int = EVENT_QUEUE_SIZE, heartbeat: float = EVENT_HEARTBEAT):
+        self.max_queue = max_queue
+        self.heartbeat = heartbeat
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Attach the hub to the event loop that serves the subscribers."""
+        self._loop = loop
+
+    def publish(self, event: dict):
+        """Fan an event out to every subscriber; safe to call from any thread."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        event = {**event, "ts": time.time()}
+        with self._lock:
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            self._loop.call_soon_threadsafe(sub.offer, event)
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber(self.max_queue)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    async def stream(self, sub: Subscriber, is_disconnected):
+        """Yield Server-Sent Events for `sub` until the client goes away."""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                sub.sent += 1
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self) -> dict:
+        """Subscriber count, events published and per-client backlog."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            return {
+                "subscribers": len(subscribers),
+                "published": self.published,
+                "queued": [sub.queue.qsize() for sub in subscribers],
+                "dropped": sum(sub.dropped for sub in subscribers),
+            }
+
+
+# Singleton instance
+_hub: Optional[EventHub] = None
+
+
+def get_hub() -> EventHub:
+    """Get the event hub singleton."""
+    global _hub
+    if _hub is None:
+        _hub = EventHub()
+    return _hub
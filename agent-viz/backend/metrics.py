@@ -0,0 +1,129 @@
+"""Prometheus metrics for the API, the graph store and the sync pipeline.
+
+Everything is registered on the default prometheus_client registry and
+served by `GET /metrics`. Sync results carry their own `parse_seconds` /
+`write_seconds` timings (parsing may happen in a worker process), and
+`record_sync` folds them in on the process that owns the registry.
+"""
+import functools
+import time
+from typing import Callable, Iterable, Iterator, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Request latencies span cached 304s (sub-millisecond) to full graph renders
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "agentviz_http_request_duration_seconds", "API request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+
+STORE_QUERY_SECONDS = Histogram(
+    "agentviz_store_query_duration_seconds",
+    "Graph store call latency by method (for Neo4j, one Cypher transaction or more)",
+    ["backend", "method"], buckets=LATENCY_BUCKETS)
+STORE_QUERY_ERRORS = Counter(
+    "agentviz_store_query_errors_total", "Graph store calls that raised", ["backend", "method"])
+STORE_IN_FLIGHT = Gauge(
+    "agentviz_store_queries_in_flight", "Graph store calls running (each holds a pooled connection)",
+    ["backend"])
+STORE_POOL_SIZE = Gauge(
+    "agentviz_store_pool_size", "Maximum connections the store driver pools", ["backend"])
+
+SYNC_FILES = Counter("agentviz_sync_files_total", "Session files processed by sync result", ["status"])
+SYNC_ACTIONS = Counter("agentviz_sync_actions_total", "Actions ingested")
+SYNC_TOOL_CALLS = Counter("agentviz_sync_tool_calls_total", "Tool call actions ingested")
+SYNC_STAGE_SECONDS = Histogram(
+    "agentviz_sync_stage_duration_seconds", "Per-file time spent parsing vs. writing to the store",
+    ["stage"], buckets=LATENCY_BUCKETS)
+SYNC_RUN_SECONDS = Gauge("agentviz_sync_last_run_duration_seconds", "Duration of the last full sync")
+SYNC_RUN_FILES_RATE = Gauge("agentviz_sync_last_run_files_per_second", "File rate of the last full sync")
+SYNC_RUN_ACTIONS_RATE = Gauge("agentviz_sync_last_run_actions_per_second",
+                              "Action rate of the last full sync")
+SYNC_LAST_RUN = Gauge("agentviz_sync_last_run_timestamp_seconds", "When the last full sync finished")
+SYNC_LAST_INGEST = Gauge("agentviz_sync_last_ingest_timestamp_seconds",
+                         "When a file was last synced or appended to")
+
+WATCH_QUEUE_DEPTH = Gauge("agentviz_watch_queue_depth", "Files waiting in the watcher queue")
+WATCH_OLDEST_PENDING = Gauge("agentviz_watch_oldest_pending_seconds",
+                             "Age of the oldest unsynced watcher event")
+WATCH_LAG = Histogram("agentviz_watch_ingestion_lag_seconds",
+                      "First watcher event for a file -> synced", buckets=LATENCY_BUCKETS)
+
+# Wall-clock times behind the health check
+sync_state = {"last_run": None, "last_ingest": None}
+
+
+def timed_query(backend: str, method: Callable) -> Callable:
+    """Wrap a store method to record its latency, errors and concurrency."""
+    name = method.__name__
+    histogram = STORE_QUERY_SECONDS.labels(backend, name)
+    errors = STORE_QUERY_ERRORS.labels(backend, name)
+    in_flight = STORE_IN_FLIGHT.labels(backend)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        in_flight.inc()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            in_flight.dec()
+            histogram.observe(time.perf_counter() - started)
+    return wrapper
+
+
+def timed_iter(items: Iterable, timing: dict, key: str = "parse_seconds") -> Iterator:
+    """Yield from `items`, adding the time spent producing them to `timing[key]`.
+
+    Separates parsing from writing when a store consumes a lazy action
+    stream inside its transaction.
+    """
+    items = iter(items)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            timing[key] = timing.get(key, 0.0) + time.perf_counter() - started
+            return
+        timing[key] = timing.get(key, 0.0) + time.perf_counter() - started
+        yield item
+
+
+def record_sync(result: dict):
+    """Count one sync result and its parse/write timings."""
+    status = result.get("status", "unknown")
+    SYNC_FILES.labels(status).inc()
+    for stage in ("parse", "write"):
+        seconds = result.get(f"{stage}_seconds")
+        if seconds is not None:
+            SYNC_STAGE_SECONDS.labels(stage).observe(seconds)
+    if status in ("synced", "appended"):
+        SYNC_ACTIONS.inc(result.get("actions", 0))
+        SYNC_TOOL_CALLS.inc(result.get("tool_calls", 0))
+        sync_state["last_ingest"] = time.time()
+        SYNC_LAST_INGEST.set(sync_state["last_ingest"])
+
+
+def record_sync_run(files: int, actions: int, elapsed: float):
+    """Record the totals of a completed full sync."""
+    sync_state["last_run"] = time.time()
+    SYNC_LAST_RUN.set(sync_state["last_run"])
+    SYNC_RUN_SECONDS.set(elapsed)
+    SYNC_RUN_FILES_RATE.set(files / elapsed)
+    SYNC_RUN_ACTIONS_RATE.set(actions / elapsed)
+
+
+def watch_queue(queue):
+    """Expose a SyncEventQueue's depth and lag as gauges."""
+    WATCH_QUEUE_DEPTH.set_function(lambda: queue.stats()["depth"])
+    WATCH_OLDEST_PENDING.set_function(lambda: queue.stats()["oldest_pending_age"])
+
+
+def observe_watch_lag(lag: Optional[float]):
+    if lag is not None:
+        WATCH_LAG.observe(lag)
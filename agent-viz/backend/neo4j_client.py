@@ -1,30 +1,60 @@
 """Neo4j database client for agent visualization."""
 import os
-from neo4j import GraphDatabase
+import random
+from neo4j import GraphDatabase, Query
 from dotenv import load_dotenv
-from datetime import datetime
-from typing import Optional, Any
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Any, Iterable, Callable
+
+from storage import (GraphStore, STATS_KEYS, MAX_PAGE_SIZE, USAGE_METRICS, USAGE_DIMENSIONS,
+                     ACTIVITY_RESOLUTIONS, ACTIVITY_DIMENSIONS, encode_cursor, decode_cursor, epoch_ms,
+                     parse_details, usage_fields, activity_cutoffs, usage_hour)
+from metrics import STORE_POOL_SIZE
 
 load_dotenv()
 
+# Bumped with each data migration in Neo4jClient._migrate
+SCHEMA_VERSION = 4
+
+
+class Neo4jClient(GraphStore):
+    backend = "neo4j"
 
-class Neo4jClient:
     def __init__(self):
+        super().__init__()
         self.uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
         self.user = os.getenv("NEO4J_USER", "neo4j")
         self.password = os.getenv("NEO4J_PASSWORD", "agentvizsecret")
+        self.max_pool_size = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+        self.acquire_timeout = float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", "10"))
+        self.query_timeout = float(os.getenv("NEO4J_QUERY_TIMEOUT", "15"))
         self.driver = None
 
     def connect(self):
         """Connect to Neo4j."""
-        self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+        self.driver = GraphDatabase.driver(
+            self.uri, auth=(self.user, self.password),
+            max_connection_pool_size=self.max_pool_size,
+            connection_acquisition_timeout=self.acquire_timeout
+        )
+        STORE_POOL_SIZE.labels(self.backend).set(self.max_pool_size)
         self._ensure_constraints()
+        self._migrate()
 
     def close(self):
         """Close the connection."""
         if self.driver:
             self.driver.close()
 
+    def ping(self):
+        """Round-trip a trivial query through the connection pool."""
+        with self.driver.session() as session:
+            session.run(self._read("RETURN 1")).consume()
+
+    def _read(self, text: str) -> Query:
+        """Wrap a read query with the server-side transaction timeout."""
+        return Query(text, timeout=self.query_timeout)
+
     def _ensure_constraints(self):
         """Create indexes and constraints."""
         with self.driver.session() as session:
@@ -32,214 +62,641 @@ class Neo4jClient:
             session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (a:Agent) REQUIRE a.id IS UNIQUE")
             session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (s:Session) REQUIRE s.id IS UNIQUE")
             session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (ac:Action) REQUIRE ac.id IS UNIQUE")
+            session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (st:Stats) REQUIRE st.id IS UNIQUE")
+            session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (t:Tool) REQUIRE t.name IS UNIQUE")
+            session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (m:SessionSummary) REQUIRE m.session_id IS UNIQUE")
             # Indexes for faster lookups
-            session.run("CREATE INDEX IF NOT EXISTS FOR (a:Action) ON (a.timestamp)")
+            # Epoch-millisecond times: ordering, keyset pages and time-range queries
+            session.run("CREATE INDEX IF NOT EXISTS FOR (a:Action) ON (a.ts)")
             session.run("CREATE INDEX IF NOT EXISTS FOR (a:Action) ON (a.type)")
-            session.run("CREATE INDEX IF NOT EXISTS FOR (s:Session) ON (s.started_at)")
+            session.run("CREATE INDEX IF NOT EXISTS FOR (s:Session) ON (s.started_ts)")
+            # Agent ancestry paths: subtree queries are a prefix range on the path
+            session.run("CREATE INDEX IF NOT EXISTS FOR (a:Agent) ON (a.path)")
+            session.run("CREATE INDEX IF NOT EXISTS FOR (a:Agent) ON (a.requester_id)")
+            # Ingest sequence numbers, the cursor for graph deltas
+            session.run("CREATE INDEX IF NOT EXISTS FOR (a:Action) ON (a.seq)")
+            session.run("CREATE INDEX IF NOT EXISTS FOR (s:Session) ON (s.seq)")
+            session.run("CREATE INDEX IF NOT EXISTS FOR (d:ToolDaily) ON (d.tool, d.agent_id, d.day)")
+            session.run("CREATE INDEX IF NOT EXISTS FOR (d:ToolDaily) ON (d.day)")
+            session.run("CREATE INDEX IF NOT EXISTS FOR (u:UsageHourly) ON (u.hour, u.model, u.agent_id, u.channel)")
+            session.run("CREATE INDEX IF NOT EXISTS FOR (u:UsageHourly) ON (u.hour)")
+            session.run("CREATE INDEX IF NOT EXISTS FOR (b:ActivityBucket) "
+                        "ON (b.resolution, b.start, b.type, b.agent_id)")
+            session.run("CREATE INDEX IF NOT EXISTS FOR (b:ActivityBucket) ON (b.resolution, b.start)")
 
-    def create_agent(self, agent_id: str, name: str, agent_type: str, 
-                     created_at: datetime, parent_id: Optional[str] = None):
-        """Create or update an agent node."""
+    def _migrate(self):
+        """Bring data written by older versions up to SCHEMA_VERSION."""
         with self.driver.session() as session:
-            session.run("""
-                MERGE (a:Agent {id: $id})
-                SET a.name = $name,
-                    a.type = $type,
-                    a.created_at = $created_at
-            """, id=agent_id, name=name, type=agent_type, created_at=created_at.isoformat())
-            
-            if parent_id:
+            record = session.run("MATCH (m:Schema {id: 'global'}) RETURN m.version AS version").single()
+            version = record["version"] if record else 0
+            if version >= SCHEMA_VERSION:
+                return
+            if version < 1:
+                # ISO string timestamps -> indexed epoch milliseconds
+                print("Migrating timestamps to epoch milliseconds...")
+                session.run("""
+                    MATCH (ac:Action) WHERE ac.ts IS NULL AND ac.timestamp IS NOT NULL
+                    CALL {
+                        WITH ac
+                        SET ac.ts = datetime(ac.timestamp).epochMillis
+                    } IN TRANSACTIONS OF 10000 ROWS
+                """)
                 session.run("""
-                    MATCH (parent:Agent {id: $parent_id})
-                    MATCH (child:Agent {id: $child_id})
-                    MERGE (parent)-[:SPAWNED]->(child)
-                """, parent_id=parent_id, child_id=agent_id)
-
-    def create_session(self, session_id: str, agent_id: str, label: Optional[str],
-                       channel: Optional[str], started_at: datetime, 
-                       model: Optional[str], cwd: Optional[str]):
-        """Create or update a session node."""
+                    MATCH (s:Session) WHERE s.started_ts IS NULL AND s.started_at IS NOT NULL
+                    CALL {
+                        WITH s
+                        SET s.started_ts = datetime(s.started_at).epochMillis
+                    } IN TRANSACTIONS OF 10000 ROWS
+                """)
+            if version < 2:
+                # Completion usage out of the details string into typed properties
+                print("Migrating completion usage to typed properties...")
+                last_id = ""
+                while True:
+                    batch = session.run("""
+                        MATCH (ac:Action)
+                        WHERE ac.id > $last_id AND ac.type = 'completion'
+                          AND ac.details IS NOT NULL AND ac.model IS NULL
+                        RETURN ac.id AS id, ac.details AS details
+                        ORDER BY ac.id LIMIT 5000
+                    """, last_id=last_id).data()
+                    if not batch:
+                        break
+                    last_id = batch[-1]["id"]
+                    rows = [{"id": r["id"], **usage_fields(parse_details(r["details"]))} for r in batch]
+                    session.run("""
+                        UNWIND $rows AS row
+                        MATCH (ac:Action {id: row.id})
+                        SET ac.model = row.model, ac.tokens = row.tokens, ac.input_tokens = row.input_tokens,
+                            ac.output_tokens = row.output_tokens, ac.cost = row.cost
+                    """, rows=rows)
+        if version < 2:
+            self.reconcile_usage()
+        if version < 3:
+            self.reconcile_activity()
+        if version < 4:
+            with self.driver.session() as session:
+                session.run("""
+                    MATCH (a:Agent) WHERE a.requester_id IS NULL
+                    OPTIONAL MATCH (parent:Agent)-[:SPAWNED]->(a)
+                    WITH a, head(collect(parent.id)) AS parent_id
+                    SET a.parent_id = parent_id, a.requester_id = parent_id
+                """)
+            self.reconcile_agents()
+        if version < 1:
+            # Stores from before the Stats and Tool nodes: ingest only counts what is new to it
+            self.reconcile_tools()
+            self.reconcile_stats()
         with self.driver.session() as session:
-            session.run("""
-                MERGE (s:Session {id: $id})
-                SET s.label = $label,
-                    s.channel = $channel,
-                    s.started_at = $started_at,
-                    s.model = $model,
-                    s.cwd = $cwd
-            """, id=session_id, label=label, channel=channel, 
-                started_at=started_at.isoformat(), model=model, cwd=cwd)
-            
-            session.run("""
-                MATCH (a:Agent {id: $agent_id})
-                MATCH (s:Session {id: $session_id})
-                MERGE (a)-[:HAS_SESSION]->(s)
-            """, agent_id=agent_id, session_id=session_id)
+            session.run("MERGE (m:Schema {id: 'global'}) SET m.version = $version", version=SCHEMA_VERSION)
 
-    def create_action(self, action_id: str, session_id: str, action_type: str,
-                      name: Optional[str], timestamp: datetime,
-                      details: Optional[dict], parent_id: Optional[str] = None):
-        """Create an action node."""
+    def create_session_bundle(self, agent_info: dict, session_info: dict,
+                              actions: Iterable[dict], batch_size: Optional[int] = None):
+        """Write an agent, its session and all session actions in one transaction.
+
+        `actions` are dicts with id, type, name, timestamp, details and parent_id
+        keys. They are consumed lazily and sent as parameter lists through
+        UNWIND in chunks of `batch_size` rows, so a generator keeps memory flat.
+        """
+        # An explicit transaction rather than execute_write: a retried
+        # transaction function could not replay an already-consumed generator.
         with self.driver.session() as session:
-            # Create the action
-            session.run("""
-                MERGE (ac:Action {id: $id})
-                SET ac.type = $type,
-                    ac.name = $name,
-                    ac.timestamp = $timestamp,
-                    ac.details = $details
-            """, id=action_id, type=action_type, name=name,
-                timestamp=timestamp.isoformat(), details=str(details) if details else None)
-            
-            # Link to session
-            session.run("""
+            with session.begin_transaction() as tx:
+                delta = self._write_session_bundle(tx, agent_info, session_info, actions,
+                                                   batch_size or self.batch_size)
+                tx.commit()
+        self._bump_generation()
+        event = self._ingest_event("session", session_info["id"], delta)
+        event["agent_id"] = agent_info["id"]
+        self._notify(event)
+
+    def upsert_actions_batch(self, session_id: str, actions: Iterable[dict],
+                             batch_size: Optional[int] = None):
+        """Append actions (and their CONTAINS/FOLLOWED_BY edges) to an existing session."""
+        with self.driver.session() as session:
+            with session.begin_transaction() as tx:
+                delta = self._write_actions(tx, session_id, actions, batch_size or self.batch_size)
+                tx.commit()
+        if delta:
+            self._bump_generation()
+            self._notify(self._ingest_event("actions", session_id, delta))
+
+    @classmethod
+    def _write_session_bundle(cls, tx, agent_info: dict, session_info: dict,
+                              actions: Iterable[dict], batch_size: int):
+        delta = cls._begin_ingest(tx)
+
+        # A node that MERGE just created has none of its properties set yet,
+        # which tells new nodes apart from re-synced ones for the counters.
+        new_session = tx.run("""
+            MERGE (s:Session {id: $id})
+            WITH s, s.started_at IS NULL AS is_new
+            SET s.label = $label,
+                s.channel = $channel,
+                s.started_at = $started_at,
+                s.started_ts = $started_ts,
+                s.model = $model,
+                s.cwd = $cwd,
+                s.session_key = $session_key,
+                s.requester_key = $requester_key,
+                s.seq = $seq
+            RETURN is_new
+        """, id=session_info["id"], label=session_info.get("label"),
+            channel=session_info.get("channel"), started_at=session_info["started_at"].isoformat(),
+            started_ts=epoch_ms(session_info["started_at"]),
+            model=session_info.get("model"), cwd=session_info.get("cwd"),
+            session_key=session_info.get("session_key"), requester_key=session_info.get("requester_session"),
+            seq=delta["seq"]).single()["is_new"]
+        cls._write_actions(tx, session_info["id"], actions, batch_size, delta)
+
+        # The agent is shared by many sessions: link it after the sequence number is claimed
+        cls._claim_seq(tx, session_info["id"], delta)
+        new_agent = tx.run("""
+            MERGE (a:Agent {id: $id})
+            WITH a, a.type IS NULL AS is_new
+            SET a.name = $name,
+                a.type = $type,
+                a.created_at = $created_at,
+                a.requester_id = coalesce($requester_id, a.requester_id),
+                a.seq = $seq
+            RETURN is_new
+        """, id=agent_info["id"], name=agent_info["name"], type=agent_info["type"],
+            created_at=agent_info["created_at"].isoformat(),
+            requester_id=agent_info.get("parent_id"), seq=delta["seq"]).single()["is_new"]
+        cls._place_agent(tx, agent_info["id"], agent_info.get("parent_id"))
+        tx.run("""
+            MATCH (a:Agent {id: $agent_id}), (s:Session {id: $id})
+            MERGE (a)-[:HAS_SESSION]->(s)
+        """, agent_id=agent_info["id"], id=session_info["id"])
+
+        delta["counts"]["total_sessions"] = int(new_session)
+        if new_agent:
+            delta["counts"]["agents" if agent_info["type"] == "main" else "subagents"] = 1
+        cls._apply_delta(tx, session_info["id"], delta)
+        return delta
+
+    # Agent hierarchy primitives for GraphStore._place_agent
+
+    @staticmethod
+    def _agent_paths(tx, ids: list[str]) -> dict:
+        result = tx.run("MATCH (a:Agent) WHERE a.id IN $ids RETURN a.id AS id, a.path AS path", ids=ids)
+        return {r["id"]: r["path"] for r in result}
+
+    @staticmethod
+    def _set_parent(tx, agent_id: str, parent_id: str):
+        tx.run("""
+            MATCH (a:Agent {id: $id}), (parent:Agent {id: $parent_id})
+            OPTIONAL MATCH (other:Agent)-[old:SPAWNED]->(a) WHERE other.id <> $parent_id
+            DELETE old
+            WITH DISTINCT a, parent
+            MERGE (parent)-[:SPAWNED]->(a)
+            SET a.parent_id = $parent_id
+        """, id=agent_id, parent_id=parent_id)
+
+    @staticmethod
+    def _move_subtree(tx, agent_id: str, old: Optional[str], new: str):
+        if old is None:
+            tx.run("MATCH (a:Agent {id: $id}) SET a.path = $path, a.depth = $depth",
+                   id=agent_id, path=new, depth=new.count("/"))
+            return
+        tx.run("""
+            MATCH (d:Agent)
+            WHERE d.path = $old OR d.path STARTS WITH $old + '/'
+            SET d.path = $new + substring(d.path, size($old)), d.depth = d.depth + $shift
+        """, old=old, new=new, shift=new.count("/") - old.count("/"))
+
+    @staticmethod
+    def _orphans(tx, agent_id: str) -> list[tuple]:
+        result = tx.run("""
+            MATCH (o:Agent {requester_id: $id})
+            WHERE o.parent_id IS NULL AND o.id <> $id
+            RETURN o.id AS id, o.path AS path
+        """, id=agent_id)
+        return [(r["id"], r["path"]) for r in result]
+
+    @staticmethod
+    def _begin_ingest(tx) -> dict:
+        """Start an ingest transaction with a placeholder sequence number.
+
+        Sessions and actions are written with a unique negative `seq` that
+        _claim_seq replaces at the end of the transaction, so concurrent
+        writers only serialize on their last statements.
+        """
+        return GraphStore._new_delta(-random.getrandbits(62) - 1)
+
+    @staticmethod
+    def _claim_seq(tx, session_id: str, delta: dict):
+        """Take the transaction's sequence number and stamp it over the placeholder.
+
+        The number comes from the Stats node, whose lock is then held until
+        commit, so sequence order matches commit order (which makes `seq` a
+        safe cursor for graph deltas). Shared nodes (agents, aggregates) are
+        only written after this, so they are always locked in the same order.
+        """
+        placeholder = delta["seq"]
+        delta["seq"] = tx.run("""
+            MERGE (st:Stats {id: 'global'})
+            SET st.seq = coalesce(st.seq, 0) + 1
+            RETURN st.seq AS seq
+        """).single()["seq"]
+        tx.run("MATCH (ac:Action) WHERE ac.seq = $placeholder SET ac.seq = $seq",
+               placeholder=placeholder, seq=delta["seq"])
+        tx.run("MATCH (s:Session {id: $session_id}) WHERE s.seq = $placeholder SET s.seq = $seq",
+               session_id=session_id, placeholder=placeholder, seq=delta["seq"])
+
+    @classmethod
+    def _write_actions(cls, tx, session_id: str, actions: Iterable[dict], batch_size: int,
+                       delta: Optional[dict] = None) -> Optional[dict]:
+        """Write actions in UNWIND chunks, recording what was new in `delta`.
+
+        Without a caller-supplied delta, the aggregates are applied here.
+        Returns the delta, or None if there were no actions to write.
+        """
+        owns_delta = delta is None
+        summary = tx.run("MATCH (m:SessionSummary {session_id: $session_id}) RETURN m.last_ts AS ts, m.last_id AS id",
+                         session_id=session_id).single()
+        covered = (summary["ts"], summary["id"]) if summary and summary["ts"] is not None else None
+        for chunk in cls._action_rows(actions, batch_size):
+            chunk = cls._uncompacted(chunk, covered)
+            if not chunk:
+                continue
+            if delta is None:
+                delta = cls._begin_ingest(tx)
+
+            record = tx.run("""
                 MATCH (s:Session {id: $session_id})
-                MATCH (ac:Action {id: $action_id})
+                UNWIND $rows AS row
+                MERGE (ac:Action {id: row.id})
+                WITH s, row, ac, ac.type IS NULL AS is_new
+                SET ac.type = row.type,
+                    ac.name = row.name,
+                    ac.timestamp = row.timestamp,
+                    ac.ts = row.ts,
+                    ac.details = row.details,
+                    ac.is_error = CASE WHEN row.type = 'tool_result' THEN row.is_error END,
+                    ac.model = row.model,
+                    ac.tokens = row.tokens,
+                    ac.input_tokens = row.input_tokens,
+                    ac.output_tokens = row.output_tokens,
+                    ac.cost = row.cost,
+                    ac.seq = $seq
                 MERGE (s)-[:CONTAINS]->(ac)
-            """, session_id=session_id, action_id=action_id)
-            
-            # Link to parent action for temporal ordering
-            if parent_id:
-                session.run("""
-                    MATCH (parent:Action {id: $parent_id})
-                    MATCH (child:Action {id: $child_id})
+                RETURN count(CASE WHEN is_new THEN 1 END) AS new_actions,
+                       count(CASE WHEN is_new AND row.type = 'tool_call' THEN 1 END) AS new_tool_calls,
+                       collect(CASE WHEN is_new THEN row.id END) AS new_ids
+            """, session_id=session_id, rows=chunk, seq=delta["seq"]).single()
+            if record:
+                delta["counts"]["total_actions"] += record["new_actions"]
+                delta["counts"]["total_tool_calls"] += record["new_tool_calls"]
+                new_ids = set(record["new_ids"])
+                cls._collect_tools(delta, chunk, new_ids)
+                cls._collect_usage(delta, chunk, new_ids)
+                cls._collect_activity(delta, chunk, new_ids)
+
+            links = [r for r in chunk if r["parent_id"]]
+            if links:
+                tx.run("""
+                    UNWIND $rows AS row
+                    MATCH (parent:Action {id: row.parent_id})
+                    MATCH (child:Action {id: row.id})
                     MERGE (parent)-[:FOLLOWED_BY]->(child)
-                """, parent_id=parent_id, child_id=action_id)
+                """, rows=links)
+
+        if owns_delta and delta is not None:
+            cls._claim_seq(tx, session_id, delta)
+            cls._apply_delta(tx, session_id, delta)
+        return delta
+
+    @classmethod
+    def _apply_delta(cls, tx, session_id: str, delta: dict):
+        """Update the Session, Tool, ToolDaily, UsageHourly, ActivityBucket and Stats aggregates
+        at the end of an ingest.
+
+        Shared aggregate nodes are touched last and in a fixed order (tools
+        by name), once per transaction rather than once per chunk.
+        """
+        if delta["counts"]["total_actions"]:
+            # Sessions synced before action_count existed get a full count once
+            tx.run("""
+                MATCH (s:Session {id: $session_id})
+                SET s.action_count = coalesce(s.action_count + $new_actions,
+                                              COUNT { (s)-[:CONTAINS]->(:Action) })
+            """, session_id=session_id, new_actions=delta["counts"]["total_actions"])
+
+        if delta["tools"]:
+            tools = [{"name": name, "day": day, **values}
+                     for (name, day), values in sorted(delta["tools"].items())]
+            tx.run("""
+                OPTIONAL MATCH (a:Agent)-[:HAS_SESSION]->(:Session {id: $session_id})
+                WITH coalesce(a.id, 'unknown') AS agent_id LIMIT 1
+                UNWIND $tools AS t
+                MERGE (tool:Tool {name: t.name})
+                SET tool.usage = coalesce(tool.usage, 0) + t.usage,
+                    tool.error_count = coalesce(tool.error_count, 0) + t.errors,
+                    tool.last_used = CASE WHEN t.last_used IS NOT NULL
+                                           AND (tool.last_used IS NULL OR t.last_used > tool.last_used)
+                                          THEN t.last_used ELSE tool.last_used END
+                MERGE (d:ToolDaily {tool: t.name, agent_id: agent_id, day: t.day})
+                SET d.usage = coalesce(d.usage, 0) + t.usage,
+                    d.error_count = coalesce(d.error_count, 0) + t.errors
+            """, session_id=session_id, tools=tools)
+
+        if delta["usage"]:
+            tx.run("""
+                MATCH (s:Session {id: $session_id})
+                OPTIONAL MATCH (a:Agent)-[:HAS_SESSION]->(s)
+                WITH coalesce(a.id, 'unknown') AS agent_id, coalesce(a.type, 'unknown') AS agent_type,
+                     coalesce(s.channel, 'unknown') AS channel LIMIT 1
+                UNWIND $usage AS u
+                MERGE (b:UsageHourly {hour: u.hour, model: u.model, agent_id: agent_id, channel: channel})
+                SET b.agent_type = agent_type,
+                    b.completions = coalesce(b.completions, 0) + u.completions,
+                    b.tokens = coalesce(b.tokens, 0) + u.tokens,
+                    b.input_tokens = coalesce(b.input_tokens, 0) + u.input_tokens,
+                    b.output_tokens = coalesce(b.output_tokens, 0) + u.output_tokens,
+                    b.cost = coalesce(b.cost, 0.0) + u.cost
+            """, session_id=session_id, usage=cls._usage_rows(delta))
+
+        if delta["activity"]:
+            tx.run("""
+                MATCH (s:Session {id: $session_id})
+                OPTIONAL MATCH (a:Agent)-[:HAS_SESSION]->(s)
+                WITH coalesce(a.id, 'unknown') AS agent_id LIMIT 1
+                UNWIND $activity AS row
+                MERGE (b:ActivityBucket {resolution: row.resolution, start: row.start,
+                                         type: row.type, agent_id: agent_id})
+                SET b.count = coalesce(b.count, 0) + row.count
+            """, session_id=session_id, activity=cls._activity_rows(delta))
+
+        if delta["tool_links"]:
+            tx.run("""
+                UNWIND $rows AS row
+                MATCH (ac:Action {id: row.id})
+                MATCH (tool:Tool {name: row.name})
+                MERGE (ac)-[:USED_TOOL]->(tool)
+            """, rows=sorted(delta["tool_links"], key=lambda r: r["name"]))
+
+        cls._bump_stats(tx, delta["counts"])
+
+    @staticmethod
+    def _bump_stats(tx, counts: dict):
+        """Add ingest deltas to the materialized Stats node, once per transaction."""
+        deltas = {key: counts.get(key, 0) for key in STATS_KEYS}
+        if not any(deltas.values()):
+            return
+        tx.run("""
+            MERGE (st:Stats {id: 'global'})
+            SET st.total_sessions = coalesce(st.total_sessions, 0) + $total_sessions,
+                st.total_actions = coalesce(st.total_actions, 0) + $total_actions,
+                st.total_tool_calls = coalesce(st.total_tool_calls, 0) + $total_tool_calls,
+                st.agents = coalesce(st.agents, 0) + $agents,
+                st.subagents = coalesce(st.subagents, 0) + $subagents
+        """, **deltas)
 
     def get_all_agents(self) -> list[dict]:
         """Get all agents."""
         with self.driver.session() as session:
-            result = session.run("""
+            agents = [dict(r["a"]) for r in session.run(self._read("""
                 MATCH (a:Agent)
-                OPTIONAL MATCH (a)-[:SPAWNED]->(child:Agent)
-                OPTIONAL MATCH (parent:Agent)-[:SPAWNED]->(a)
-                RETURN a, collect(DISTINCT child.id) as children, parent.id as parent
+                RETURN a
                 ORDER BY a.created_at DESC
-            """)
-            return [{"agent": dict(r["a"]), "children": r["children"], "parent": r["parent"]} 
-                    for r in result]
+            """))]
+        children: dict[str, list[str]] = {}
+        for agent in agents:
+            if agent.get("parent_id"):
+                children.setdefault(agent["parent_id"], []).append(agent["id"])
+        return [{"agent": {k: v for k, v in a.items() if k != "parent_id"}, "children": children.get(a["id"], []),
+                 "parent": a.get("parent_id")} for a in agents]
 
-    def get_recent_sessions(self, limit: int = 50) -> list[dict]:
-        """Get recent sessions with action counts."""
+    def get_agent_tree(self, root: Optional[str] = None, depth: int = 1, limit: int = 200,
+                       cursor: Optional[str] = None) -> Optional[dict]:
+        """A page of the agent subtree under `root`, in ancestry path order, from the path index."""
+        limit = min(limit, MAX_PAGE_SIZE)
+        after = decode_cursor(cursor)[0] if cursor else None
+        match = """
+            MATCH (a:Agent)
+            WHERE a.depth <= $depth
+        """
+        if root:
+            match = """
+                MATCH (r:Agent {id: $root})
+                MATCH (a:Agent)
+                WHERE (a.path = r.path OR a.path STARTS WITH r.path + '/') AND a.depth <= r.depth + $depth
+            """
         with self.driver.session() as session:
-            result = session.run("""
+            if root and not session.run(self._read("MATCH (r:Agent {id: $root}) RETURN r.id"), root=root).single():
+                return None
+            result = session.run(self._read(f"""
+                {match}
+                  AND ($after IS NULL OR a.path > $after)
+                RETURN a, COUNT {{ (a)-[:SPAWNED]->(:Agent) }} AS children
+                ORDER BY a.path
+                LIMIT $limit
+            """), root=root, depth=depth, after=after, limit=limit + 1)
+            rows = [(dict(r["a"]), r["children"]) for r in result]
+
+        agents = [{"agent": {k: v for k, v in a.items() if k != "parent_id"}, "parent": a.get("parent_id"),
+                   "depth": a.get("depth"), "children": children} for a, children in rows[:limit]]
+        next_cursor = encode_cursor(rows[limit - 1][0]["path"], rows[limit - 1][0]["id"]) if len(rows) > limit else None
+        return {"root": root, "agents": agents, "next_cursor": next_cursor}
+
+    def get_recent_sessions(self, limit: int = 50, cursor: Optional[str] = None) -> dict:
+        """Get a page of sessions, newest first, with their stored action counts.
+
+        Keyset pagination on (started_ts, id): pass the returned `next_cursor`
+        to get the following page; it is None on the last page.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        limit = min(limit, MAX_PAGE_SIZE)
+        with self.driver.session() as session:
+            result = session.run(self._read("""
                 MATCH (s:Session)
-                OPTIONAL MATCH (s)-[:CONTAINS]->(ac:Action)
-                WITH s, count(ac) as action_count
-                RETURN s, action_count
-                ORDER BY s.started_at DESC
+                WHERE $after IS NULL
+                   OR s.started_ts < $after[0]
+                   OR (s.started_ts = $after[0] AND s.id < $after[1])
+                RETURN s, coalesce(s.action_count, COUNT { (s)-[:CONTAINS]->(:Action) }) AS action_count
+                ORDER BY s.started_ts DESC, s.id DESC
                 LIMIT $limit
-            """, limit=limit)
-            return [{"session": dict(r["s"]), "action_count": r["action_count"]} 
+            """), after=after, limit=limit + 1)
+            rows = [{"session": dict(r["s"]), "action_count": r["action_count"]}
                     for r in result]
 
-    def get_session_with_actions(self, session_id: str) -> dict:
-        """Get a session with all its actions."""
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]["session"]
+            next_cursor = encode_cursor(last["started_ts"], last["id"])
+        return {"sessions": rows, "next_cursor": next_cursor}
+
+    def get_session_with_actions(self, session_id: str, limit: int = 200, cursor: Optional[str] = None,
+                                 types: Optional[list[str]] = None) -> dict:
+        """Get a session with a page of its actions in time order.
+
+        Keyset pagination on (ts, id), optionally restricted to the
+        action `types` given. `next_cursor` is None on the last page.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        limit = min(limit, MAX_PAGE_SIZE)
         with self.driver.session() as session:
             # Get session
-            sess_result = session.run("""
+            sess_result = session.run(self._read("""
                 MATCH (s:Session {id: $id})
                 OPTIONAL MATCH (a:Agent)-[:HAS_SESSION]->(s)
                 RETURN s, a
-            """, id=session_id)
+            """), id=session_id)
             sess_record = sess_result.single()
             
-            # Get actions
-            actions_result = session.run("""
+            # Get a page of actions
+            actions_result = session.run(self._read("""
                 MATCH (s:Session {id: $id})-[:CONTAINS]->(ac:Action)
+                WHERE ($types IS NULL OR ac.type IN $types)
+                  AND ($after IS NULL
+                       OR ac.ts > $after[0]
+                       OR (ac.ts = $after[0] AND ac.id > $after[1]))
                 RETURN ac
-                ORDER BY ac.timestamp ASC
-            """, id=session_id)
-            
-            return {
-                "session": dict(sess_record["s"]) if sess_record else None,
-                "agent": dict(sess_record["a"]) if sess_record and sess_record["a"] else None,
-                "actions": [dict(r["ac"]) for r in actions_result]
-            }
+                ORDER BY ac.ts ASC, ac.id ASC
+                LIMIT $limit
+            """), id=session_id, types=types, after=after, limit=limit + 1)
+            actions = [dict(r["ac"]) for r in actions_result]
+
+        next_cursor = None
+        if len(actions) > limit:
+            actions = actions[:limit]
+            next_cursor = encode_cursor(actions[-1]["ts"], actions[-1]["id"])
+        return {
+            "session": dict(sess_record["s"]) if sess_record else None,
+            "agent": dict(sess_record["a"]) if sess_record and sess_record["a"] else None,
+            "actions": actions,
+            "next_cursor": next_cursor
+        }
 
     def get_graph_data(self, limit: int = 100) -> dict:
-        """Get graph data for visualization — proper tree structure."""
+        """Get graph data for visualization — proper tree structure.
+
+        Fetched in one round trip. `cursor` is the ingest sequence number the
+        snapshot was read at; pass it to `get_graph_delta` to poll for changes.
+        """
         with self.driver.session() as session:
-            # Step 1: Get agent + recent sessions
-            result = session.run("""
-                MATCH (a:Agent)-[:HAS_SESSION]->(s:Session)
-                WITH a, s ORDER BY s.started_at DESC LIMIT $slimit
-                RETURN collect(DISTINCT {id: a.id, label: a.name, type: 'Agent'}) as agents,
-                       collect(DISTINCT {id: s.id, label: coalesce(s.label, s.id), type: 'Session',
-                                         channel: s.channel, model: s.model, started_at: s.started_at}) as sessions
-            """, slimit=min(limit // 5, 15))
+            result = session.run(self._read("""
+                OPTIONAL MATCH (st:Stats {id: 'global'})
+                WITH coalesce(st.seq, 0) AS cursor
+                OPTIONAL MATCH (a:Agent)-[:HAS_SESSION]->(s:Session)
+                WITH cursor, a, s ORDER BY s.started_ts DESC LIMIT $slimit
+                CALL {
+                    WITH s
+                    OPTIONAL MATCH (s)-[:CONTAINS]->(ac:Action)
+                    OPTIONAL MATCH (prev:Action)-[:FOLLOWED_BY]->(ac)
+                    RETURN collect(CASE WHEN ac IS NULL THEN NULL ELSE
+                                   {id: ac.id, label: coalesce(ac.name, ac.type), action_type: ac.type,
+                                    details: ac.details, timestamp: ac.timestamp, prev: prev.id} END) AS actions
+                }
+                RETURN cursor, a.id AS agent_id, a.name AS agent_name,
+                       s {.id, .channel, .model, .started_at, label: coalesce(s.label, s.id)} AS session,
+                       actions
+            """), slimit=min(limit // 5, 15))
+            return self._build_graph(list(result))
+
+    def get_graph_delta(self, since: int, limit: int = 2000) -> dict:
+        """Get sessions and actions written after the ingest sequence `since`.
 
+        Returns the same node/edge shape as `get_graph_data` plus the new
+        cursor. `reset` tells the client to refetch the full graph instead:
+        the delta was truncated at `limit` actions, or the cursor is ahead
+        of the database (it was cleared or replaced).
+        """
+        with self.driver.session() as session:
+            result = session.run(self._read("""
+                OPTIONAL MATCH (st:Stats {id: 'global'})
+                WITH coalesce(st.seq, 0) AS cursor
+                CALL {
+                    OPTIONAL MATCH (a:Agent)-[:HAS_SESSION]->(s:Session)
+                    WHERE s.seq > $since
+                    RETURN collect(CASE WHEN s IS NULL THEN NULL ELSE
+                                   {agent_id: a.id, agent_name: a.name,
+                                    session: s {.id, .channel, .model, .started_at,
+                                                label: coalesce(s.label, s.id)}} END) AS sessions
+                }
+                CALL {
+                    MATCH (ac:Action) WHERE ac.seq > $since
+                    WITH ac ORDER BY ac.seq LIMIT $limit
+                    MATCH (s:Session)-[:CONTAINS]->(ac)
+                    OPTIONAL MATCH (prev:Action)-[:FOLLOWED_BY]->(ac)
+                    RETURN collect({id: ac.id, label: coalesce(ac.name, ac.type), action_type: ac.type,
+                                    details: ac.details, timestamp: ac.timestamp, prev: prev.id,
+                                    session_id: s.id}) AS actions
+                }
+                RETURN cursor, sessions, actions
+            """), since=since, limit=limit + 1)
             record = result.single()
-            nodes = []
-            node_ids = set()
-            session_ids = []
-            if record:
-                for a in record["agents"]:
-                    if a["id"] and a["id"] not in node_ids:
-                        nodes.append(a)
-                        node_ids.add(a["id"])
-                for s in record["sessions"]:
-                    if s["id"] and s["id"] not in node_ids:
-                        nodes.append(s)
-                        node_ids.add(s["id"])
-                        session_ids.append(s["id"])
-
-            # Step 2: Get all actions for those sessions
-            if session_ids:
-                actions_result = session.run("""
-                    MATCH (s:Session)-[:CONTAINS]->(ac:Action)
-                    WHERE s.id IN $sids
-                    RETURN DISTINCT ac.id as id, coalesce(ac.name, ac.type) as label,
-                           'Action' as type, ac.type as action_type,
-                           ac.details as details, ac.timestamp as timestamp
-                """, sids=session_ids)
-
-                for r in actions_result:
-                    if r["id"] and r["id"] not in node_ids:
-                        nodes.append({
-                            "id": r["id"], "label": r["label"], "type": r["type"],
-                            "action_type": r["action_type"],
-                            "details": r["details"], "timestamp": r["timestamp"]
-                        })
-                        node_ids.add(r["id"])
-
-            # Step 3: Get edges scoped to our sessions
-            edges = []
-            if session_ids:
-                # HAS_SESSION edges
-                edges_result = session.run("""
-                    MATCH (a:Agent)-[r:HAS_SESSION]->(s:Session)
-                    WHERE s.id IN $sids
-                    RETURN a.id as source, s.id as target, 'HAS_SESSION' as type
-                """, sids=session_ids)
-                edges.extend([{"source": r["source"], "target": r["target"], "type": r["type"]}
-                              for r in edges_result])
-
-                # CONTAINS edges (session -> action)
-                edges_result = session.run("""
-                    MATCH (s:Session)-[r:CONTAINS]->(ac:Action)
-                    WHERE s.id IN $sids
-                    RETURN s.id as source, ac.id as target, 'CONTAINS' as type
-                """, sids=session_ids)
-                edges.extend([{"source": r["source"], "target": r["target"], "type": r["type"]}
-                              for r in edges_result if r["target"] in node_ids])
-
-                # FOLLOWED_BY edges (action -> action within our sessions)
-                action_ids = list(node_ids - set(session_ids))
-                if action_ids:
-                    edges_result = session.run("""
-                        MATCH (a:Action)-[r:FOLLOWED_BY]->(b:Action)
-                        WHERE a.id IN $aids AND b.id IN $aids
-                        RETURN a.id as source, b.id as target, 'FOLLOWED_BY' as type
-                    """, aids=action_ids)
-                    edges.extend([{"source": r["source"], "target": r["target"], "type": r["type"]}
-                                  for r in edges_result])
-
-            return {"nodes": nodes, "edges": edges}
+
+        if record is None:
+            return self._build_delta(since, 0, [], [], limit)
+        return self._build_delta(since, record["cursor"], record["sessions"], record["actions"], limit)
+
+    def get_actions(self, start: Optional[int] = None, end: Optional[int] = None,
+                    types: Optional[list[str]] = None, agent_id: Optional[str] = None,
+                    limit: int = 200, cursor: Optional[str] = None) -> dict:
+        """Get a page of actions with `start` <= ts < `end` (epoch ms), newest first.
+
+        Both bounds are always concrete, so the planner seeks the Action(ts)
+        range index and walks it in order instead of scanning all actions.
+        """
+        limit = min(limit, MAX_PAGE_SIZE)
+        lower = start if start is not None else 0
+        upper = (end - 1) if end is not None else 2 ** 53
+        after = decode_cursor(cursor) if cursor else None
+        if after:
+            upper = min(upper, after[0])
+        with self.driver.session() as session:
+            result = session.run(self._read("""
+                MATCH (ac:Action)
+                WHERE ac.ts >= $lower AND ac.ts <= $upper
+                  AND ($types IS NULL OR ac.type IN $types)
+                  AND ($after IS NULL OR NOT (ac.ts = $after[0] AND ac.id >= $after[1]))
+                MATCH (a:Agent)-[:HAS_SESSION]->(s:Session)-[:CONTAINS]->(ac)
+                WHERE $agent_id IS NULL OR a.id = $agent_id
+                RETURN ac, s.id AS session_id, a.id AS agent_id
+                ORDER BY ac.ts DESC, ac.id DESC
+                LIMIT $limit
+            """), lower=lower, upper=upper, types=types, after=after, agent_id=agent_id, limit=limit + 1)
+            actions = [{**dict(r["ac"]), "session_id": r["session_id"], "agent_id": r["agent_id"]}
+                       for r in result]
+
+        next_cursor = None
+        if len(actions) > limit:
+            actions = actions[:limit]
+            next_cursor = encode_cursor(actions[-1]["ts"], actions[-1]["id"])
+        return {"actions": actions, "next_cursor": next_cursor}
 
     def get_stats(self) -> dict:
-        """Get aggregate statistics."""
+        """Get aggregate statistics from the materialized Stats node.
+
+        The counters are kept up to date by each ingest transaction; if they
+        have not been seeded yet (no node, or one holding only `seq`) they are
+        rebuilt from the graph once.
+        """
         with self.driver.session() as session:
+            record = session.run(self._read("MATCH (st:Stats {id: 'global'}) RETURN st")).single()
+        if record is None or record["st"].get("total_sessions") is None:
+            return self.reconcile_stats()
+        stats = dict(record["st"])
+        return {key: stats.get(key, 0) for key in STATS_KEYS}
+
+    def reconcile_stats(self) -> dict:
+        """Recompute the Stats counters and session action counts with full scans."""
+        with self.driver.session() as session:
+            session.run("""
+                MATCH (s:Session)
+                CALL {
+                    WITH s
+                    OPTIONAL MATCH (s)-[:SUMMARIZED_AS]->(m:SessionSummary)
+                    SET s.action_count = COUNT { (s)-[:CONTAINS]->(:Action) } + coalesce(m.action_count, 0)
+                } IN TRANSACTIONS OF 10000 ROWS
+            """)
+            compacted = session.run("""
+                MATCH (m:SessionSummary)
+                RETURN coalesce(sum(m.action_count), 0) AS actions, coalesce(sum(m.tool_calls), 0) AS tool_calls
+            """).single()
             result = session.run("""
                 OPTIONAL MATCH (s:Session) WITH count(s) as sessions
                 OPTIONAL MATCH (ac:Action) WITH sessions, count(ac) as actions
@@ -249,53 +706,300 @@ class Neo4jClient:
                 RETURN sessions, actions, tool_calls, agents, subagents
             """)
             record = result.single()
-            if record:
-                return {
-                    "total_sessions": record["sessions"],
-                    "total_actions": record["actions"],
-                    "total_tool_calls": record["tool_calls"],
-                    "agents": record["agents"],
-                    "subagents": record["subagents"]
-                }
-            return {"total_sessions": 0, "total_actions": 0, "total_tool_calls": 0, "agents": 0, "subagents": 0}
+            stats = {
+                "total_sessions": record["sessions"],
+                "total_actions": record["actions"] + compacted["actions"],
+                "total_tool_calls": record["tool_calls"] + compacted["tool_calls"],
+                "agents": record["agents"],
+                "subagents": record["subagents"]
+            }
+            session.run("""
+                MERGE (st:Stats {id: 'global'})
+                SET st += $stats
+            """, stats=stats)
+        self._bump_generation()
+        self._notify({"type": "reset"})
+        return stats
+
+    def get_tool_usage(self, by: Optional[str] = None, days: Optional[int] = None) -> list[dict]:
+        """Get tool usage statistics from the pre-aggregated Tool nodes.
 
-    def get_tool_usage(self) -> list[dict]:
-        """Get tool usage statistics."""
+        `by="agent"` or `by="day"` breaks usage down from the ToolDaily
+        buckets, optionally limited to the last `days` days.
+        """
         with self.driver.session() as session:
-            result = session.run("""
+            if by is None:
+                result = session.run(self._read("""
+                    MATCH (t:Tool)
+                    WHERE t.usage > 0
+                    RETURN t.name as tool, t.usage as usage, t.last_used as last_used,
+                           t.error_count as error_count
+                    ORDER BY usage DESC
+                """))
+                return [{"tool": r["tool"], "usage": r["usage"], "last_used": r["last_used"],
+                         "error_count": r["error_count"]} for r in result]
+
+            group_key = "d.agent_id" if by == "agent" else "d.day"
+            since = None
+            if days:
+                since = (datetime.now(timezone.utc) - timedelta(days=days)).date().isoformat()
+            result = session.run(self._read(f"""
+                MATCH (d:ToolDaily)
+                WHERE $since IS NULL OR d.day >= $since
+                WITH d.tool as tool, {group_key} as bucket,
+                     sum(d.usage) as usage, sum(d.error_count) as error_count
+                WHERE usage > 0 OR error_count > 0
+                RETURN tool, bucket, usage, error_count
+                ORDER BY bucket DESC, usage DESC
+            """), since=since)
+            return [{"tool": r["tool"], by: r["bucket"], "usage": r["usage"],
+                     "error_count": r["error_count"]} for r in result]
+
+    @classmethod
+    def _rebuild_since(cls, session) -> int:
+        last = session.run("MATCH (m:SessionSummary) RETURN max(m.last_ts) AS last").single()["last"]
+        return cls._rebuild_horizon(last)
+
+    def reconcile_tools(self):
+        """Rebuild Tool and ToolDaily nodes and USED_TOOL links from the Action nodes.
+
+        ToolDaily days before the compaction horizon are kept; Tool totals
+        are the sums of the daily nodes.
+        """
+        with self.driver.session() as session:
+            since = self._rebuild_since(session)
+            day = usage_hour(since)[:10]
+            if not since:
+                session.run("MATCH (t:Tool) DETACH DELETE t")
+            session.run("MATCH (d:ToolDaily) WHERE d.day >= $day DELETE d", day=day)
+            session.run("""
                 MATCH (ac:Action)
                 WHERE ac.type = 'tool_call' AND ac.name IS NOT NULL
-                WITH ac.name as tool, count(*) as usage, max(ac.timestamp) as last_used
-                RETURN tool, usage, last_used
-                ORDER BY usage DESC
+                CALL {
+                    WITH ac
+                    MERGE (t:Tool {name: ac.name})
+                    MERGE (ac)-[:USED_TOOL]->(t)
+                } IN TRANSACTIONS OF 10000 ROWS
             """)
-            return [{"tool": r["tool"], "usage": r["usage"], "last_used": r["last_used"]} 
-                    for r in result]
+            session.run("""
+                MATCH (a:Agent)-[:HAS_SESSION]->(:Session)-[:CONTAINS]->(ac:Action)
+                WHERE ac.type IN ['tool_call', 'tool_result'] AND ac.name IS NOT NULL
+                  AND substring(ac.timestamp, 0, 10) >= $day
+                WITH ac.name as tool, a.id as agent_id, substring(ac.timestamp, 0, 10) as day,
+                     count(CASE WHEN ac.type = 'tool_call' THEN 1 END) as usage,
+                     count(CASE WHEN ac.type = 'tool_result'
+                                 AND (ac.is_error = true OR ac.details CONTAINS "'is_error': True")
+                                THEN 1 END) as errors
+                CREATE (:ToolDaily {tool: tool, agent_id: agent_id, day: day,
+                                    usage: usage, error_count: errors})
+            """, day=day)
+            session.run("""
+                MATCH (d:ToolDaily)
+                WITH d.tool AS tool, sum(d.usage) AS usage, sum(d.error_count) AS errors
+                MERGE (t:Tool {name: tool})
+                SET t.usage = usage, t.error_count = errors
+                WITH t
+                OPTIONAL MATCH (ac:Action)-[:USED_TOOL]->(t)
+                WITH t, max(ac.timestamp) AS last_used
+                SET t.last_used = CASE WHEN last_used IS NOT NULL
+                                        AND (t.last_used IS NULL OR last_used > t.last_used)
+                                       THEN last_used ELSE t.last_used END
+            """)
+        self._bump_generation()
+        self._notify({"type": "reset"})
+
+    def reconcile_usage(self):
+        """Rebuild the UsageHourly rollups from the completion actions (from the compaction horizon on)."""
+        with self.driver.session() as session:
+            since = self._rebuild_since(session)
+            session.run("MATCH (u:UsageHourly) WHERE u.hour >= $hour DELETE u", hour=usage_hour(since))
+            session.run("""
+                MATCH (a:Agent)-[:HAS_SESSION]->(s:Session)-[:CONTAINS]->(ac:Action)
+                WHERE ac.type = 'completion' AND ac.ts IS NOT NULL AND ac.ts >= $since
+                WITH substring(toString(datetime({epochMillis: ac.ts})), 0, 13) AS hour,
+                     coalesce(ac.model, 'unknown') AS model, a.id AS agent_id, a.type AS agent_type,
+                     coalesce(s.channel, 'unknown') AS channel,
+                     count(*) AS completions, sum(coalesce(ac.tokens, 0)) AS tokens,
+                     sum(coalesce(ac.input_tokens, 0)) AS input_tokens,
+                     sum(coalesce(ac.output_tokens, 0)) AS output_tokens,
+                     sum(coalesce(ac.cost, 0.0)) AS cost
+                CREATE (:UsageHourly {hour: hour, model: model, agent_id: agent_id, agent_type: agent_type,
+                                      channel: channel, completions: completions, tokens: tokens,
+                                      input_tokens: input_tokens, output_tokens: output_tokens, cost: cost})
+            """, since=since)
+        self._bump_generation()
+        self._notify({"type": "reset"})
+
+    def get_usage(self, by: list[str], start: Optional[str] = None, end: Optional[str] = None,
+                  filters: Optional[dict] = None) -> list[dict]:
+        """Sum the UsageHourly rollups, grouped by the `by` dimensions."""
+        filters = filters or {}
+        keys = [f"u.{USAGE_DIMENSIONS[dim]}" if dim != "day" else "substring(u.hour, 0, 10)" for dim in by]
+        where = ["($start IS NULL OR u.hour >= $start)", "($end IS NULL OR u.hour <= $end)"]
+        where += [f"u.{USAGE_DIMENSIONS[dim]} = $filters.{dim}" for dim in filters]
+        returns = [f"{key} AS {dim}" for dim, key in zip(by, keys)]
+        returns += [f"sum(u.{metric}) AS {metric}" for metric in USAGE_METRICS]
+        with self.driver.session() as session:
+            result = session.run(self._read(f"""
+                MATCH (u:UsageHourly)
+                WHERE {' AND '.join(where)}
+                RETURN {', '.join(returns)}
+            """), start=start, end=end, filters=filters)
+            rows = [dict(r) for r in result]
+        return self._finish_usage([r for r in rows if r["completions"]], by)
+
+    def get_activity(self, resolution: str, start: int, end: int, by: list[str],
+                     filters: Optional[dict] = None) -> list[dict]:
+        """Action counts per bucket, summed from the ActivityBucket nodes (coarser ones kept as stored)."""
+        filters = filters or {}
+        fine = list(ACTIVITY_RESOLUTIONS)[:list(ACTIVITY_RESOLUTIONS).index(resolution) + 1]
+        # A coarser bucket that starts before `start` still overlaps the range
+        where = ["b.start > $start - $widest", "b.start < $end", "b.start > $start - $widths[b.resolution]"]
+        where += [f"b.{ACTIVITY_DIMENSIONS[dim]} = $filters.{dim}" for dim in filters]
+        returns = ["CASE WHEN b.resolution IN $fine THEN b.start - b.start % $size ELSE b.start END AS bucket",
+                   "CASE WHEN b.resolution IN $fine THEN $resolution ELSE b.resolution END AS resolution"]
+        returns += [f"b.{ACTIVITY_DIMENSIONS[dim]} AS {dim}" for dim in by]
+        with self.driver.session() as session:
+            result = session.run(self._read(f"""
+                MATCH (b:ActivityBucket)
+                WHERE {' AND '.join(where)}
+                RETURN {', '.join(returns)}, sum(b.count) AS count
+                ORDER BY bucket
+            """), fine=fine, resolution=resolution, start=start, end=end, filters=filters,
+                size=ACTIVITY_RESOLUTIONS[resolution], widths=ACTIVITY_RESOLUTIONS,
+                widest=max(ACTIVITY_RESOLUTIONS.values()))
+            return [dict(r) for r in result]
+
+    def get_session_summary(self, session_id: str) -> Optional[dict]:
+        """The SessionSummary of a session's compacted actions, if any."""
+        with self.driver.session() as session:
+            record = session.run(self._read("MATCH (m:SessionSummary {session_id: $session_id}) RETURN m {.*} AS m"),
+                                 session_id=session_id).single()
+        return self._summary_props(record["m"] if record else None)
 
     def session_exists(self, session_id: str) -> bool:
         """Check if a session has been synced."""
         with self.driver.session() as session:
-            result = session.run("""
+            result = session.run(self._read("""
                 MATCH (s:Session {id: $id})
                 RETURN count(s) > 0 as exists
-            """, id=session_id)
+            """), id=session_id)
             record = result.single()
             return record["exists"] if record else False
 
-    def clear_all(self):
-        """Clear all data (for testing)."""
+    def reconcile_agents(self):
+        """Recompute agent paths and depths from the SPAWNED links."""
         with self.driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
+            parents = {r["id"]: r["parent_id"] for r in session.run("""
+                MATCH (a:Agent)
+                OPTIONAL MATCH (parent:Agent)-[:SPAWNED]->(a)
+                RETURN a.id AS id, head(collect(parent.id)) AS parent_id
+            """)}
+            rows = [{"id": agent_id, "path": path, "depth": path.count("/")}
+                    for agent_id, path in self._agent_tree_paths(parents).items()]
+            session.run("""
+                UNWIND $rows AS row
+                MATCH (a:Agent {id: row.id})
+                SET a.path = row.path, a.depth = row.depth
+            """, rows=rows)
+        self._bump_generation()
 
+    def reconcile_activity(self):
+        """Rebuild the ActivityBucket nodes from the actions (from the compaction horizon on)."""
+        cutoffs = activity_cutoffs()
+        with self.driver.session() as session:
+            since = self._rebuild_since(session)
+            session.run("MATCH (b:ActivityBucket) WHERE b.start >= $since DELETE b", since=since)
+            session.run("""
+                MATCH (s:Session)-[:CONTAINS]->(ac:Action)
+                WHERE ac.ts IS NOT NULL AND ac.ts >= $since
+                OPTIONAL MATCH (a:Agent)-[:HAS_SESSION]->(s)
+                WITH ac, coalesce(a.id, 'unknown') AS agent_id,
+                     CASE WHEN ac.ts >= $cutoffs.minute THEN 'minute'
+                          WHEN ac.ts >= $cutoffs.hour THEN 'hour' ELSE 'day' END AS resolution
+                WITH resolution, ac.ts - ac.ts % $sizes[resolution] AS start, ac.type AS type, agent_id,
+                     count(*) AS count
+                CREATE (:ActivityBucket {resolution: resolution, start: start, type: type,
+                                         agent_id: agent_id, count: count})
+            """, cutoffs=cutoffs, sizes=ACTIVITY_RESOLUTIONS, since=since)
+        self._bump_generation()
 
-# Singleton instance
-_client: Optional[Neo4jClient] = None
+    def compact_activity(self, cutoffs: Optional[dict] = None) -> int:
+        """Fold minute buckets past retention into hours and hours into days."""
+        cutoffs = cutoffs or activity_cutoffs()
+        folded = 0
+        with self.driver.session() as session:
+            for fine, coarse in (("minute", "hour"), ("hour", "day")):
+                folded += session.run("""
+                    MATCH (b:ActivityBucket {resolution: $fine})
+                    WHERE b.start < $cutoff
+                    WITH b.start - b.start % $size AS start, b.type AS type, b.agent_id AS agent_id,
+                         sum(b.count) AS count, collect(b) AS buckets
+                    MERGE (c:ActivityBucket {resolution: $coarse, start: start, type: type, agent_id: agent_id})
+                    SET c.count = coalesce(c.count, 0) + count
+                    FOREACH (b IN buckets | DELETE b)
+                    RETURN sum(size(buckets)) AS folded
+                """, fine=fine, coarse=coarse, cutoff=cutoffs[fine],
+                    size=ACTIVITY_RESOLUTIONS[coarse]).single()["folded"] or 0
+        if folded:
+            self._bump_generation()
+        return folded
 
+    def expired_sessions(self, before: int, limit: int = 100) -> list[str]:
+        """Ids of sessions whose latest action is older than `before`, oldest first."""
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (s:Session)
+                WHERE s.started_ts < $before
+                CALL {
+                    WITH s
+                    MATCH (s)-[:CONTAINS]->(ac:Action)
+                    RETURN max(ac.ts) AS last_ts
+                }
+                WITH s, last_ts WHERE last_ts < $before
+                RETURN s.id AS id
+                ORDER BY s.started_ts
+                LIMIT $limit
+            """, before=before, limit=limit)
+            return [r["id"] for r in result]
+
+    def compact_session_batch(self, session_id: str, batch_size: int = 1000,
+                              archive: Optional[Callable[[str, list[dict]], None]] = None) -> int:
+        """Fold a session's oldest actions into its SessionSummary and detach-delete them."""
+        # An explicit transaction: a retried transaction function would archive twice
+        with self.driver.session() as session:
+            with session.begin_transaction() as tx:
+                rows = [r["action"] for r in tx.run("""
+                    MATCH (:Session {id: $session_id})-[:CONTAINS]->(ac:Action)
+                    OPTIONAL MATCH (prev:Action)-[:FOLLOWED_BY]->(ac)
+                    RETURN ac {.*, prev: prev.id} AS action
+                    ORDER BY ac.ts, ac.id
+                    LIMIT $limit
+                """, session_id=session_id, limit=batch_size)]
+                if not rows:
+                    return 0
+                record = tx.run("MATCH (m:SessionSummary {session_id: $session_id}) RETURN m {.*} AS summary",
+                                session_id=session_id).single()
+                summary = self._merge_summary(record["summary"] if record else None, session_id, rows,
+                                              archived=archive is not None)
+                if archive:
+                    archive(session_id, rows)
+                tx.run("""
+                    MATCH (s:Session {id: $session_id})
+                    MERGE (s)-[:SUMMARIZED_AS]->(m:SessionSummary {session_id: $session_id})
+                    SET m += $summary
+                """, session_id=session_id, summary=summary)
+                tx.run("""
+                    UNWIND $ids AS id
+                    MATCH (ac:Action {id: id})
+                    DETACH DELETE ac
+                """, ids=[r["id"] for r in rows])
+                tx.commit()
+        return len(rows)
 
-def get_client() -> Neo4jClient:
-    """Get the Neo4j client singleton."""
-    global _client
-    if _client is None:
-        _client = Neo4jClient()
-        _client.connect()
-    return _client
+    def clear_all(self):
+        """Clear all data (for testing)."""
+        with self.driver.session() as session:
+            session.run("MATCH (n) DETACH DELETE n")
+        self._bump_generation()
+        self._notify({"type": "reset"})
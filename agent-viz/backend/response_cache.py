@@ -0,0 +1,87 @@
+"""Generation-versioned response cache for the read endpoints.
+
+Every committed ingest bumps the data generation on the graph store.
+Cached responses remember the generation they were rendered at and are
+dropped as soon as it moves on, and the ETag handed to clients is derived
+from it and the cache key, so a poll between syncs is answered with a 304
+and no DB work. Endpoints resolve "now"-relative windows into their
+parameters, so the key (and the ETag) moves on with the clock too.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        # key -> (generation, rendered body)
+        self._entries: OrderedDict[tuple, tuple[int, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Generations restart at 0 with the process; keep ETags from colliding
+        self._boot_id = uuid.uuid4().hex[:8]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(endpoint: str, params: dict) -> tuple:
+        """Build a cache key from an endpoint name and its query parameters."""
+        return (endpoint,) + tuple(sorted(params.items()))
+
+    def etag(self, key: tuple, generation: int, variant: str = "") -> str:
+        """ETag for the response to `key` rendered at `generation` in encoding `variant`."""
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=6).hexdigest()
+        suffix = f"-{variant}" if variant else ""
+        return f'"{self._boot_id}-{generation}-{digest}{suffix}"'
+
+    def get(self, key: tuple, generation: int) -> Optional[bytes]:
+        """Return the cached body for `key` if it was rendered at `generation`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: tuple, generation: int, body: bytes):
+        """Cache a rendered body, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (generation, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Cache size and hit/miss counters."""
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size,
+                    "hits": self.hits, "misses": self.misses}
+
+
+# Singleton instance
+_cache: Optional[ResponseCache] = None
+
+
+def get_cache() -> ResponseCache:
+    """Get the response cache singleton."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
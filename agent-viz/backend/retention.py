@@ -0,0 +1,142 @@
+"""Retention: collapse old sessions into summaries and drop their actions.
+
+A session whose latest action is older than `RETENTION_DAYS` keeps its
+Session node and gets a SessionSummary (action counts per type, tool
+histogram, tokens, cost, first/last timestamps); its Action nodes and their
+FOLLOWED_BY chains are deleted a batch per transaction. With
+`RETENTION_ARCHIVE_DIR` set, the raw actions are first appended to
+`<dir>/<session_id>.jsonl.gz`, which `/api/session/{id}/archive` reads back.
+The archive is written before the batch's transaction commits, so a batch
+whose transaction fails is offered again on the next pass; rows at or
+before the last archived (ts, id) are skipped on write and on read.
+The tool, usage and activity rollups are left as they are.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Optional
+from dotenv import load_dotenv
+
+from storage import GraphStore, epoch_ms
+
+load_dotenv()
+
+# 0 disables retention
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "0"))
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+# Actions deleted per transaction, and sessions compacted per pass
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_SESSIONS = int(os.getenv("RETENTION_SESSIONS", "100"))
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "")
+
+
+class ActionArchive:
+    """Gzipped JSON-lines files of compacted actions, one per session."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, session_id: str) -> str:
+        if os.path.basename(session_id) != session_id or session_id in ("", ".", ".."):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        return os.path.join(self.directory, f"{session_id}.jsonl.gz")
+
+    def mark_path(self, session_id: str) -> str:
+        """File holding the (ts, id) of the last action archived for a session."""
+        return self.path(session_id)[:-len(".jsonl.gz")] + ".last"
+
+    def write(self, session_id: str, rows: list[dict]):
+        """Append a batch of action rows (each batch is its own gzip member).
+
+        Rows at or before the last archived action were already written by a
+        pass whose transaction then failed, and are skipped.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        last = self._last(session_id)
+        rows = [row for row in rows if last is None or _key(row) > last]
+        if not rows:
+            return
+        with gzip.open(self.path(session_id), "at", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+        with open(self.mark_path(session_id), "w") as f:
+            json.dump(_key(rows[-1]), f)
+
+    def read(self, session_id: str, offset: int = 0, limit: int = 200) -> Optional[list[dict]]:
+        """A slice of a session's archived actions in time order, or None if it has no archive."""
+        path = self.path(session_id)
+        if not os.path.exists(path):
+            return None
+        return list(islice(self._rows(path), offset, offset + limit))
+
+    def _last(self, session_id: str) -> Optional[tuple]:
+        try:
+            with open(self.mark_path(session_id)) as f:
+                return tuple(json.load(f))
+        except FileNotFoundError:
+            pass
+        # Archives from before the mark file (or a write interrupted before it): scan once
+        path = self.path(session_id)
+        last = None
+        if os.path.exists(path):
+            for row in self._rows(path):
+                last = _key(row)
+        return last
+
+    @staticmethod
+    def _rows(path: str):
+        """Archived rows in order, without the repeats a failed compaction pass left behind."""
+        last = None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if last is None or _key(row) > last:
+                    last = _key(row)
+                    yield row
+
+
+def _key(row: dict) -> tuple:
+    return (row.get("ts") or 0, row["id"])
+
+
+def get_archive() -> Optional[ActionArchive]:
+    """The configured action archive, or None when archiving is off."""
+    return ActionArchive(RETENTION_ARCHIVE_DIR) if RETENTION_ARCHIVE_DIR else None
+
+
+def run_retention(store: GraphStore, days: float = RETENTION_DAYS, sessions: int = RETENTION_SESSIONS,
+                  batch_size: int = RETENTION_BATCH_SIZE, archive: Optional[ActionArchive] = None) -> dict:
+    """Compact up to `sessions` sessions idle for more than `days` days."""
+    before = epoch_ms(datetime.now(timezone.utc) - timedelta(days=days))
+    started = time.perf_counter()
+    totals = store.compact_sessions(before, limit=sessions, batch_size=batch_size,
+                                    archive=archive.write if archive else None)
+    totals["elapsed"] = round(time.perf_counter() - started, 2)
+    return totals
+
+
+if __name__ == "__main__":
+    import argparse
+    from storage import get_client
+
+    parser = argparse.ArgumentParser(description="Compact sessions older than the retention age")
+    parser.add_argument("--days", type=float, default=RETENTION_DAYS or None, required=not RETENTION_DAYS,
+                        help="compact sessions with no actions in this many days")
+    parser.add_argument("--archive-dir", default=RETENTION_ARCHIVE_DIR,
+                        help="append the deleted actions to gzipped files here")
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE, help="actions per transaction")
+    args = parser.parse_args()
+
+    archive = ActionArchive(args.archive_dir) if args.archive_dir else None
+    total = {"sessions": 0, "actions": 0}
+    while True:
+        result = run_retention(get_client(), args.days, batch_size=args.batch_size, archive=archive)
+        print(f"Compacted {result['sessions']} sessions, {result['actions']} actions in {result['elapsed']}s")
+        total["sessions"] += result["sessions"]
+        total["actions"] += result["actions"]
+        if result["sessions"] < RETENTION_SESSIONS:
+            break
+    print(f"Done: {total['sessions']} sessions, {total['actions']} actions")
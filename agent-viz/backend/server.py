@@ -3,20 +3,54 @@
 FastAPI server for the Agent Visualization dashboard.
 """
 import os
+import asyncio
 import threading
-from typing import Optional
-from fastapi import FastAPI, HTTPException
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Optional, Callable, Any
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import uvicorn
 
-from neo4j_client import get_client
-from sync_sessions import sync_all_sessions, parse_session_file
+from storage import (get_client, decode_cursor, MAX_PAGE_SIZE, parse_time, epoch_ms, usage_hour, USAGE_DIMENSIONS, USAGE_METRICS,
+                     ACTIVITY_RESOLUTIONS, ACTIVITY_DIMENSIONS, STORAGE_BACKEND)
+from response_cache import get_cache
+import encoding
+from event_hub import get_hub
+from metrics import HTTP_REQUEST_SECONDS, sync_state
+from sync_sessions import start_watcher
+from sync_jobs import get_sync_jobs
+from retention import run_retention, get_archive, RETENTION_DAYS, RETENTION_INTERVAL
 
 load_dotenv()
 
+WATCH_SESSIONS = os.getenv("WATCH_SESSIONS", "true").lower() == "true"
+
+# Blocking store calls run on this bounded pool, never on the event loop.
+# With Neo4j, keep API_DB_WORKERS at or below NEO4J_MAX_POOL_SIZE.
+API_DB_WORKERS = int(os.getenv("API_DB_WORKERS", "16"))
+API_QUERY_TIMEOUT = float(os.getenv("API_QUERY_TIMEOUT", "15"))
+_db_executor = ThreadPoolExecutor(max_workers=API_DB_WORKERS, thread_name_prefix="db")
+
+# /api/activity: default window per resolution (buckets), and the most one request may span
+ACTIVITY_DEFAULT_BUCKETS = {"minute": 360, "hour": 168, "day": 90}
+ACTIVITY_MAX_BUCKETS = int(os.getenv("ACTIVITY_MAX_BUCKETS", "5000"))
+# Seconds between activity compaction passes
+ACTIVITY_COMPACT_INTERVAL = float(os.getenv("ACTIVITY_COMPACT_INTERVAL", "600"))
+
+# /api/health reports "degraded" once a watched file has waited this long to sync
+HEALTH_MAX_LAG = float(os.getenv("HEALTH_MAX_LAG", "60"))
+HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "5"))
+
+# (observer, event queue) once the session watcher is running
+_watcher = None
+
 app = FastAPI(
     title="Agent-Viz API",
     description="API for visualizing Clawdbot agent activity",
@@ -33,96 +67,470 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Observe request latency per route template (not per raw path)."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(request.method, route.path if route else "unmatched",
+                                    str(status)).observe(time.perf_counter() - started)
+
+
+async def run_db(fn: Callable, *args, timeout: Optional[float] = API_QUERY_TIMEOUT, **kwargs):
+    """Run a blocking data-layer call on the DB executor with a per-request timeout."""
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_db_executor, partial(fn, *args, **kwargs))
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Database query timed out")
+
+
+async def cached_response(request: Request, endpoint: str, params: dict,
+                          compute: Callable[[], Any], media_type: str = encoding.JSON) -> Response:
+    """Serve a read endpoint from the generation-versioned response cache.
+
+    Clients that send back the current ETag get a 304 without any DB work;
+    otherwise the rendered body (and its gzip variant, for clients that
+    accept it) is reused until the next committed sync.
+    """
+    cache = get_cache()
+    generation = get_client().generation
+    variant = next(name for name, value in encoding.FORMATS.items() if value == media_type)
+    key = cache.key(endpoint, {**params, "_type": media_type})
+    etag = cache.etag(key, generation, "" if variant == "json" else variant)
+    gzip_etag = cache.etag(key, generation, f"{variant}-gz")
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+    
+    if_none_match = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    for tag in (etag, gzip_etag):
+        if tag in if_none_match:
+            return Response(status_code=304, headers={**headers, "ETag": tag})
+    
+    gzip_key = key + ("gzip",)
+    if encoding.accepts_gzip(request.headers.get("accept-encoding", "")):
+        body = cache.get(gzip_key, generation)
+        if body is not None:
+            return Response(content=body, media_type=media_type,
+                            headers={**headers, "ETag": gzip_etag, "Content-Encoding": "gzip"})
+        body = await render_body(key, generation, compute, media_type)
+        if len(body) >= encoding.GZIP_MIN_SIZE:
+            body = await run_db(encoding.compress, body)
+            cache.put(gzip_key, generation, body)
+            return Response(content=body, media_type=media_type,
+                            headers={**headers, "ETag": gzip_etag, "Content-Encoding": "gzip"})
+    else:
+        body = await render_body(key, generation, compute, media_type)
+    return Response(content=body, media_type=media_type, headers={**headers, "ETag": etag})
+
+
+async def render_body(key: tuple, generation: int, compute: Callable[[], Any], media_type: str) -> bytes:
+    """Return the cached body for `key`, rendering and caching it on a miss."""
+    cache = get_cache()
+    body = cache.get(key, generation)
+    if body is None:
+        # Query and serialize off the event loop
+        body = await run_db(lambda: encoding.encode(compute(), media_type))
+        cache.put(key, generation, body)
+    return body
+
+
+def negotiate_format(request: Request, fmt: Optional[str]) -> str:
+    """Media type for a graph response, from `?format=` or the Accept header."""
+    try:
+        return encoding.negotiate(fmt, request.headers.get("accept", ""), columnar=True)
+    except ValueError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+
+def check_cursor(cursor: Optional[str]):
+    """Reject a malformed page cursor with a 400 before any DB work."""
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.on_event("startup")
 async def startup():
     """Initialize on startup."""
-    # Ensure Neo4j connection
-    client = get_client()
-    print("Connected to Neo4j")
+    # Ensure the graph store is connected
+    client = await run_db(get_client, timeout=None)
+    print(f"Connected to {STORAGE_BACKEND} store")
+
+    # Push every committed ingest to /api/events subscribers
+    hub = get_hub()
+    hub.bind(asyncio.get_running_loop())
+    client.add_listener(hub.publish)
     
-    # Initial sync in background
+    # Initial sync in background, through the job manager so manual syncs coalesce with it
     def initial_sync():
+        global _watcher
         print("Running initial session sync...")
-        sync_all_sessions()
+        _, job = get_sync_jobs().submit(source="startup")
+        job.wait()
         print("Initial sync complete")
+        if WATCH_SESSIONS:
+            _watcher = start_watcher()
     
     thread = threading.Thread(target=initial_sync)
     thread.daemon = True
     thread.start()
 
+    # Age fine-grained activity buckets into coarser ones
+    def compact_activity():
+        while True:
+            try:
+                folded = client.compact_activity()
+                if folded:
+                    print(f"Compacted {folded} activity buckets")
+            except Exception as e:
+                print(f"Activity compaction failed: {e}")
+            time.sleep(ACTIVITY_COMPACT_INTERVAL)
+
+    threading.Thread(target=compact_activity, daemon=True, name="activity-compaction").start()
+
+    # Collapse sessions past the retention age into summaries
+    def retention():
+        while True:
+            try:
+                result = run_retention(client, archive=get_archive())
+                if result["sessions"]:
+                    print(f"Retention compacted {result['sessions']} sessions "
+                          f"({result['actions']} actions) in {result['elapsed']}s")
+            except Exception as e:
+                print(f"Retention failed: {e}")
+            time.sleep(RETENTION_INTERVAL)
+
+    if RETENTION_DAYS > 0:
+        threading.Thread(target=retention, daemon=True, name="retention").start()
+
 
 @app.on_event("shutdown")
 async def shutdown():
     """Cleanup on shutdown."""
-    from neo4j_client import _client
+    if _watcher:
+        observer, queue = _watcher
+        observer.stop()
+        queue.stop()
+    
+    from storage import _client
     if _client:
         _client.close()
+    _db_executor.shutdown(wait=False)
+
+
+def _timestamp(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
 
 
 @app.get("/api/health")
 async def health():
-    """Health check."""
-    return {"status": "ok"}
+    """Probe the store and report sync freshness.
+
+    503 when the store does not answer; "degraded" when the watcher has a
+    file that has waited more than HEALTH_MAX_LAG seconds to sync.
+    """
+    status = "ok"
+    started = time.perf_counter()
+    try:
+        await run_db(lambda: get_client().ping(), timeout=HEALTH_TIMEOUT)
+        store = {"backend": STORAGE_BACKEND, "ok": True,
+                 "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+    except Exception as e:
+        status = "unavailable"
+        store = {"backend": STORAGE_BACKEND, "ok": False, "error": getattr(e, "detail", None) or str(e)}
+    
+    now = time.time()
+    last_ingest = sync_state["last_ingest"]
+    sync = {
+        "last_full_sync": _timestamp(sync_state["last_run"]),
+        "last_ingest": _timestamp(last_ingest),
+        "last_ingest_age": round(now - last_ingest, 1) if last_ingest else None,
+        "watching": _watcher is not None,
+        "full_sync_running": get_sync_jobs().running is not None,
+    }
+    if _watcher:
+        queue = _watcher[1].stats()
+        sync.update(queue_depth=queue["depth"], oldest_pending_age=round(queue["oldest_pending_age"], 1),
+                    last_lag=queue["last_lag"])
+        if status == "ok" and queue["oldest_pending_age"] > HEALTH_MAX_LAG:
+            status = "degraded"
+    
+    return JSONResponse({"status": status, "store": store, "sync": sync},
+                        status_code=503 if status == "unavailable" else 200)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request and store latency, sync throughput, watcher lag."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.get("/api/agents")
-async def get_agents():
+async def get_agents(request: Request):
     """Get all agents."""
     client = get_client()
-    agents = client.get_all_agents()
-    return {"agents": agents}
+    return await cached_response(request, "agents", {},
+                                 lambda: {"agents": client.get_all_agents()})
+
+
+@app.get("/api/agents/tree")
+async def get_agent_tree(root: Optional[str] = None, depth: int = 1, limit: int = 200,
+                         cursor: Optional[str] = None):
+    """The agents under `root` (or the top-level agents), at most `depth` levels down, in ancestry order."""
+    if depth < 0:
+        raise HTTPException(status_code=400, detail="depth must be >= 0")
+    client = get_client()
+    check_cursor(cursor)
+    data = await run_db(client.get_agent_tree, root=root, depth=depth, limit=limit, cursor=cursor)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return data
 
 
 @app.get("/api/sessions")
-async def get_sessions(limit: int = 50):
-    """Get recent sessions."""
+async def get_sessions(request: Request, limit: int = 50, cursor: Optional[str] = None):
+    """Get a page of recent sessions; pass `next_cursor` back as `cursor` for the next."""
     client = get_client()
-    sessions = client.get_recent_sessions(limit=limit)
-    return {"sessions": sessions}
+    check_cursor(cursor)
+    return await cached_response(request, "sessions", {"limit": limit, "cursor": cursor},
+                                 lambda: client.get_recent_sessions(limit=limit, cursor=cursor))
 
 
 @app.get("/api/session/{session_id}")
-async def get_session(session_id: str):
-    """Get a session with all its actions."""
+async def get_session(session_id: str, limit: int = 200, cursor: Optional[str] = None,
+                      types: Optional[str] = None):
+    """Get a session with a page of its actions, optionally filtered by comma-separated `types`."""
     client = get_client()
-    data = client.get_session_with_actions(session_id)
+    check_cursor(cursor)
+    type_list = [t for t in types.split(",") if t] if types else None
+    data = await run_db(client.get_session_with_actions, session_id,
+                        limit=limit, cursor=cursor, types=type_list)
     if not data["session"]:
         raise HTTPException(status_code=404, detail="Session not found")
+    data["summary"] = await run_db(client.get_session_summary, session_id)
     return data
 
 
+@app.get("/api/session/{session_id}/archive")
+async def get_session_archive(session_id: str, offset: int = 0, limit: int = 200):
+    """Archived actions of a compacted session, in time order."""
+    archive = get_archive()
+    if archive is None:
+        raise HTTPException(status_code=404, detail="Action archiving is not enabled")
+    limit = min(limit, MAX_PAGE_SIZE)
+    try:
+        actions = await run_db(archive.read, session_id, offset, limit + 1)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if actions is None:
+        raise HTTPException(status_code=404, detail="No archived actions for this session")
+    return {"session_id": session_id, "actions": actions[:limit],
+            "next_offset": offset + limit if len(actions) > limit else None}
+
+
+@app.get("/api/actions")
+async def get_actions(start: Optional[str] = Query(None, alias="from"), end: Optional[str] = Query(None, alias="to"),
+                      type: Optional[str] = None, agent: Optional[str] = None, limit: int = 200,
+                      cursor: Optional[str] = None):
+    """Actions in a time range, newest first.
+
+    `from`/`to` are ISO 8601 or epoch milliseconds (`to` is exclusive);
+    `type` is a comma-separated list of action types, `agent` an agent id.
+    """
+    client = get_client()
+    check_cursor(cursor)
+    try:
+        start_ms = parse_time(start) if start else None
+        end_ms = parse_time(end) if end else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    type_list = [t for t in type.split(",") if t] if type else None
+    return await run_db(client.get_actions, start_ms, end_ms, types=type_list, agent_id=agent,
+                        limit=limit, cursor=cursor)
+
+
 @app.get("/api/graph")
-async def get_graph(limit: int = 100):
-    """Get graph data for visualization."""
+async def get_graph(request: Request, limit: int = 100, format: Optional[str] = None):
+    """Get graph data for visualization (`format=json|columnar|msgpack`)."""
     client = get_client()
-    return client.get_graph_data(limit=limit)
+    media_type = negotiate_format(request, format)
+    return await cached_response(request, "graph", {"limit": limit},
+                                 lambda: client.get_graph_data(limit=limit), media_type)
+
+
+@app.get("/api/graph/delta")
+async def get_graph_delta(request: Request, since: int = 0, limit: int = 2000,
+                          format: Optional[str] = None):
+    """Get graph nodes and edges written after the `since` cursor."""
+    client = get_client()
+    media_type = negotiate_format(request, format)
+    return await cached_response(request, "graph_delta", {"since": since, "limit": limit},
+                                 lambda: client.get_graph_delta(since, limit=limit), media_type)
 
 
 @app.get("/api/stats")
-async def get_stats():
+async def get_stats(request: Request):
     """Get aggregate statistics."""
     client = get_client()
-    return client.get_stats()
+    return await cached_response(request, "stats", {}, client.get_stats)
+
+
+@app.post("/api/stats/reconcile")
+async def reconcile_stats():
+    """Recompute the aggregate counters, Tool nodes, rollups and agent paths from scratch."""
+    client = get_client()
+    await run_db(client.reconcile_agents, timeout=None)
+    await run_db(client.reconcile_tools, timeout=None)
+    await run_db(client.reconcile_usage, timeout=None)
+    await run_db(client.reconcile_activity, timeout=None)
+    return await run_db(client.reconcile_stats, timeout=None)
 
 
 @app.get("/api/tools")
-async def get_tool_usage():
-    """Get tool usage statistics."""
+async def get_tool_usage(request: Request, by: Optional[str] = None, days: Optional[int] = None):
+    """Get tool usage statistics, optionally broken down by agent or day."""
+    if by not in (None, "agent", "day"):
+        raise HTTPException(status_code=400, detail="by must be 'agent' or 'day'")
+    client = get_client()
+    # The first day a `days` window covers, so the cache key and ETag move on at midnight
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).date().isoformat() if days else None
+    return await cached_response(request, "tools", {"by": by, "days": days, "since": since},
+                                 lambda: {"tools": client.get_tool_usage(by=by, days=days)})
+
+
+@app.get("/api/usage")
+async def get_usage(request: Request, by: str = "model", start: Optional[str] = Query(None, alias="from"),
+                    end: Optional[str] = Query(None, alias="to"), days: Optional[int] = None,
+                    model: Optional[str] = None, agent: Optional[str] = None,
+                    agent_type: Optional[str] = None, channel: Optional[str] = None):
+    """Token and cost totals from the hourly rollups.
+
+    `by` is a comma-separated list of model, agent, agent_type, channel,
+    hour and day; `from`/`to` (ISO 8601 or epoch ms, `to` exclusive) or
+    `days` limit the range to whole hours; the other parameters filter.
+    """
+    dims = [d for d in by.split(",") if d]
+    unknown = [d for d in dims if d not in USAGE_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown usage dimension(s) {unknown}; use {sorted(USAGE_DIMENSIONS)}")
+    try:
+        start_ms = parse_time(start) if start else None
+        end_ms = parse_time(end) if end else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if days and start_ms is None:
+        start_ms = int((datetime.now(timezone.utc) - timedelta(days=days)).timestamp() * 1000)
+    first = usage_hour(start_ms) if start_ms is not None else None
+    last = usage_hour(end_ms - 1) if end_ms is not None else None
+    filters = {k: v for k, v in (("model", model), ("agent", agent), ("agent_type", agent_type),
+                                 ("channel", channel)) if v}
+    client = get_client()
+
+    def load():
+        rows = client.get_usage(dims, first, last, filters)
+        totals = {metric: sum(r[metric] for r in rows) for metric in USAGE_METRICS}
+        totals["cost"] = round(totals["cost"], 6)
+        return {"usage": rows, "totals": totals}
+
+    return await cached_response(request, "usage", {"by": ",".join(dims), "from": first, "to": last, **filters}, load)
+
+
+@app.get("/api/activity")
+async def get_activity(request: Request, resolution: str = "hour", start: Optional[str] = Query(None, alias="from"),
+                       end: Optional[str] = Query(None, alias="to"), by: str = "",
+                       type: Optional[str] = None, agent: Optional[str] = None):
+    """Action counts per minute, hour or day bucket.
+
+    `from`/`to` are ISO 8601 or epoch milliseconds (`to` exclusive, default
+    now; `from` defaults to a window that suits the resolution); `by` is a
+    comma-separated list of type and agent, and `type`/`agent` filter.
+    Every bucket carries its `resolution`: ranges already compacted into
+    coarser buckets are returned at the coarser resolution.
+    """
+    if resolution not in ACTIVITY_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {list(ACTIVITY_RESOLUTIONS)}")
+    dims = [d for d in by.split(",") if d]
+    unknown = [d for d in dims if d not in ACTIVITY_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown activity dimension(s) {unknown}; use {list(ACTIVITY_DIMENSIONS)}")
+    size = ACTIVITY_RESOLUTIONS[resolution]
+    try:
+        end_ms = parse_time(end) if end else epoch_ms(datetime.now(timezone.utc))
+        start_ms = parse_time(start) if start else end_ms - ACTIVITY_DEFAULT_BUCKETS[resolution] * size
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Whole buckets: round the range out to the resolution
+    start_ms -= start_ms % size
+    end_ms += -end_ms % size
+    if (end_ms - start_ms) // size > ACTIVITY_MAX_BUCKETS:
+        raise HTTPException(status_code=400,
+                            detail=f"Range spans more than {ACTIVITY_MAX_BUCKETS} {resolution} buckets")
+    filters = {k: v for k, v in (("type", type), ("agent", agent)) if v}
     client = get_client()
-    return {"tools": client.get_tool_usage()}
+
+    def load():
+        return {"resolution": resolution, "from": start_ms, "to": end_ms,
+                "buckets": client.get_activity(resolution, start_ms, end_ms, dims, filters)}
+
+    return await cached_response(request, "activity", {"resolution": resolution, "from": start_ms, "to": end_ms,
+                                                       "by": ",".join(dims), **filters}, load)
 
 
-@app.post("/api/sync")
+@app.post("/api/sync", status_code=202)
 async def trigger_sync(force: bool = False):
-    """Trigger a manual sync."""
-    def do_sync():
-        sync_all_sessions(force=force)
-    
-    thread = threading.Thread(target=do_sync)
-    thread.daemon = True
-    thread.start()
-    
-    return {"status": "sync_started"}
+    """Request a full sync: starts one, joins the running one, or queues a follow-up."""
+    outcome, job = get_sync_jobs().submit(force=force)
+    return {"status": outcome, "job": job.snapshot()}
+
+
+@app.get("/api/sync/status")
+async def get_sync_status():
+    """The running and queued sync jobs with progress, and recently finished ones."""
+    return get_sync_jobs().status()
+
+
+@app.post("/api/sync/cancel")
+async def cancel_sync():
+    """Cancel the running sync after the files in flight, and drop any queued one."""
+    job = get_sync_jobs().cancel()
+    if job is None:
+        raise HTTPException(status_code=404, detail="No sync is running")
+    return {"status": "cancelling", "job": job}
+
+
+@app.get("/api/sync/queue")
+async def get_sync_queue():
+    """Watcher queue depth and end-to-end ingestion lag."""
+    if not _watcher:
+        return {"watching": False}
+    _, queue = _watcher
+    return {"watching": True, **queue.stats()}
+
+
+@app.get("/api/events")
+async def stream_events(request: Request):
+    """Server-Sent Events stream of ingest events (new sessions, actions, counters)."""
+    hub = get_hub()
+    sub = hub.subscribe()
+    return StreamingResponse(hub.stream(sub, request.is_disconnected), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/api/events/stats")
+async def get_event_stats():
+    """Connected event subscribers and their backlog."""
+    return get_hub().stats()
 
 
 # Serve frontend
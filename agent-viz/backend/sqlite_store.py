@@ -0,0 +1,948 @@
+"""Embedded SQLite graph store for single-host deployments, tests and benchmarks.
+
+Implements the same `GraphStore` interface as the Neo4j client with plain
+tables: FOLLOWED_BY is the `prev_id` column of an action, SPAWNED the
+`parent_id` of an agent, and the Stats/Tool/ToolDaily/UsageHourly/ActivityBucket
+aggregates are the `stats`, `tools`, `tool_daily`, `usage_hourly` and
+`activity` tables. Writes go through one connection
+and are serialized; with a database file (WAL mode) each reader thread has
+its own connection and never waits for an ingest to commit. `:memory:`
+shares the single connection.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Iterable, Callable
+
+from storage import (GraphStore, STATS_KEYS, MAX_PAGE_SIZE, USAGE_METRICS, USAGE_DIMENSIONS,
+                     ACTIVITY_RESOLUTIONS, ACTIVITY_DIMENSIONS, encode_cursor, decode_cursor, epoch_ms,
+                     parse_details, usage_fields, activity_cutoffs, usage_hour)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                    "agent_viz.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agents (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    type TEXT,
+    created_at TEXT,
+    parent_id TEXT,
+    requester_id TEXT,
+    path TEXT,
+    depth INTEGER,
+    seq INTEGER
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    agent_id TEXT,
+    label TEXT,
+    channel TEXT,
+    started_at TEXT,
+    started_ts INTEGER,
+    model TEXT,
+    cwd TEXT,
+    seq INTEGER,
+    action_count INTEGER NOT NULL DEFAULT 0,
+    session_key TEXT,
+    requester_key TEXT
+);
+CREATE TABLE IF NOT EXISTS actions (
+    id TEXT PRIMARY KEY,
+    session_id TEXT,
+    type TEXT,
+    name TEXT,
+    timestamp TEXT,
+    ts INTEGER,
+    details TEXT,
+    is_error INTEGER,
+    prev_id TEXT,
+    seq INTEGER,
+    model TEXT,
+    tokens INTEGER,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    cost REAL
+);
+CREATE TABLE IF NOT EXISTS tools (
+    name TEXT PRIMARY KEY,
+    usage INTEGER NOT NULL DEFAULT 0,
+    error_count INTEGER NOT NULL DEFAULT 0,
+    last_used TEXT
+);
+CREATE TABLE IF NOT EXISTS tool_daily (
+    tool TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    usage INTEGER NOT NULL DEFAULT 0,
+    error_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tool, agent_id, day)
+);
+CREATE TABLE IF NOT EXISTS usage_hourly (
+    hour TEXT NOT NULL,
+    model TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    agent_type TEXT,
+    completions INTEGER NOT NULL DEFAULT 0,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, model, agent_id, channel)
+);
+CREATE TABLE IF NOT EXISTS activity (
+    resolution TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (resolution, start, type, agent_id)
+);
+CREATE TABLE IF NOT EXISTS session_summaries (
+    session_id TEXT PRIMARY KEY,
+    action_count INTEGER NOT NULL,
+    tool_calls INTEGER NOT NULL,
+    types TEXT NOT NULL,
+    tools TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    first_ts INTEGER,
+    first_at TEXT,
+    last_ts INTEGER,
+    last_id TEXT,
+    last_at TEXT,
+    archived INTEGER NOT NULL,
+    compacted_at TEXT
+);
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Created after migrations, which may add the columns they cover
+INDEXES = """
+CREATE INDEX IF NOT EXISTS agents_parent ON agents (parent_id);
+CREATE INDEX IF NOT EXISTS agents_requester ON agents (requester_id);
+CREATE INDEX IF NOT EXISTS agents_path ON agents (path);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions (started_ts, id);
+CREATE INDEX IF NOT EXISTS sessions_agent ON sessions (agent_id);
+CREATE INDEX IF NOT EXISTS sessions_seq ON sessions (seq);
+CREATE INDEX IF NOT EXISTS actions_session_time ON actions (session_id, ts, id);
+CREATE INDEX IF NOT EXISTS actions_time ON actions (ts, id);
+CREATE INDEX IF NOT EXISTS actions_seq ON actions (seq);
+CREATE INDEX IF NOT EXISTS actions_type ON actions (type);
+CREATE INDEX IF NOT EXISTS tool_daily_day ON tool_daily (day);
+"""
+
+# Bumped with each migration in SQLiteStore._migrate (PRAGMA user_version)
+SCHEMA_VERSION = 4
+
+# usage_hourly rebuilt from the completion actions at or after :since
+REBUILD_USAGE = """
+INSERT INTO usage_hourly (hour, model, agent_id, channel, agent_type,
+                          completions, tokens, input_tokens, output_tokens, cost)
+SELECT strftime('%Y-%m-%dT%H', ac.ts / 1000, 'unixepoch'), coalesce(ac.model, 'unknown'),
+       coalesce(s.agent_id, 'unknown'), coalesce(s.channel, 'unknown'), coalesce(a.type, 'unknown'),
+       count(*), coalesce(sum(ac.tokens), 0), coalesce(sum(ac.input_tokens), 0),
+       coalesce(sum(ac.output_tokens), 0), coalesce(sum(ac.cost), 0)
+FROM actions ac
+JOIN sessions s ON s.id = ac.session_id
+LEFT JOIN agents a ON a.id = s.agent_id
+WHERE ac.type = 'completion' AND ac.ts IS NOT NULL AND ac.ts >= :since
+GROUP BY 1, 2, 3, 4
+"""
+
+# activity rebuilt from the actions at or after :since; :minute/:hour are the compaction cutoffs
+REBUILD_ACTIVITY = """
+INSERT INTO activity (resolution, start, type, agent_id, count)
+SELECT resolution, ts - ts % size, type, agent_id, count(*)
+FROM (
+    SELECT ac.ts, ac.type, coalesce(s.agent_id, 'unknown') AS agent_id,
+           CASE WHEN ac.ts >= :minute THEN 'minute' WHEN ac.ts >= :hour THEN 'hour' ELSE 'day' END AS resolution,
+           CASE WHEN ac.ts >= :minute THEN 60000 WHEN ac.ts >= :hour THEN 3600000 ELSE 86400000 END AS size
+    FROM actions ac JOIN sessions s ON s.id = ac.session_id
+    WHERE ac.ts IS NOT NULL AND ac.ts >= :since
+)
+GROUP BY 1, 2, 3, 4
+"""
+
+SESSION_GRAPH_COLUMNS = "s.id, s.channel, s.model, s.started_at, coalesce(s.label, s.id) AS label"
+ACTION_GRAPH_COLUMNS = """ac.id, coalesce(ac.name, ac.type) AS label, ac.type AS action_type,
+                          ac.details, ac.timestamp, p.id AS prev, ac.session_id"""
+
+
+def _props(row: Optional[sqlite3.Row], exclude: tuple = ()) -> Optional[dict]:
+    """Row -> property dict, leaving out nulls like a Neo4j node would."""
+    if row is None:
+        return None
+    props = {k: row[k] for k in row.keys() if row[k] is not None and k not in exclude}
+    if "is_error" in props:
+        props["is_error"] = bool(props["is_error"])
+    return props
+
+
+def _iso_to_ms(value: Optional[str]) -> Optional[int]:
+    return epoch_ms(datetime.fromisoformat(value.replace("Z", "+00:00"))) if value else None
+
+
+class SQLiteStore(GraphStore):
+    backend = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH):
+        super().__init__()
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def connect(self):
+        """Open the database, migrate it and create tables and indexes."""
+        self._conn = self._open()
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+            self._migrate()
+            self._conn.executescript(INDEXES)
+
+    def close(self):
+        """Close the database."""
+        if self._conn:
+            self._conn.close()
+
+    def ping(self):
+        """Run a trivial query on this thread's connection."""
+        with self._reader() as db:
+            db.execute("SELECT 1").fetchone()
+
+    def _migrate(self):
+        """Bring a database written by an older version up to SCHEMA_VERSION."""
+        db = self._conn
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        def add_column(table: str, column: str, kind: str):
+            if column not in {r["name"] for r in db.execute(f"PRAGMA table_info({table})")}:
+                db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if version < 1:
+                # ISO string timestamps -> indexed epoch milliseconds
+                db.create_function("iso_to_ms", 1, _iso_to_ms, deterministic=True)
+                for table, column, source in (("actions", "ts", "timestamp"),
+                                              ("sessions", "started_ts", "started_at")):
+                    add_column(table, column, "INTEGER")
+                    db.execute(f"UPDATE {table} SET {column} = iso_to_ms({source}) WHERE {column} IS NULL")
+            if version < 2:
+                # Completion usage out of the details string into typed columns, then the rollups
+                for column, kind in (("model", "TEXT"), ("tokens", "INTEGER"), ("input_tokens", "INTEGER"),
+                                     ("output_tokens", "INTEGER"), ("cost", "REAL")):
+                    add_column("actions", column, kind)
+                rows = db.execute("""
+                    SELECT id, details FROM actions
+                    WHERE type = 'completion' AND details IS NOT NULL AND model IS NULL
+                """).fetchall()
+                db.executemany("""
+                    UPDATE actions SET model = :model, tokens = :tokens, input_tokens = :input_tokens,
+                                       output_tokens = :output_tokens, cost = :cost
+                    WHERE id = :id
+                """, ({"id": r["id"], **usage_fields(parse_details(r["details"]))} for r in rows))
+                db.execute("DELETE FROM usage_hourly")
+                db.execute(REBUILD_USAGE, {"since": 0})
+            if version < 3:
+                db.execute("DELETE FROM activity")
+                db.execute(REBUILD_ACTIVITY, {**activity_cutoffs(), "since": 0})
+            if version < 4:
+                # Agent ancestry paths, and the requester links behind them
+                for column, kind in (("requester_id", "TEXT"), ("path", "TEXT"), ("depth", "INTEGER")):
+                    add_column("agents", column, kind)
+                for column in ("session_key", "requester_key"):
+                    add_column("sessions", column, "TEXT")
+                db.execute("UPDATE agents SET requester_id = parent_id WHERE requester_id IS NULL")
+                self._rebuild_agent_paths(db)
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @contextmanager
+    def _transaction(self):
+        """Serialized write transaction on the main connection."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @contextmanager
+    def _reader(self):
+        """Connection for reads: per thread with a database file, shared for :memory:."""
+        if self.path == ":memory:":
+            with self._lock:
+                yield self._conn
+            return
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        yield conn
+
+    # Ingest
+
+    def create_session_bundle(self, agent_info: dict, session_info: dict,
+                              actions: Iterable[dict], batch_size: Optional[int] = None):
+        """Write an agent, its session and all session actions in one transaction."""
+        with self._transaction() as db:
+            delta = self._begin_ingest(db)
+            new_agent = db.execute("SELECT 1 FROM agents WHERE id = ?", (agent_info["id"],)).fetchone() is None
+            db.execute("""
+                INSERT INTO agents (id, name, type, created_at, requester_id, seq) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    name = excluded.name, type = excluded.type, created_at = excluded.created_at,
+                    requester_id = coalesce(excluded.requester_id, agents.requester_id), seq = excluded.seq
+            """, (agent_info["id"], agent_info["name"], agent_info["type"],
+                  agent_info["created_at"].isoformat(), agent_info.get("parent_id"), delta["seq"]))
+            self._place_agent(db, agent_info["id"], agent_info.get("parent_id"))
+
+            new_session = db.execute("SELECT 1 FROM sessions WHERE id = ?",
+                                     (session_info["id"],)).fetchone() is None
+            db.execute("""
+                INSERT INTO sessions (id, agent_id, label, channel, started_at, started_ts, model, cwd, seq,
+                                      session_key, requester_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    agent_id = excluded.agent_id, label = excluded.label, channel = excluded.channel,
+                    started_at = excluded.started_at, started_ts = excluded.started_ts,
+                    model = excluded.model, cwd = excluded.cwd, seq = excluded.seq,
+                    session_key = excluded.session_key, requester_key = excluded.requester_key
+            """, (session_info["id"], agent_info["id"], session_info.get("label"), session_info.get("channel"),
+                  session_info["started_at"].isoformat(), epoch_ms(session_info["started_at"]),
+                  session_info.get("model"),
+                  session_info.get("cwd"), delta["seq"], session_info.get("session_key"),
+                  session_info.get("requester_session")))
+
+            delta["counts"]["total_sessions"] = int(new_session)
+            if new_agent:
+                delta["counts"]["agents" if agent_info["type"] == "main" else "subagents"] = 1
+            self._write_actions(db, session_info["id"], actions, batch_size or self.batch_size, delta)
+            self._apply_delta(db, session_info["id"], delta)
+        self._bump_generation()
+        event = self._ingest_event("session", session_info["id"], delta)
+        event["agent_id"] = agent_info["id"]
+        self._notify(event)
+
+    # Agent hierarchy primitives for GraphStore._place_agent
+
+    @staticmethod
+    def _agent_paths(db, ids: list[str]) -> dict:
+        rows = db.execute(f"SELECT id, path FROM agents WHERE id IN ({', '.join('?' * len(ids))})", ids)
+        return {r["id"]: r["path"] for r in rows}
+
+    @staticmethod
+    def _set_parent(db, agent_id: str, parent_id: str):
+        db.execute("UPDATE agents SET parent_id = ? WHERE id = ?", (parent_id, agent_id))
+
+    @staticmethod
+    def _move_subtree(db, agent_id: str, old: Optional[str], new: str):
+        if old is None:
+            db.execute("UPDATE agents SET path = ?, depth = ? WHERE id = ?", (new, new.count("/"), agent_id))
+            return
+        db.execute("""
+            UPDATE agents SET path = ? || substr(path, ?), depth = depth + ?
+            WHERE path = ? OR (path >= ? AND path < ?)
+        """, (new, len(old) + 1, new.count("/") - old.count("/"), old, old + "/", old + "0"))
+
+    @staticmethod
+    def _orphans(db, agent_id: str) -> list[tuple]:
+        return [(r["id"], r["path"]) for r in db.execute("""
+            SELECT id, path FROM agents WHERE requester_id = ? AND parent_id IS NULL AND id != ?
+        """, (agent_id, agent_id))]
+
+    @classmethod
+    def _rebuild_agent_paths(cls, db):
+        parents = {r["id"]: r["parent_id"] for r in db.execute("SELECT id, parent_id FROM agents")}
+        db.executemany("UPDATE agents SET path = ?, depth = ? WHERE id = ?",
+                       [(path, path.count("/"), agent_id) for agent_id, path in cls._agent_tree_paths(parents).items()])
+
+    def upsert_actions_batch(self, session_id: str, actions: Iterable[dict],
+                             batch_size: Optional[int] = None):
+        """Append actions to an existing session."""
+        with self._transaction() as db:
+            if db.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is None:
+                return
+            delta = self._write_actions(db, session_id, actions, batch_size or self.batch_size)
+        if delta:
+            self._bump_generation()
+            self._notify(self._ingest_event("actions", session_id, delta))
+
+    def _begin_ingest(self, db) -> dict:
+        """Allocate the transaction's sequence number (writers are already serialized)."""
+        db.execute("""
+            INSERT INTO stats (key, value) VALUES ('seq', 1)
+            ON CONFLICT (key) DO UPDATE SET value = value + 1
+        """)
+        seq = db.execute("SELECT value FROM stats WHERE key = 'seq'").fetchone()[0]
+        return self._new_delta(seq)
+
+    def _write_actions(self, db, session_id: str, actions: Iterable[dict], batch_size: int,
+                       delta: Optional[dict] = None) -> Optional[dict]:
+        """Write actions chunk by chunk, recording what was new in `delta`.
+
+        Without a caller-supplied delta, the aggregates are applied here.
+        Returns the delta, or None if there were no actions to write.
+        """
+        owns_delta = delta is None
+        summary = db.execute("SELECT last_ts, last_id FROM session_summaries WHERE session_id = ?",
+                             (session_id,)).fetchone()
+        covered = (summary["last_ts"], summary["last_id"]) if summary and summary["last_ts"] is not None else None
+        for chunk in self._action_rows(actions, batch_size):
+            chunk = self._uncompacted(chunk, covered)
+            if not chunk:
+                continue
+            if delta is None:
+                delta = self._begin_ingest(db)
+            new_ids = set()
+            for row in chunk:
+                is_error = int(row["is_error"]) if row["type"] == "tool_result" else None
+                inserted = db.execute("""
+                    INSERT OR IGNORE INTO actions
+                        (id, session_id, type, name, timestamp, ts, details, is_error, prev_id, seq,
+                         model, tokens, input_tokens, output_tokens, cost)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (row["id"], session_id, row["type"], row["name"], row["timestamp"], row["ts"],
+                      row["details"], is_error, row["parent_id"], delta["seq"], row["model"], row["tokens"],
+                      row["input_tokens"], row["output_tokens"], row["cost"])).rowcount
+                if not inserted:
+                    db.execute("""
+                        UPDATE actions SET session_id = ?, type = ?, name = ?, timestamp = ?, ts = ?,
+                                           details = ?, is_error = ?, prev_id = coalesce(?, prev_id), seq = ?,
+                                           model = ?, tokens = ?, input_tokens = ?, output_tokens = ?, cost = ?
+                        WHERE id = ?
+                    """, (session_id, row["type"], row["name"], row["timestamp"], row["ts"], row["details"],
+                          is_error, row["parent_id"], delta["seq"], row["model"], row["tokens"],
+                          row["input_tokens"], row["output_tokens"], row["cost"], row["id"]))
+                    continue
+                delta["counts"]["total_actions"] += 1
+                if row["type"] == "tool_call":
+                    delta["counts"]["total_tool_calls"] += 1
+                new_ids.add(row["id"])
+            self._collect_tools(delta, chunk, new_ids)
+            self._collect_usage(delta, chunk, new_ids)
+            self._collect_activity(delta, chunk, new_ids)
+
+        if owns_delta and delta is not None:
+            self._apply_delta(db, session_id, delta)
+        return delta
+
+    def _apply_delta(self, db, session_id: str, delta: dict):
+        """Update the session, tool, usage, activity and stats aggregates at the end of an ingest."""
+        counts = delta["counts"]
+        if counts["total_actions"]:
+            db.execute("UPDATE sessions SET action_count = action_count + ? WHERE id = ?",
+                       (counts["total_actions"], session_id))
+
+        if delta["tools"]:
+            row = db.execute("SELECT agent_id FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            agent_id = row["agent_id"] if row and row["agent_id"] else "unknown"
+            for (name, day), t in sorted(delta["tools"].items()):
+                db.execute("""
+                    INSERT INTO tools (name, usage, error_count, last_used) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (name) DO UPDATE SET
+                        usage = usage + excluded.usage,
+                        error_count = error_count + excluded.error_count,
+                        last_used = CASE WHEN excluded.last_used IS NOT NULL
+                                          AND (tools.last_used IS NULL OR excluded.last_used > tools.last_used)
+                                         THEN excluded.last_used ELSE tools.last_used END
+                """, (name, t["usage"], t["errors"], t["last_used"]))
+                db.execute("""
+                    INSERT INTO tool_daily (tool, agent_id, day, usage, error_count) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (tool, agent_id, day) DO UPDATE SET
+                        usage = usage + excluded.usage,
+                        error_count = error_count + excluded.error_count
+                """, (name, agent_id, day, t["usage"], t["errors"]))
+
+        if delta["usage"]:
+            owner = dict(db.execute("""
+                SELECT coalesce(s.agent_id, 'unknown') AS agent_id, coalesce(s.channel, 'unknown') AS channel,
+                       coalesce(a.type, 'unknown') AS agent_type
+                FROM sessions s LEFT JOIN agents a ON a.id = s.agent_id
+                WHERE s.id = ?
+            """, (session_id,)).fetchone())
+            db.executemany("""
+                INSERT INTO usage_hourly (hour, model, agent_id, channel, agent_type,
+                                          completions, tokens, input_tokens, output_tokens, cost)
+                VALUES (:hour, :model, :agent_id, :channel, :agent_type,
+                        :completions, :tokens, :input_tokens, :output_tokens, :cost)
+                ON CONFLICT (hour, model, agent_id, channel) DO UPDATE SET
+                    agent_type = excluded.agent_type,
+                    completions = completions + excluded.completions,
+                    tokens = tokens + excluded.tokens,
+                    input_tokens = input_tokens + excluded.input_tokens,
+                    output_tokens = output_tokens + excluded.output_tokens,
+                    cost = cost + excluded.cost
+            """, [{**u, **owner} for u in self._usage_rows(delta)])
+
+        if delta["activity"]:
+            row = db.execute("SELECT agent_id FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            agent_id = row["agent_id"] if row and row["agent_id"] else "unknown"
+            db.executemany("""
+                INSERT INTO activity (resolution, start, type, agent_id, count)
+                VALUES (:resolution, :start, :type, :agent_id, :count)
+                ON CONFLICT (resolution, start, type, agent_id) DO UPDATE SET count = count + excluded.count
+            """, [{**r, "agent_id": agent_id} for r in self._activity_rows(delta)])
+
+        db.executemany("""
+            INSERT INTO stats (key, value) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = value + excluded.value
+        """, [(key, counts[key]) for key in STATS_KEYS if counts[key]])
+
+    def reconcile_stats(self) -> dict:
+        """Recompute the counters and session action counts with full scans."""
+        with self._transaction() as db:
+            db.execute("""
+                UPDATE sessions
+                SET action_count = (SELECT count(*) FROM actions WHERE actions.session_id = sessions.id)
+                    + coalesce((SELECT action_count FROM session_summaries m WHERE m.session_id = sessions.id), 0)
+            """)
+            row = db.execute("""
+                SELECT (SELECT count(*) FROM sessions) AS total_sessions,
+                       (SELECT count(*) FROM actions)
+                           + (SELECT coalesce(sum(action_count), 0) FROM session_summaries) AS total_actions,
+                       (SELECT count(*) FROM actions WHERE type = 'tool_call')
+                           + (SELECT coalesce(sum(tool_calls), 0) FROM session_summaries) AS total_tool_calls,
+                       (SELECT count(*) FROM agents WHERE type = 'main') AS agents,
+                       (SELECT count(*) FROM agents WHERE type = 'subagent') AS subagents
+            """).fetchone()
+            stats = {key: row[key] for key in STATS_KEYS}
+            db.executemany("INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)", stats.items())
+        self._bump_generation()
+        self._notify({"type": "reset"})
+        return stats
+
+    def _rebuild_since(self, db) -> int:
+        row = db.execute("SELECT max(last_ts) FROM session_summaries").fetchone()
+        return self._rebuild_horizon(row[0])
+
+    def reconcile_tools(self):
+        """Rebuild the tools and tool_daily tables from the actions table.
+
+        Days before the compaction horizon are kept; tool totals are the
+        sums of the daily rows.
+        """
+        with self._transaction() as db:
+            since = self._rebuild_since(db)
+            day = usage_hour(since)[:10]
+            if not since:
+                db.execute("DELETE FROM tools")
+            db.execute("DELETE FROM tool_daily WHERE day >= ?", (day,))
+            errors = """count(CASE WHEN ac.type = 'tool_result'
+                                    AND (ac.is_error = 1 OR ac.details LIKE '%''is_error'': True%')
+                                   THEN 1 END)"""
+            db.execute(f"""
+                INSERT INTO tool_daily (tool, agent_id, day, usage, error_count)
+                SELECT ac.name, a.id, substr(ac.timestamp, 1, 10),
+                       count(CASE WHEN ac.type = 'tool_call' THEN 1 END), {errors}
+                FROM actions ac
+                JOIN sessions s ON s.id = ac.session_id
+                JOIN agents a ON a.id = s.agent_id
+                WHERE ac.type IN ('tool_call', 'tool_result') AND ac.name IS NOT NULL
+                  AND substr(ac.timestamp, 1, 10) >= ?
+                GROUP BY ac.name, a.id, substr(ac.timestamp, 1, 10)
+            """, (day,))
+            db.execute("""
+                INSERT INTO tools (name, usage, error_count, last_used)
+                SELECT d.tool, sum(d.usage), sum(d.error_count), max(l.last_used)
+                FROM tool_daily d
+                LEFT JOIN (SELECT name, max(timestamp) AS last_used FROM actions
+                           WHERE type = 'tool_call' AND name IS NOT NULL GROUP BY name) l ON l.name = d.tool
+                GROUP BY d.tool
+                ON CONFLICT (name) DO UPDATE SET
+                    usage = excluded.usage,
+                    error_count = excluded.error_count,
+                    last_used = CASE WHEN excluded.last_used IS NOT NULL
+                                      AND (tools.last_used IS NULL OR excluded.last_used > tools.last_used)
+                                     THEN excluded.last_used ELSE tools.last_used END
+            """)
+        self._bump_generation()
+        self._notify({"type": "reset"})
+
+    def reconcile_usage(self):
+        """Rebuild the usage_hourly table from the completion actions (from the compaction horizon on)."""
+        with self._transaction() as db:
+            since = self._rebuild_since(db)
+            db.execute("DELETE FROM usage_hourly WHERE hour >= ?", (usage_hour(since),))
+            db.execute(REBUILD_USAGE, {"since": since})
+        self._bump_generation()
+        self._notify({"type": "reset"})
+
+    def reconcile_agents(self):
+        """Recompute agent paths and depths from the parent_id links."""
+        with self._transaction() as db:
+            self._rebuild_agent_paths(db)
+        self._bump_generation()
+
+    def reconcile_activity(self):
+        """Rebuild the activity table from the actions table (from the compaction horizon on)."""
+        with self._transaction() as db:
+            since = self._rebuild_since(db)
+            db.execute("DELETE FROM activity WHERE start >= ?", (since,))
+            db.execute(REBUILD_ACTIVITY, {**activity_cutoffs(), "since": since})
+        self._bump_generation()
+
+    def compact_activity(self, cutoffs: Optional[dict] = None) -> int:
+        """Fold minute buckets past retention into hours and hours into days."""
+        cutoffs = cutoffs or activity_cutoffs()
+        folded = 0
+        with self._transaction() as db:
+            for fine, coarse in (("minute", "hour"), ("hour", "day")):
+                db.execute("""
+                    INSERT INTO activity (resolution, start, type, agent_id, count)
+                    SELECT ?, start - start % ?, type, agent_id, sum(count) FROM activity
+                    WHERE resolution = ? AND start < ?
+                    GROUP BY 2, 3, 4
+                    ON CONFLICT (resolution, start, type, agent_id) DO UPDATE SET count = count + excluded.count
+                """, (coarse, ACTIVITY_RESOLUTIONS[coarse], fine, cutoffs[fine]))
+                folded += db.execute("DELETE FROM activity WHERE resolution = ? AND start < ?",
+                                     (fine, cutoffs[fine])).rowcount
+        if folded:
+            self._bump_generation()
+        return folded
+
+    def expired_sessions(self, before: int, limit: int = 100) -> list[str]:
+        """Ids of sessions whose latest action is older than `before`, oldest first."""
+        with self._reader() as db:
+            rows = db.execute("""
+                SELECT id FROM sessions s
+                WHERE started_ts < ? AND (SELECT max(ts) FROM actions WHERE session_id = s.id) < ?
+                ORDER BY started_ts
+                LIMIT ?
+            """, (before, before, limit)).fetchall()
+        return [r["id"] for r in rows]
+
+    def compact_session_batch(self, session_id: str, batch_size: int = 1000,
+                              archive: Optional[Callable[[str, list[dict]], None]] = None) -> int:
+        """Fold a session's oldest actions into its session_summaries row and delete them."""
+        with self._transaction() as db:
+            batch = db.execute("""
+                SELECT * FROM actions WHERE session_id = ?
+                ORDER BY ts, id
+                LIMIT ?
+            """, (session_id, batch_size)).fetchall()
+            rows = [{**_props(r, exclude=("session_id", "prev_id")), "prev": r["prev_id"]} for r in batch]
+            if not rows:
+                return 0
+            existing = db.execute("SELECT * FROM session_summaries WHERE session_id = ?", (session_id,)).fetchone()
+            summary = self._merge_summary(dict(existing) if existing else None, session_id, rows,
+                                          archived=archive is not None)
+            if archive:
+                archive(session_id, rows)
+            db.execute(f"""
+                INSERT OR REPLACE INTO session_summaries ({', '.join(summary)})
+                VALUES ({', '.join(':' + key for key in summary)})
+            """, summary)
+            db.executemany("DELETE FROM actions WHERE id = ?", [(r["id"],) for r in rows])
+        return len(rows)
+
+    def clear_all(self):
+        """Clear all data (for testing)."""
+        with self._transaction() as db:
+            for table in ("agents", "sessions", "actions", "tools", "tool_daily", "usage_hourly", "activity",
+                          "session_summaries", "stats"):
+                db.execute(f"DELETE FROM {table}")
+        self._bump_generation()
+        self._notify({"type": "reset"})
+
+    # Reads
+
+    def get_all_agents(self) -> list[dict]:
+        """Get all agents."""
+        with self._reader() as db:
+            agents = db.execute("SELECT * FROM agents ORDER BY created_at DESC").fetchall()
+            children: dict[str, list[str]] = {}
+            for row in db.execute("SELECT id, parent_id FROM agents WHERE parent_id IS NOT NULL"):
+                children.setdefault(row["parent_id"], []).append(row["id"])
+        return [{"agent": _props(a, exclude=("parent_id",)), "children": children.get(a["id"], []),
+                 "parent": a["parent_id"]} for a in agents]
+
+    def get_agent_tree(self, root: Optional[str] = None, depth: int = 1, limit: int = 200,
+                       cursor: Optional[str] = None) -> Optional[dict]:
+        """A page of the agent subtree under `root`, in ancestry path order, from the path index."""
+        limit = min(limit, MAX_PAGE_SIZE)
+        with self._reader() as db:
+            where, params = ["depth <= ?"], [depth]
+            if root:
+                row = db.execute("SELECT path, depth FROM agents WHERE id = ?", (root,)).fetchone()
+                if row is None:
+                    return None
+                where = ["(path = ? OR (path >= ? AND path < ?))", "depth <= ?"]
+                params = [row["path"], row["path"] + "/", row["path"] + "0", row["depth"] + depth]
+            if cursor:
+                where.append("path > ?")
+                params.append(decode_cursor(cursor)[0])
+            rows = db.execute(f"""
+                SELECT a.*, (SELECT count(*) FROM agents c WHERE c.parent_id = a.id) AS child_count
+                FROM agents a
+                WHERE {' AND '.join(where)}
+                ORDER BY path
+                LIMIT ?
+            """, params + [limit + 1]).fetchall()
+
+        agents = [{"agent": _props(r, exclude=("parent_id", "child_count")), "parent": r["parent_id"],
+                   "depth": r["depth"], "children": r["child_count"]} for r in rows[:limit]]
+        next_cursor = encode_cursor(rows[limit - 1]["path"], rows[limit - 1]["id"]) if len(rows) > limit else None
+        return {"root": root, "agents": agents, "next_cursor": next_cursor}
+
+    def get_recent_sessions(self, limit: int = 50, cursor: Optional[str] = None) -> dict:
+        """Get a page of sessions, newest first, with their stored action counts."""
+        limit = min(limit, MAX_PAGE_SIZE)
+        where, params = "", []
+        if cursor:
+            started_ts, session_id = decode_cursor(cursor)
+            where = "WHERE started_ts < ? OR (started_ts = ? AND id < ?)"
+            params = [started_ts, started_ts, session_id]
+        with self._reader() as db:
+            rows = db.execute(f"""
+                SELECT * FROM sessions {where}
+                ORDER BY started_ts DESC, id DESC
+                LIMIT ?
+            """, params + [limit + 1]).fetchall()
+
+        sessions = [{"session": _props(r, exclude=("agent_id",)), "action_count": r["action_count"]}
+                    for r in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = sessions[-1]["session"]
+            next_cursor = encode_cursor(last["started_ts"], last["id"])
+        return {"sessions": sessions, "next_cursor": next_cursor}
+
+    def get_session_with_actions(self, session_id: str, limit: int = 200, cursor: Optional[str] = None,
+                                 types: Optional[list[str]] = None) -> dict:
+        """Get a session with a page of its actions in time order."""
+        limit = min(limit, MAX_PAGE_SIZE)
+        where, params = "", [session_id]
+        if types:
+            where += f" AND type IN ({', '.join('?' * len(types))})"
+            params += types
+        if cursor:
+            ts, action_id = decode_cursor(cursor)
+            where += " AND (ts > ? OR (ts = ? AND id > ?))"
+            params += [ts, ts, action_id]
+        with self._reader() as db:
+            session = db.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            agent = None
+            if session:
+                agent = db.execute("SELECT * FROM agents WHERE id = ?", (session["agent_id"],)).fetchone()
+            rows = db.execute(f"""
+                SELECT * FROM actions WHERE session_id = ?{where}
+                ORDER BY ts ASC, id ASC
+                LIMIT ?
+            """, params + [limit + 1]).fetchall()
+
+        actions = [_props(r, exclude=("session_id", "prev_id")) for r in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(actions[-1]["ts"], actions[-1]["id"])
+        return {
+            "session": _props(session, exclude=("agent_id",)),
+            "agent": _props(agent, exclude=("parent_id",)),
+            "actions": actions,
+            "next_cursor": next_cursor
+        }
+
+    def _cursor(self, db) -> int:
+        row = db.execute("SELECT value FROM stats WHERE key = 'seq'").fetchone()
+        return row["value"] if row else 0
+
+    def get_graph_data(self, limit: int = 100) -> dict:
+        """Get graph data for visualization — proper tree structure."""
+        with self._reader() as db:
+            cursor = self._cursor(db)
+            sessions = db.execute(f"""
+                SELECT a.id AS agent_id, a.name AS agent_name, {SESSION_GRAPH_COLUMNS}
+                FROM sessions s JOIN agents a ON a.id = s.agent_id
+                ORDER BY s.started_ts DESC
+                LIMIT ?
+            """, (min(limit // 5, 15),)).fetchall()
+            ids = [s["id"] for s in sessions]
+            actions = db.execute(f"""
+                SELECT {ACTION_GRAPH_COLUMNS}
+                FROM actions ac LEFT JOIN actions p ON p.id = ac.prev_id
+                WHERE ac.session_id IN ({', '.join('?' * len(ids))})
+                ORDER BY ac.ts, ac.id
+            """, ids).fetchall()
+
+        by_session: dict[str, list[dict]] = {}
+        for ac in actions:
+            by_session.setdefault(ac["session_id"], []).append(dict(ac))
+        records = [{"cursor": cursor, "agent_id": s["agent_id"], "agent_name": s["agent_name"],
+                    "session": {k: s[k] for k in ("id", "channel", "model", "started_at", "label")},
+                    "actions": by_session.get(s["id"], [])} for s in sessions]
+        graph = self._build_graph(records)
+        graph["cursor"] = cursor
+        return graph
+
+    def get_graph_delta(self, since: int, limit: int = 2000) -> dict:
+        """Get sessions and actions written after the ingest sequence `since`."""
+        with self._reader() as db:
+            cursor = self._cursor(db)
+            sessions = db.execute(f"""
+                SELECT a.id AS agent_id, a.name AS agent_name, {SESSION_GRAPH_COLUMNS}
+                FROM sessions s JOIN agents a ON a.id = s.agent_id
+                WHERE s.seq > ?
+            """, (since,)).fetchall()
+            actions = db.execute(f"""
+                SELECT {ACTION_GRAPH_COLUMNS}
+                FROM actions ac LEFT JOIN actions p ON p.id = ac.prev_id
+                WHERE ac.seq > ?
+                ORDER BY ac.seq
+                LIMIT ?
+            """, (since, limit + 1)).fetchall()
+
+        sessions = [{"agent_id": s["agent_id"], "agent_name": s["agent_name"],
+                     "session": {k: s[k] for k in ("id", "channel", "model", "started_at", "label")}}
+                    for s in sessions]
+        return self._build_delta(since, cursor, sessions, [dict(ac) for ac in actions], limit)
+
+    def get_actions(self, start: Optional[int] = None, end: Optional[int] = None,
+                    types: Optional[list[str]] = None, agent_id: Optional[str] = None,
+                    limit: int = 200, cursor: Optional[str] = None) -> dict:
+        """Get a page of actions with `start` <= ts < `end` (epoch ms), newest first."""
+        limit = min(limit, MAX_PAGE_SIZE)
+        where = ["ac.ts >= ?", "ac.ts < ?"]
+        params: list = [start if start is not None else 0, end if end is not None else 2 ** 53]
+        if types:
+            where.append(f"ac.type IN ({', '.join('?' * len(types))})")
+            params += types
+        if agent_id:
+            where.append("s.agent_id = ?")
+            params.append(agent_id)
+        if cursor:
+            ts, action_id = decode_cursor(cursor)
+            where.append("(ac.ts < ? OR (ac.ts = ? AND ac.id < ?))")
+            params += [ts, ts, action_id]
+        with self._reader() as db:
+            rows = db.execute(f"""
+                SELECT ac.*, s.agent_id FROM actions ac JOIN sessions s ON s.id = ac.session_id
+                WHERE {' AND '.join(where)}
+                ORDER BY ac.ts DESC, ac.id DESC
+                LIMIT ?
+            """, params + [limit + 1]).fetchall()
+
+        actions = [_props(r, exclude=("prev_id",)) for r in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(actions[-1]["ts"], actions[-1]["id"])
+        return {"actions": actions, "next_cursor": next_cursor}
+
+    def get_stats(self) -> dict:
+        """Get aggregate statistics from the stats table, rebuilding it if empty."""
+        with self._reader() as db:
+            rows = dict(db.execute("SELECT key, value FROM stats").fetchall())
+        if not rows:
+            return self.reconcile_stats()
+        return {key: rows.get(key, 0) for key in STATS_KEYS}
+
+    def get_tool_usage(self, by: Optional[str] = None, days: Optional[int] = None) -> list[dict]:
+        """Get tool usage statistics from the pre-aggregated tables."""
+        with self._reader() as db:
+            if by is None:
+                rows = db.execute("""
+                    SELECT name AS tool, usage, last_used, error_count FROM tools
+                    WHERE usage > 0
+                    ORDER BY usage DESC
+                """).fetchall()
+                return [dict(r) for r in rows]
+
+            group_key = "agent_id" if by == "agent" else "day"
+            since = None
+            if days:
+                since = (datetime.now(timezone.utc) - timedelta(days=days)).date().isoformat()
+            rows = db.execute(f"""
+                SELECT tool, {group_key} AS bucket, sum(usage) AS usage, sum(error_count) AS error_count
+                FROM tool_daily
+                WHERE ? IS NULL OR day >= ?
+                GROUP BY tool, {group_key}
+                HAVING sum(usage) > 0 OR sum(error_count) > 0
+                ORDER BY bucket DESC, usage DESC
+            """, (since, since)).fetchall()
+            return [{"tool": r["tool"], by: r["bucket"], "usage": r["usage"],
+                     "error_count": r["error_count"]} for r in rows]
+
+    def get_usage(self, by: list[str], start: Optional[str] = None, end: Optional[str] = None,
+                  filters: Optional[dict] = None) -> list[dict]:
+        """Sum the usage_hourly rollups, grouped by the `by` dimensions."""
+        filters = filters or {}
+        keys = [USAGE_DIMENSIONS[dim] if dim != "day" else "substr(hour, 1, 10)" for dim in by]
+        where, params = ["(? IS NULL OR hour >= ?)", "(? IS NULL OR hour <= ?)"], [start, start, end, end]
+        for dim, value in filters.items():
+            where.append(f"{USAGE_DIMENSIONS[dim]} = ?")
+            params.append(value)
+        columns = [f"{key} AS {dim}" for dim, key in zip(by, keys)]
+        columns += [f"sum({metric}) AS {metric}" for metric in USAGE_METRICS]
+        with self._reader() as db:
+            rows = db.execute(f"""
+                SELECT {', '.join(columns)} FROM usage_hourly
+                WHERE {' AND '.join(where)}
+                {'GROUP BY ' + ', '.join(keys) if keys else ''}
+                HAVING sum(completions) > 0
+            """, params).fetchall()
+        return self._finish_usage([dict(r) for r in rows], by)
+
+    def get_activity(self, resolution: str, start: int, end: int, by: list[str],
+                     filters: Optional[dict] = None) -> list[dict]:
+        """Action counts per bucket, summed from the activity table (coarser rows kept as stored)."""
+        filters = filters or {}
+        fine = list(ACTIVITY_RESOLUTIONS)[:list(ACTIVITY_RESOLUTIONS).index(resolution) + 1]
+        is_fine = f"resolution IN ({', '.join('?' * len(fine))})"
+        # A coarser bucket that starts before `start` still overlaps the range
+        spans = " OR ".join(["(resolution = ? AND start > ? AND start < ?)"] * len(ACTIVITY_RESOLUTIONS))
+        where = [f"({spans})"]
+        params: list = []
+        for name, width in ACTIVITY_RESOLUTIONS.items():
+            params += [name, start - width, end]
+        for dim, value in filters.items():
+            where.append(f"{ACTIVITY_DIMENSIONS[dim]} = ?")
+            params.append(value)
+        size = ACTIVITY_RESOLUTIONS[resolution]
+        columns = [f"CASE WHEN {is_fine} THEN start - start % ? ELSE start END AS bucket",
+                   f"CASE WHEN {is_fine} THEN ? ELSE resolution END AS resolution"]
+        columns += [f"{ACTIVITY_DIMENSIONS[dim]} AS {dim}" for dim in by]
+        with self._reader() as db:
+            rows = db.execute(f"""
+                SELECT {', '.join(columns)}, sum(count) AS count FROM activity
+                WHERE {' AND '.join(where)}
+                GROUP BY {', '.join(str(i + 1) for i in range(len(columns)))}
+                ORDER BY bucket
+            """, fine + [size] + fine + [resolution] + params).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_session_summary(self, session_id: str) -> Optional[dict]:
+        """The summary of a session's compacted actions, if any."""
+        with self._reader() as db:
+            row = db.execute("SELECT * FROM session_summaries WHERE session_id = ?", (session_id,)).fetchone()
+        return self._summary_props(dict(row) if row else None)
+
+    def session_exists(self, session_id: str) -> bool:
+        """Check if a session has been synced."""
+        with self._reader() as db:
+            return db.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is not None
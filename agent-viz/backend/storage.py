@@ -0,0 +1,696 @@
+"""Pluggable graph storage for agent visualization.
+
+`GraphStore` is the interface the sync pipeline and the API use; it holds
+the backend-independent parts (data generation, ingest listeners, tool
+delta bookkeeping, graph payload assembly). `STORAGE_BACKEND` selects the
+implementation: "neo4j" (default, `neo4j_client.Neo4jClient`) or "sqlite"
+(embedded, `sqlite_store.SQLiteStore`).
+"""
+import ast
+import base64
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Optional, Callable, Iterable, Iterator
+from dotenv import load_dotenv
+
+from metrics import timed_query
+
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "neo4j").lower()
+
+# Aggregate counters behind /api/stats
+STATS_KEYS = ("total_sessions", "total_actions", "total_tool_calls", "agents", "subagents")
+
+# Upper bound on a page of sessions or session actions
+MAX_PAGE_SIZE = 1000
+
+# Summed in the hourly usage rollups behind /api/usage
+USAGE_METRICS = ("completions", "tokens", "input_tokens", "output_tokens", "cost")
+# /api/usage `by` dimensions -> rollup bucket field ("day" is derived from "hour")
+USAGE_DIMENSIONS = {"model": "model", "agent": "agent_id", "agent_type": "agent_type",
+                    "channel": "channel", "hour": "hour", "day": "hour"}
+
+# /api/activity bucket sizes in milliseconds, finest first
+ACTIVITY_RESOLUTIONS = {"minute": 60_000, "hour": 3_600_000, "day": 86_400_000}
+# /api/activity `by` dimensions -> bucket field
+ACTIVITY_DIMENSIONS = {"type": "type", "agent": "agent_id"}
+# Minute buckets are compacted into hours after this many days, hours into days
+ACTIVITY_MINUTE_DAYS = float(os.getenv("ACTIVITY_MINUTE_DAYS", "2"))
+ACTIVITY_HOUR_DAYS = float(os.getenv("ACTIVITY_HOUR_DAYS", "90"))
+
+
+def encode_cursor(*key) -> str:
+    """Encode a keyset position (e.g. timestamp, id) as an opaque page cursor."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a page cursor; raises ValueError if it is malformed."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(key, list) or len(key) != 2:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return key
+
+
+# Store methods whose latency is recorded per backend and method in /metrics
+TIMED_METHODS = (
+    "create_session_bundle", "upsert_actions_batch", "reconcile_stats", "reconcile_tools", "clear_all",
+    "ping", "get_all_agents", "get_recent_sessions", "get_session_with_actions", "get_graph_data",
+    "get_graph_delta", "get_actions", "get_stats", "get_tool_usage", "get_usage", "reconcile_usage",
+    "get_activity", "compact_activity", "reconcile_activity", "expired_sessions", "compact_session_batch",
+    "get_session_summary", "get_agent_tree", "reconcile_agents", "session_exists",
+)
+
+
+def epoch_ms(value: datetime) -> int:
+    """Epoch milliseconds of a datetime (naive values are taken as UTC).
+
+    Actions (`ts`) and sessions (`started_ts`) are ordered, paginated and
+    range-queried on these integers; the ISO strings are kept for display.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def parse_time(value: str) -> int:
+    """Parse an API time bound given as epoch milliseconds or ISO 8601; raises ValueError."""
+    value = value.strip()
+    if value.lstrip("-").isdigit():
+        return int(value)
+    try:
+        return epoch_ms(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    except ValueError:
+        raise ValueError(f"Invalid time: {value!r} (use ISO 8601 or epoch milliseconds)")
+
+
+def usage_hour(ms: int) -> str:
+    """The hourly usage bucket ("YYYY-MM-DDTHH", UTC) an epoch-millisecond time falls in."""
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime("%Y-%m-%dT%H")
+
+
+def parse_details(details: Optional[str]) -> dict:
+    """Decode stored action details: JSON, or the Python dict repr older versions wrote."""
+    if not details:
+        return {}
+    try:
+        return json.loads(details)
+    except ValueError:
+        try:
+            return ast.literal_eval(details)
+        except (ValueError, SyntaxError):
+            return {}
+
+
+def _number(value, kind):
+    try:
+        return kind(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def activity_cutoffs(now_ms: Optional[int] = None) -> dict:
+    """Per resolution, the (bucket-aligned) time before which it is compacted into the next."""
+    if now_ms is None:
+        now_ms = epoch_ms(datetime.now(timezone.utc))
+    day = ACTIVITY_RESOLUTIONS["day"]
+    minute_cutoff = now_ms - int(ACTIVITY_MINUTE_DAYS * day)
+    hour_cutoff = now_ms - int(ACTIVITY_HOUR_DAYS * day)
+    return {"minute": minute_cutoff - minute_cutoff % ACTIVITY_RESOLUTIONS["hour"],
+            "hour": hour_cutoff - hour_cutoff % day}
+
+
+def activity_bucket(ts: int, cutoffs: dict) -> tuple[str, int]:
+    """The (resolution, start) activity bucket an action at `ts` is counted in."""
+    for resolution in ("minute", "hour"):
+        if ts >= cutoffs[resolution]:
+            break
+    else:
+        resolution = "day"
+    size = ACTIVITY_RESOLUTIONS[resolution]
+    return resolution, ts - ts % size
+
+
+def usage_fields(details: dict) -> dict:
+    """Completion usage from action details as typed, aggregatable values."""
+    return {
+        "model": details.get("model"),
+        "tokens": _number(details.get("tokens"), int),
+        "input_tokens": _number(details.get("input_tokens"), int),
+        "output_tokens": _number(details.get("output_tokens"), int),
+        "cost": _number(details.get("cost"), float),
+    }
+
+
+class GraphStore(ABC):
+    # Backend name used in metric labels and STORAGE_BACKEND
+    backend = ""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in TIMED_METHODS:
+            if name in cls.__dict__:
+                setattr(cls, name, timed_query(cls.backend, cls.__dict__[name]))
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("SYNC_BATCH_SIZE", "500"))
+        # Bumped after every committed write; read endpoints cache against it
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        # Called with an event dict after each committed ingest (see add_listener)
+        self._listeners: list[Callable[[dict], None]] = []
+
+    @abstractmethod
+    def connect(self):
+        """Open the store and create its schema and indexes."""
+
+    @abstractmethod
+    def close(self):
+        """Close the store."""
+
+    @abstractmethod
+    def ping(self):
+        """Run a trivial query; raises if the store is unreachable."""
+
+    # Ingest
+
+    @abstractmethod
+    def create_session_bundle(self, agent_info: dict, session_info: dict,
+                              actions: Iterable[dict], batch_size: Optional[int] = None):
+        """Write an agent, its session and all session actions in one transaction.
+
+        `actions` are dicts with id, type, name, timestamp, details and parent_id
+        keys. They are consumed lazily in chunks of `batch_size` rows, so a
+        generator keeps memory flat.
+        """
+
+    @abstractmethod
+    def upsert_actions_batch(self, session_id: str, actions: Iterable[dict],
+                             batch_size: Optional[int] = None):
+        """Append actions (and their CONTAINS/FOLLOWED_BY edges) to an existing session."""
+
+    @abstractmethod
+    def reconcile_stats(self) -> dict:
+        """Recompute the aggregate counters and session action counts with full scans."""
+
+    @abstractmethod
+    def reconcile_tools(self):
+        """Rebuild the per-tool and per tool/agent/day usage aggregates.
+
+        Like the usage and activity rebuilds, days before `_rebuild_horizon`
+        are kept so compacted history is not lost.
+        """
+
+    @abstractmethod
+    def reconcile_usage(self):
+        """Rebuild the hourly token/cost rollups from the completion actions."""
+
+    @abstractmethod
+    def reconcile_agents(self):
+        """Recompute every agent's ancestry path and depth from the parent links."""
+
+    @abstractmethod
+    def reconcile_activity(self):
+        """Rebuild the activity buckets from the actions (from `_rebuild_horizon` on)."""
+
+    @abstractmethod
+    def compact_activity(self, cutoffs: Optional[dict] = None) -> int:
+        """Fold minute buckets past retention into hours and hours into days.
+
+        `cutoffs` defaults to `activity_cutoffs()`; returns the number of
+        buckets folded.
+        """
+
+    @abstractmethod
+    def expired_sessions(self, before: int, limit: int = 100) -> list[str]:
+        """Ids of sessions with actions, none of them at or after `before` (epoch ms), oldest first."""
+
+    @abstractmethod
+    def compact_session_batch(self, session_id: str, batch_size: int = 1000,
+                              archive: Optional[Callable[[str, list[dict]], None]] = None) -> int:
+        """Fold a session's oldest `batch_size` actions into its summary and delete them.
+
+        One transaction per batch; `archive` gets the raw action rows first.
+        Returns the number of actions removed (0 once none are left).
+        """
+
+    def compact_sessions(self, before: int, limit: int = 100, batch_size: int = 1000,
+                         archive: Optional[Callable[[str, list[dict]], None]] = None) -> dict:
+        """Collapse up to `limit` sessions idle since before `before` into summaries."""
+        totals = {"sessions": 0, "actions": 0}
+        for session_id in self.expired_sessions(before, limit):
+            while True:
+                removed = self.compact_session_batch(session_id, batch_size, archive)
+                if not removed:
+                    break
+                totals["actions"] += removed
+            totals["sessions"] += 1
+        if totals["sessions"]:
+            self._bump_generation()
+            self._notify({"type": "reset"})
+        return totals
+
+    @abstractmethod
+    def clear_all(self):
+        """Clear all data (for testing)."""
+
+    # Reads
+
+    @abstractmethod
+    def get_all_agents(self) -> list[dict]:
+        """Get all agents with their children and parent ids."""
+
+    @abstractmethod
+    def get_agent_tree(self, root: Optional[str] = None, depth: int = 1, limit: int = 200,
+                       cursor: Optional[str] = None) -> Optional[dict]:
+        """A page of the agent subtree under `root`, at most `depth` levels below it.
+
+        Without a root, the whole forest down to `depth`. Agents come in
+        depth-first order (by ancestry path) with their depth, parent and
+        child count; None if `root` does not exist.
+        """
+
+    @abstractmethod
+    def get_recent_sessions(self, limit: int = 50, cursor: Optional[str] = None) -> dict:
+        """Get a page of sessions, newest first, with their stored action counts.
+
+        Keyset pagination on (started_at, id): pass the returned `next_cursor`
+        to get the following page; it is None on the last page.
+        """
+
+    @abstractmethod
+    def get_session_with_actions(self, session_id: str, limit: int = 200, cursor: Optional[str] = None,
+                                 types: Optional[list[str]] = None) -> dict:
+        """Get a session with a page of its actions in time order.
+
+        Keyset pagination on (timestamp, id), optionally restricted to the
+        action `types` given. `next_cursor` is None on the last page.
+        """
+
+    @abstractmethod
+    def get_graph_data(self, limit: int = 100) -> dict:
+        """Get graph data for visualization — proper tree structure.
+
+        `cursor` is the ingest sequence number the snapshot was read at; pass
+        it to `get_graph_delta` to poll for changes.
+        """
+
+    @abstractmethod
+    def get_graph_delta(self, since: int, limit: int = 2000) -> dict:
+        """Get sessions and actions written after the ingest sequence `since`.
+
+        Returns the same node/edge shape as `get_graph_data` plus the new
+        cursor. `reset` tells the client to refetch the full graph instead:
+        the delta was truncated at `limit` actions, or the cursor is ahead
+        of the store (it was cleared or replaced).
+        """
+
+    @abstractmethod
+    def get_actions(self, start: Optional[int] = None, end: Optional[int] = None,
+                    types: Optional[list[str]] = None, agent_id: Optional[str] = None,
+                    limit: int = 200, cursor: Optional[str] = None) -> dict:
+        """Get a page of actions with `start` <= ts < `end` (epoch ms), newest first.
+
+        Served from the index on the action `ts`, so a recent window stays
+        cheap however long the history is. Keyset pagination on (ts, id).
+        """
+
+    @abstractmethod
+    def get_stats(self) -> dict:
+        """Get the aggregate counters."""
+
+    @abstractmethod
+    def get_tool_usage(self, by: Optional[str] = None, days: Optional[int] = None) -> list[dict]:
+        """Get tool usage statistics.
+
+        `by="agent"` or `by="day"` breaks usage down by agent or day,
+        optionally limited to the last `days` days.
+        """
+
+    @abstractmethod
+    def get_usage(self, by: list[str], start: Optional[str] = None, end: Optional[str] = None,
+                  filters: Optional[dict] = None) -> list[dict]:
+        """Sum the hourly token/cost rollups, grouped by the `by` dimensions.
+
+        `start`/`end` are inclusive hour buckets (see `usage_hour`); `filters`
+        maps dimensions other than hour/day to a required value.
+        """
+
+    @abstractmethod
+    def get_activity(self, resolution: str, start: int, end: int, by: list[str],
+                     filters: Optional[dict] = None) -> list[dict]:
+        """Action counts per `resolution` bucket with `start` <= bucket < `end` (epoch ms).
+
+        Sums every stored bucket at `resolution` or finer; rows are grouped
+        by `by` (type, agent) and ordered by bucket. Each row carries its
+        `resolution`: history already compacted into coarser buckets comes
+        back as those buckets (including one that starts before `start`)
+        rather than being dropped.
+        """
+
+    @abstractmethod
+    def get_session_summary(self, session_id: str) -> Optional[dict]:
+        """The summary of a session's compacted actions, if any were compacted."""
+
+    @abstractmethod
+    def session_exists(self, session_id: str) -> bool:
+        """Check if a session has been synced."""
+
+    # Change tracking
+
+    def _bump_generation(self):
+        """Mark the graph as changed after a committed write."""
+        with self._generation_lock:
+            self.generation += 1
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Register a callback for ingest events, run on the writing thread after commit.
+
+        Events are dicts with a `type` of "session" (a session file was
+        written), "actions" (actions appended to a session) or "reset" (the
+        graph was cleared or rebuilt; refetch everything).
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, event: dict):
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Ingest listener failed: {e}")
+
+    @staticmethod
+    def _ingest_event(event_type: str, session_id: str, delta: dict) -> dict:
+        return {"type": event_type, "session_id": session_id, "cursor": delta["seq"],
+                "counts": delta["counts"], "tools": sorted({name for name, _ in delta["tools"]})}
+
+    # Ingest helpers
+
+    @staticmethod
+    def _new_delta(seq: int) -> dict:
+        """Aggregates an ingest transaction applies once, after all its actions."""
+        return {
+            "seq": seq,
+            "counts": {key: 0 for key in STATS_KEYS},
+            # (tool, day) -> usage/error/last_used deltas for the tool aggregates
+            "tools": {},
+            # new tool_call actions to link to their tool
+            "tool_links": [],
+            # (hour, model) -> token/cost deltas for the usage rollups
+            "usage": {},
+            # (resolution, bucket start, action type) -> new action counts
+            "activity": {},
+            # compaction cutoffs that pick each new action's bucket resolution
+            "activity_cutoffs": activity_cutoffs(),
+        }
+
+    @staticmethod
+    def _action_rows(actions: Iterable[dict], batch_size: int) -> Iterator[list[dict]]:
+        """Lazily turn parsed actions into chunks of flat, storable rows."""
+        actions = iter(actions)
+        while True:
+            chunk = []
+            for a in islice(actions, batch_size):
+                details = a.get("details") or {}
+                chunk.append({
+                    "id": a["id"],
+                    "type": a["type"],
+                    "name": a.get("name"),
+                    "timestamp": a["timestamp"].isoformat(),
+                    "ts": epoch_ms(a["timestamp"]),
+                    "details": json.dumps(details, default=str) if details else None,
+                    "is_error": bool(details.get("is_error")),
+                    "parent_id": a.get("parent_id"),
+                    **usage_fields(details),
+                })
+            if not chunk:
+                return
+            yield chunk
+
+    @staticmethod
+    def _collect_tools(delta: dict, rows: list[dict], new_ids: set):
+        """Fold newly created tool_call/tool_result rows into the tool deltas."""
+        for row in rows:
+            if row["id"] not in new_ids or not row["name"] or row["type"] not in ("tool_call", "tool_result"):
+                continue
+            key = (row["name"], row["timestamp"][:10])
+            tool = delta["tools"].setdefault(key, {"usage": 0, "errors": 0, "last_used": None})
+            if row["type"] == "tool_call":
+                tool["usage"] += 1
+                tool["last_used"] = max(tool["last_used"] or "", row["timestamp"])
+                delta["tool_links"].append({"id": row["id"], "name": row["name"]})
+            elif row["is_error"]:
+                tool["errors"] += 1
+
+    @staticmethod
+    def _collect_usage(delta: dict, rows: list[dict], new_ids: set):
+        """Fold newly created completion rows into the hourly usage deltas."""
+        for row in rows:
+            if row["id"] not in new_ids or row["type"] != "completion":
+                continue
+            key = (usage_hour(row["ts"]), row["model"] or "unknown")
+            bucket = delta["usage"].setdefault(key, {metric: 0 for metric in USAGE_METRICS})
+            bucket["completions"] += 1
+            for metric in USAGE_METRICS[1:]:
+                bucket[metric] += row[metric] or 0
+
+    @staticmethod
+    def _collect_activity(delta: dict, rows: list[dict], new_ids: set):
+        """Count newly created rows into their activity buckets."""
+        for row in rows:
+            if row["id"] not in new_ids:
+                continue
+            key = activity_bucket(row["ts"], delta["activity_cutoffs"]) + (row["type"],)
+            delta["activity"][key] = delta["activity"].get(key, 0) + 1
+
+    @staticmethod
+    def _activity_rows(delta: dict) -> list[dict]:
+        """The activity deltas as parameter rows, in a fixed (lock) order."""
+        return [{"resolution": resolution, "start": start, "type": action_type, "count": count}
+                for (resolution, start, action_type), count in sorted(delta["activity"].items())]
+
+    @staticmethod
+    def _usage_rows(delta: dict) -> list[dict]:
+        """The usage deltas as parameter rows, in a fixed (lock) order."""
+        return [{"hour": hour, "model": model, **values}
+                for (hour, model), values in sorted(delta["usage"].items())]
+
+    @staticmethod
+    def _finish_usage(rows: list[dict], by: list[str]) -> list[dict]:
+        """Order grouped usage rows: by time when grouped by hour/day, else by cost."""
+        time_key = next((dim for dim in ("hour", "day") if dim in by), None)
+        if time_key:
+            rows.sort(key=lambda r: (r[time_key], -(r["cost"] or 0)))
+        else:
+            rows.sort(key=lambda r: -(r["cost"] or 0))
+        for row in rows:
+            row["cost"] = round(row["cost"] or 0, 6)
+        return rows
+
+    # Agent hierarchy
+
+    @classmethod
+    def _place_agent(cls, tx, agent_id: str, requester_id: Optional[str]):
+        """Attach an agent under its requester and adopt agents that were waiting for it.
+
+        Keeps each agent's `path` (ids from its root, "/"-separated) and
+        `depth` current. An agent whose requester has not been synced yet is
+        a root, with `requester_id` set, until the requester arrives.
+        """
+        paths = cls._agent_paths(tx, [agent_id, requester_id] if requester_id else [agent_id])
+        old = paths.get(agent_id)
+        parent_path = paths.get(requester_id) if requester_id != agent_id else None
+        if parent_path and agent_id in parent_path.split("/"):
+            parent_path = None  # the requester descends from this agent
+        if parent_path:
+            path = f"{parent_path}/{agent_id}"
+            cls._set_parent(tx, agent_id, requester_id)
+        else:
+            path = old or agent_id
+        if path != old:
+            cls._move_subtree(tx, agent_id, old, path)
+        for orphan_id, orphan_path in cls._orphans(tx, agent_id):
+            if orphan_id in path.split("/"):
+                continue
+            cls._set_parent(tx, orphan_id, agent_id)
+            cls._move_subtree(tx, orphan_id, orphan_path, f"{path}/{orphan_id}")
+
+    @staticmethod
+    def _agent_tree_paths(parents: dict) -> dict:
+        """id -> ancestry path for every agent, given id -> parent id (None for roots)."""
+        paths: dict = {}
+        for agent_id in parents:
+            chain = []
+            node = agent_id
+            while node is not None and node not in paths and node not in chain:
+                chain.append(node)
+                parent = parents.get(node)
+                node = parent if parent in parents else None
+            prefix = paths.get(node)
+            if node is not None and node in chain:
+                prefix = None  # a cycle: cut it at the agent it closes on
+                chain = chain[:chain.index(node) + 1]
+            for member in reversed(chain):
+                prefix = f"{prefix}/{member}" if prefix else member
+                paths[member] = prefix
+        return paths
+
+    # Session summaries
+
+    @staticmethod
+    def _merge_summary(summary: Optional[dict], session_id: str, rows: list[dict], archived: bool) -> dict:
+        """Fold a batch of action rows, in (ts, id) order, into a stored session summary.
+
+        Rows at or before the summary's last action were already counted
+        (a forced re-sync re-ingests compacted actions) and are skipped.
+        """
+        summary = dict(summary or {
+            "session_id": session_id, "action_count": 0, "tool_calls": 0, "types": "{}", "tools": "{}",
+            "tokens": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0,
+            "first_ts": None, "first_at": None, "last_ts": None, "last_id": None, "last_at": None,
+        })
+        types, tools = json.loads(summary["types"]), json.loads(summary["tools"])
+        covered = (summary["last_ts"], summary["last_id"]) if summary["last_ts"] is not None else None
+        for row in GraphStore._uncompacted(rows, covered):
+            summary["action_count"] += 1
+            types[row["type"]] = types.get(row["type"], 0) + 1
+            if row["type"] == "tool_call":
+                summary["tool_calls"] += 1
+                if row.get("name"):
+                    tools[row["name"]] = tools.get(row["name"], 0) + 1
+            for metric in USAGE_METRICS[1:]:
+                summary[metric] += row.get(metric) or 0
+            if summary["first_ts"] is None or row["ts"] < summary["first_ts"]:
+                summary["first_ts"], summary["first_at"] = row["ts"], row["timestamp"]
+            summary["last_ts"], summary["last_id"], summary["last_at"] = row["ts"], row["id"], row["timestamp"]
+        summary["types"], summary["tools"] = json.dumps(types), json.dumps(tools)
+        summary["archived"] = bool(summary.get("archived")) or archived
+        summary["compacted_at"] = datetime.now(timezone.utc).isoformat()
+        return summary
+
+    @staticmethod
+    def _uncompacted(rows: list[dict], covered: Optional[tuple]) -> list[dict]:
+        """Drop rows at or before `covered`, a session summary's last (ts, id).
+
+        Compaction removes a session's actions oldest first, so those were
+        already folded into the summary (and the counters) and re-syncing
+        the session file must not count them again.
+        """
+        return [row for row in rows if (row["ts"], row["id"]) > covered] if covered else rows
+
+    @staticmethod
+    def _rebuild_horizon(last_compacted: Optional[int]) -> int:
+        """Where the reconcile rebuilds of the time-bucketed rollups start (epoch ms).
+
+        Tool days, usage hours and activity buckets up to the day of the
+        latest compacted action may count actions retention has deleted,
+        so those are kept as they are; with nothing compacted (None)
+        everything is rebuilt.
+        """
+        if last_compacted is None:
+            return 0
+        day = ACTIVITY_RESOLUTIONS["day"]
+        return last_compacted - last_compacted % day + day
+
+    @staticmethod
+    def _summary_props(summary: Optional[dict]) -> Optional[dict]:
+        """A stored summary as returned by the API (histograms decoded)."""
+        if not summary:
+            return None
+        props = {k: v for k, v in summary.items() if k != "last_id"}
+        props["types"], props["tools"] = json.loads(summary["types"]), json.loads(summary["tools"])
+        props["archived"] = bool(summary["archived"])
+        props["cost"] = round(summary["cost"], 6)
+        return props
+
+    # Graph payloads
+
+    @staticmethod
+    def _action_node(ac: dict) -> dict:
+        return {"id": ac["id"], "label": ac["label"], "type": "Action", "action_type": ac["action_type"],
+                "details": ac["details"], "timestamp": ac["timestamp"]}
+
+    @classmethod
+    def _build_graph(cls, records: list) -> dict:
+        """Turn (agent, session, actions) rows into deduplicated nodes and edges."""
+        agents = []
+        sessions = []
+        actions = []
+        edges = []
+        node_ids = set()
+        cursor = 0
+        for r in records:
+            cursor = r["cursor"]
+            session_info = r["session"]
+            if not session_info:
+                continue
+            if r["agent_id"] not in node_ids:
+                agents.append({"id": r["agent_id"], "label": r["agent_name"], "type": "Agent"})
+                node_ids.add(r["agent_id"])
+            if session_info["id"] in node_ids:
+                continue
+            sessions.append({**session_info, "type": "Session"})
+            node_ids.add(session_info["id"])
+            edges.append({"source": r["agent_id"], "target": session_info["id"], "type": "HAS_SESSION"})
+            for ac in r["actions"]:
+                if ac["id"] in node_ids:
+                    continue
+                actions.append(ac)
+                node_ids.add(ac["id"])
+                edges.append({"source": session_info["id"], "target": ac["id"], "type": "CONTAINS"})
+
+        # FOLLOWED_BY edges only between actions that are part of the graph
+        edges.extend({"source": ac["prev"], "target": ac["id"], "type": "FOLLOWED_BY"}
+                     for ac in actions if ac["prev"] in node_ids)
+        return {"nodes": agents + sessions + [cls._action_node(ac) for ac in actions],
+                "edges": edges, "cursor": cursor}
+
+    @classmethod
+    def _build_delta(cls, since: int, cursor: int, sessions: list[dict], actions: list[dict],
+                     limit: int) -> dict:
+        """Assemble a graph delta from changed sessions and up to `limit` + 1 actions."""
+        if since > cursor or len(actions) > limit:
+            return {"nodes": [], "edges": [], "cursor": cursor, "reset": True}
+
+        nodes = []
+        edges = []
+        for row in sessions:
+            session_info = row["session"]
+            nodes.append({"id": row["agent_id"], "label": row["agent_name"], "type": "Agent"})
+            nodes.append({**session_info, "type": "Session"})
+            edges.append({"source": row["agent_id"], "target": session_info["id"], "type": "HAS_SESSION"})
+        for ac in actions:
+            nodes.append(cls._action_node(ac))
+            edges.append({"source": ac["session_id"], "target": ac["id"], "type": "CONTAINS"})
+            if ac["prev"]:
+                edges.append({"source": ac["prev"], "target": ac["id"], "type": "FOLLOWED_BY"})
+        return {"nodes": nodes, "edges": edges, "cursor": cursor, "reset": False}
+
+
+# Singleton instance
+_client: Optional[GraphStore] = None
+
+
+def get_client() -> GraphStore:
+    """Get the configured graph store singleton, connected."""
+    global _client
+    if _client is None:
+        if STORAGE_BACKEND == "sqlite":
+            from sqlite_store import SQLiteStore
+            store = SQLiteStore()
+        elif STORAGE_BACKEND == "neo4j":
+            from neo4j_client import Neo4jClient
+            store = Neo4jClient()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND!r} (use neo4j or sqlite)")
+        store.connect()
+        _client = store
+    return _client
@@ -0,0 +1,176 @@
+"""Single-flight scheduler for full session syncs.
+
+At most one full sync runs at a time. A request that arrives while one is
+running is coalesced into it when the running job already covers it (a
+plain sync while a forced one runs, or the same kind of sync), and
+otherwise becomes the single queued follow-up; further requests fold into
+that follow-up. Jobs report progress (files done/total, actions written,
+ETA) and can be cancelled between files.
+"""
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional, Callable
+
+from sync_sessions import sync_all_sessions, SYNC_WORKERS
+
+# Finished jobs kept for /api/sync/status
+SYNC_JOB_HISTORY = 10
+
+_job_ids = itertools.count(1)
+
+
+def _timestamp(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+class SyncJob:
+    def __init__(self, force: bool, workers: int, source: str):
+        self.id = next(_job_ids)
+        self.force = force
+        self.workers = workers
+        self.source = source
+        self.status = "queued"
+        self.requests = 1
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.files_total = 0
+        self.files_done = 0
+        self.actions = 0
+        self.errors = 0
+        self.error: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def covers(self, force: bool) -> bool:
+        """Whether this job does everything a request with `force` would."""
+        return self.force or not force
+
+    def on_start(self, total: int):
+        with self._lock:
+            self.files_total = total
+
+    def on_result(self, result: dict):
+        """Count one file result; called from the sync's writer threads."""
+        with self._lock:
+            self.files_done += 1
+            if result["status"] in ("synced", "appended"):
+                self.actions += result["actions"]
+            elif result["status"] == "error":
+                self.errors += 1
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished; False on timeout."""
+        return self._done.wait(timeout)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+            rate = self.files_done / elapsed if elapsed > 0 else 0.0
+            eta = None
+            if self.status == "running" and rate > 0:
+                eta = round((self.files_total - self.files_done) / rate, 1)
+            return {
+                "id": self.id,
+                "status": self.status,
+                "force": self.force,
+                "source": self.source,
+                "requests": self.requests,
+                "created_at": _timestamp(self.created_at),
+                "started_at": _timestamp(self.started_at),
+                "finished_at": _timestamp(self.finished_at),
+                "files_total": self.files_total,
+                "files_done": self.files_done,
+                "actions": self.actions,
+                "errors": self.errors,
+                "elapsed": round(elapsed, 1),
+                "files_per_s": round(rate, 1),
+                "eta_seconds": eta,
+                "error": self.error,
+            }
+
+
+class SyncJobManager:
+    def __init__(self, runner: Callable[..., list] = sync_all_sessions, history: int = SYNC_JOB_HISTORY):
+        self.runner = runner
+        self.running: Optional[SyncJob] = None
+        self.pending: Optional[SyncJob] = None
+        self.history: deque[SyncJob] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def submit(self, force: bool = False, workers: int = SYNC_WORKERS, source: str = "api") -> tuple[str, SyncJob]:
+        """Request a full sync; returns ("started" | "coalesced" | "queued", job)."""
+        with self._lock:
+            if self.running is None:
+                job = self.running = SyncJob(force, workers, source)
+                threading.Thread(target=self._run, args=(job,), daemon=True, name="sync-job").start()
+                return "started", job
+            if not self.running.cancel_event.is_set() and self.running.covers(force):
+                self.running.requests += 1
+                return "coalesced", self.running
+            if self.pending is not None:
+                self.pending.force = self.pending.force or force
+                self.pending.requests += 1
+                return "queued", self.pending
+            job = self.pending = SyncJob(force, workers, source)
+            return "queued", job
+
+    def cancel(self) -> Optional[dict]:
+        """Cancel the running job (after the files in flight) and drop the follow-up."""
+        with self._lock:
+            if self.pending is not None:
+                self._finish(self.pending, "cancelled")
+                self.pending = None
+            if self.running is None:
+                return None
+            self.running.cancel_event.set()
+            return self.running.snapshot()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running.snapshot() if self.running else None,
+                "pending": self.pending.snapshot() if self.pending else None,
+                "history": [job.snapshot() for job in reversed(self.history)],
+            }
+
+    def _finish(self, job: SyncJob, status: str, error: Optional[str] = None):
+        with job._lock:
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+        self.history.append(job)
+        job._done.set()
+
+    def _run(self, job: SyncJob):
+        while job is not None:
+            with job._lock:
+                job.status = "running"
+                job.started_at = time.time()
+            try:
+                self.runner(force=job.force, workers=job.workers, on_start=job.on_start,
+                            on_result=job.on_result, cancel=job.cancel_event)
+                status, error = ("cancelled" if job.cancel_event.is_set() else "completed"), None
+            except Exception as e:
+                print(f"Sync job {job.id} failed: {e}")
+                status, error = "failed", str(e)
+            with self._lock:
+                self._finish(job, status, error)
+                job = self.running = self.pending
+                self.pending = None
+
+
+# Singleton instance
+_manager: Optional[SyncJobManager] = None
+
+
+def get_sync_jobs() -> SyncJobManager:
+    """Get the process-wide sync job manager."""
+    global _manager
+    if _manager is None:
+        _manager = SyncJobManager()
+    return _manager
@@ -0,0 +1,117 @@
+"""Local SQLite manifest of synced session files.
+
+Records size, mtime, inode, a hash of the file head and the last synced
+byte offset per session, so a full scan can decide what to do with each
+file from a `stat` call instead of a database query.
+"""
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MANIFEST_PATH = os.getenv("SYNC_MANIFEST", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                        "sync_manifest.db"))
+
+# Bytes at the start of a file hashed to detect a replaced file of equal or larger size
+HEAD_HASH_BYTES = 4096
+
+
+def hash_head(filepath: str, length: int) -> str:
+    """Hash the first `length` bytes of a file."""
+    with open(filepath, "rb") as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+class SyncManifest:
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                filepath TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                inode INTEGER NOT NULL,
+                head_hash TEXT NOT NULL,
+                head_len INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                prev_action_id TEXT,
+                synced_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def close(self):
+        """Close the manifest database."""
+        self._conn.close()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        """Get the manifest entry for a session."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([c[0] for c in cursor.description], row))
+
+    def state(self, session_id: str, filepath: str) -> str:
+        """Classify a file against its manifest entry.
+
+        Returns "new" (never synced), "unchanged", "grown" (appended to since
+        the last sync) or "replaced" (truncated, rotated or rewritten).
+        """
+        entry = self.get(session_id)
+        if entry is None:
+            return "new"
+
+        stat = os.stat(filepath)
+        if stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]:
+            return "unchanged"
+        if stat.st_ino != entry["inode"] or stat.st_size < entry["offset"]:
+            return "replaced"
+        if hash_head(filepath, entry["head_len"]) != entry["head_hash"]:
+            return "replaced"
+        return "grown"
+
+    def record(self, session_id: str, filepath: str, offset: int, prev_action_id: Optional[str],
+               stat: os.stat_result):
+        """Store how far a session file has been synced.
+
+        `stat` must be taken before the file was read, so that lines appended
+        while syncing make the next scan see the file as grown.
+        """
+        head_len = min(offset, HEAD_HASH_BYTES)
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO sessions
+                    (session_id, filepath, size, mtime, inode, head_hash, head_len,
+                     offset, prev_action_id, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (session_id, filepath, stat.st_size, stat.st_mtime, stat.st_ino,
+                  hash_head(filepath, head_len), head_len, offset, prev_action_id, time.time()))
+            self._conn.commit()
+
+    def clear(self):
+        """Forget every synced file."""
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions")
+            self._conn.commit()
+
+
+# Singleton instance
+_manifest: Optional[SyncManifest] = None
+
+
+def get_manifest() -> SyncManifest:
+    """Get the sync manifest singleton."""
+    global _manifest
+    if _manifest is None:
+        _manifest = SyncManifest()
+    return _manifest
@@ -0,0 +1,186 @@
+"""Debounced, coalescing queue between the file watcher and the sync worker.
+
+watchdog fires many events per second while an agent streams output. The
+observer thread only records the path here; repeated events for the same
+file inside the debounce window collapse into one pending entry, and a
+dedicated worker thread syncs each file once it has been quiet for the
+debounce window (or has waited `max_delay`, so a file that never goes
+quiet still makes progress).
+
+Files are tagged with the instance (session root) they belong to. Each
+instance holds at most `limit` pending files, and the worker takes due files
+from the instances in turn, so a busy instance neither starves the others
+nor grows the queue without bound. All roots share one observer thread, so
+`put` never blocks: an event for a new file of a full instance is dropped
+and the instance marked for a rescan, which queues every file `rescan`
+lists for it once its pending files have drained.
+"""
+import os
+import threading
+import time
+from typing import Callable, Optional
+from dotenv import load_dotenv
+
+from metrics import record_sync, observe_watch_lag
+
+load_dotenv()
+
+WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", "0.5"))
+WATCH_MAX_DELAY = float(os.getenv("WATCH_MAX_DELAY", "5"))
+# Pending files per instance before its new files are dropped for a later rescan
+WATCH_QUEUE_LIMIT = int(os.getenv("WATCH_QUEUE_LIMIT", "1000"))
+
+
+class SyncEventQueue:
+    def __init__(self, handler: Callable[[str, str], dict], debounce: float = WATCH_DEBOUNCE,
+                 max_delay: float = WATCH_MAX_DELAY, limit: int = WATCH_QUEUE_LIMIT,
+                 rescan: Optional[Callable[[str], list[str]]] = None):
+        self.handler = handler
+        self.rescan = rescan
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.limit = limit
+        # instance -> path -> {"first": first event time, "last": latest event time}
+        self._pending: dict[str, dict[str, dict]] = {}
+        # Instances in the order they get their next turn
+        self._turns: list[str] = []
+        # Instances that dropped events while full, to rescan once drained
+        self._overflowed: set[str] = set()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._busy = False
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.rescans = 0
+        self.processed = 0
+        self.last_lag: Optional[float] = None
+        self.max_lag = 0.0
+
+    def put(self, path: str, instance: str = ""):
+        """Record a change to `path`; cheap enough to call from the observer thread.
+
+        Never blocks: if `instance` already has `limit` other files pending,
+        the event is dropped and the instance rescanned later.
+        """
+        with self._cond:
+            self.received += 1
+            pending = self._pending.setdefault(instance, {})
+            if instance not in self._turns:
+                self._turns.append(instance)
+            if path not in pending and len(pending) >= self.limit:
+                self.dropped += 1
+                self._overflowed.add(instance)
+                return
+            now = time.time()
+            entry = pending.get(path)
+            if entry:
+                entry["last"] = now
+                self.coalesced += 1
+            else:
+                pending[path] = {"first": now, "last": now}
+            self._cond.notify_all()
+
+    def start(self):
+        """Start the sync worker thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker after the file it is currently syncing."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+
+    def stats(self) -> dict:
+        """Queue depth and end-to-end lag (first event for a file -> synced)."""
+        with self._cond:
+            entries = [e for pending in self._pending.values() for e in pending.values()]
+            oldest = min((e["first"] for e in entries), default=None)
+            return {
+                "depth": len(entries),
+                "instances": {instance: len(pending) for instance, pending in self._pending.items()},
+                "busy": self._busy,
+                "events_received": self.received,
+                "files_synced": self.processed,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "rescans": self.rescans,
+                "rescan_pending": sorted(self._overflowed),
+                "oldest_pending_age": time.time() - oldest if oldest else 0.0,
+                "last_lag": self.last_lag,
+                "max_lag": self.max_lag,
+            }
+
+    def _next_ready(self) -> tuple[Optional[str], Optional[str], float]:
+        """Find the next instance with a due file and its oldest one, or how long to wait.
+
+        Instances are tried in turn order; the one served goes to the back.
+        """
+        now = time.time()
+        wait = self.debounce
+        for instance in self._turns:
+            ready = None
+            pending = self._pending[instance]
+            for path, entry in pending.items():
+                due = min(entry["last"] + self.debounce, entry["first"] + self.max_delay)
+                if due <= now:
+                    if ready is None or entry["first"] < pending[ready]["first"]:
+                        ready = path
+                else:
+                    wait = min(wait, due - now)
+            if ready is not None:
+                self._turns.remove(instance)
+                self._turns.append(instance)
+                return instance, ready, 0.0
+        return None, None, wait
+
+    def _refill(self):
+        """Queue every file of the overflowed instances whose pending files have drained."""
+        for instance in [i for i in self._overflowed if not self._pending.get(i)]:
+            self._overflowed.discard(instance)
+            if not self.rescan:
+                continue
+            try:
+                paths = self.rescan(instance)
+            except OSError as e:
+                print(f"  Rescan of {instance or 'sessions'} failed: {e}")
+                continue
+            self.rescans += 1
+            now = time.time()
+            for path in paths:
+                self._pending[instance].setdefault(path, {"first": now, "last": now})
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running:
+                        return
+                    self._refill()
+                    instance, path, wait = self._next_ready()
+                    if path:
+                        entry = self._pending[instance].pop(path)
+                        self._busy = True
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait(timeout=wait if any(self._pending.values()) else None)
+
+            try:
+                result = self.handler(path, instance)
+                record_sync(result)
+                print(f"  Sync {os.path.basename(path)[:8]}...: {result.get('status')}")
+            except Exception as e:
+                print(f"  Sync {os.path.basename(path)[:8]}... failed: {e}")
+
+            lag = time.time() - entry["first"]
+            observe_watch_lag(lag)
+            with self._cond:
+                self._busy = False
+                self.processed += 1
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
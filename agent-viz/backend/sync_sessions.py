@@ -8,42 +8,108 @@ import os
 import json
 import glob
 import re
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import (ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from datetime import datetime, timezone
+from itertools import chain, islice, zip_longest
 from pathlib import Path
-from typing import Optional
+from queue import Queue
+from typing import Optional, Callable, Iterable, Iterator
 from dotenv import load_dotenv
 
-from neo4j_client import get_client
+from storage import get_client
+from metrics import record_sync, record_sync_run, timed_iter, watch_queue
+from sync_manifest import get_manifest
+from sync_queue import SyncEventQueue
 
 load_dotenv()
 
 SESSION_PATH = os.getenv("SESSION_PATH", "/opt/clawdbot-1/.clawdbot/agents/main/sessions/")
 
+# Parallel sync: parser pool size, pool type ("process" or "thread") and writer threads
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "1"))
+SYNC_POOL = os.getenv("SYNC_POOL", "process")
+SYNC_WRITERS = int(os.getenv("SYNC_WRITERS", "1"))
+# A parsed bundle holds all of a file's actions; larger files skip the parser pool
+# and are streamed by a writer thread instead, so a bundle stays under about this size
+SYNC_BUNDLE_MAX_BYTES = int(os.getenv("SYNC_BUNDLE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Number of leading entries searched for session metadata (meta, agent, label, model, channel)
+METADATA_WINDOW = 20
+
+# Subagent spawn message: "You are a **subagent** ...\nYour session: ...\nRequester session: ...\nLabel: ..."
+SUBAGENT_MARKER = "You are a **subagent**"
+SUBAGENT_SESSION_RE = re.compile(r"Your session: agent:main:subagent:([a-f0-9-]+)")
+REQUESTER_SESSION_RE = re.compile(r"Requester session: ([^\s]+)")
+LABEL_RE = re.compile(r"Label: ([^\n]+)")
+SESSION_KEY_AGENT_RE = re.compile(r"agent:[^:\s]+:subagent:([a-f0-9-]+)")
+
+# Lines are decoded with raw_decode, skipping json.loads' encoding detection and whitespace checks
+_decode_json = json.JSONDecoder().raw_decode
+
+
+def parse_session_roots(spec: str) -> list[tuple[str, str]]:
+    """Parse SESSION_ROOTS ("clawdbot-1=/opt/clawdbot-1/...,clawdbot-2=...") into (instance, path) pairs."""
+    roots = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        instance, sep, path = (part.strip() for part in item.partition("="))
+        if not sep or not instance or not path:
+            raise ValueError(f"Invalid SESSION_ROOTS entry: {item!r} (expected instance=path)")
+        if ":" in instance or "/" in instance:
+            raise ValueError(f"Invalid instance name: {instance!r}")
+        if instance in (name for name, _ in roots):
+            raise ValueError(f"Duplicate instance name: {instance!r}")
+        roots.append((instance, path))
+    return roots
+
+
+# Session directories of several Clawdbot instances on one host, each with an instance
+# label that prefixes its agent, session and action ids. Unset: SESSION_PATH, unprefixed.
+SESSION_ROOTS = parse_session_roots(os.getenv("SESSION_ROOTS", "")) or [("", SESSION_PATH)]
+
+
+def namespace(instance: str, value: Optional[str]) -> Optional[str]:
+    """Prefix an id with its instance ("clawdbot-2:main"); ids of the default instance are unchanged."""
+    return f"{instance}:{value}" if instance and value else value
+
+
+def session_id_for(filepath: str, instance: str = "") -> str:
+    """The (namespaced) session id of a session file."""
+    return namespace(instance, Path(filepath).stem)
+
 
 def parse_timestamp(ts: str) -> datetime:
-    """Parse ISO timestamp to datetime."""
+    """Parse ISO timestamp to a UTC datetime (naive timestamps are taken as UTC)."""
     # Handle various formats
     ts = ts.replace("Z", "+00:00")
     try:
-        return datetime.fromisoformat(ts)
+        parsed = datetime.fromisoformat(ts)
     except ValueError:
         # Fallback
-        return datetime.now()
+        return datetime.now(timezone.utc)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
 
 
 def extract_session_label(session_id: str, entries: list) -> Optional[str]:
     """Extract a readable label from session entries."""
     # Look for channel info in first few entries
     for entry in entries[:10]:
-        if entry.get("type") == "custom":
-            data = entry.get("data", {})
-            if "channel" in str(data):
-                return f"Session via {data.get('channel', 'unknown')}"
+        entry_type = entry.get("type")
+        if entry_type == "custom":
+            data = entry.get("data")
+            if isinstance(data, dict) and "channel" in data:
+                return f"Session via {data['channel']}"
         
-        if entry.get("type") == "message":
-            msg = entry.get("message", {})
+        elif entry_type == "message":
+            msg = entry.get("message") or {}
             if msg.get("role") == "user":
-                content = msg.get("content", [])
+                content = msg.get("content")
                 if isinstance(content, list) and content:
                     first = content[0]
                     if isinstance(first, dict) and first.get("type") == "text":
@@ -53,56 +119,206 @@ def extract_session_label(session_id: str, entries: list) -> Optional[str]:
     return None
 
 
+def session_key_agent(session_key: str) -> str:
+    """The agent id behind a session key (agent:main:subagent:<uuid> -> subagent:<uuid[:8]>)."""
+    match = SESSION_KEY_AGENT_RE.match(session_key)
+    return f"subagent:{match.group(1)[:8]}" if match else "main"
+
+
 def extract_agent_info(session_id: str, entries: list) -> dict:
     """Extract agent info from session entries."""
     agent_info = {
         "id": "main",
         "name": "main",
         "type": "main",
-        "parent_id": None
+        "parent_id": None,
+        "session_key": None,
+        "requester_session": None
     }
     
-    # Check if this is a subagent session
-    for entry in entries[:20]:
-        if entry.get("type") == "custom" and entry.get("customType") == "model-snapshot":
-            # Check for subagent markers in the context
-            pass
-        
-        if entry.get("type") == "message":
-            msg = entry.get("message", {})
-            content = msg.get("content", [])
-            if isinstance(content, list):
-                for c in content:
-                    if isinstance(c, dict) and c.get("type") == "text":
-                        text = c.get("text", "")
-                        # Check for subagent context
-                        if "You are a **subagent**" in text:
-                            # Extract subagent info
-                            match = re.search(r"Your session: agent:main:subagent:([a-f0-9-]+)", text)
-                            if match:
-                                agent_info["id"] = f"subagent:{match.group(1)[:8]}"
-                                agent_info["name"] = f"Subagent {match.group(1)[:8]}"
-                                agent_info["type"] = "subagent"
-                            
-                            # Find parent session
-                            parent_match = re.search(r"Requester session: ([^\s]+)", text)
-                            if parent_match:
-                                agent_info["parent_id"] = "main"
-                            
-                            # Try to get label
-                            label_match = re.search(r"Label: ([^\n]+)", text)
-                            if label_match:
-                                agent_info["name"] = label_match.group(1).strip()
-                            
-                            return agent_info
+    # A subagent session opens with the spawn message
+    for entry in entries[:METADATA_WINDOW]:
+        if entry.get("type") != "message":
+            continue
+        content = (entry.get("message") or {}).get("content")
+        if not isinstance(content, list):
+            continue
+        for c in content:
+            if not isinstance(c, dict) or c.get("type") != "text":
+                continue
+            text = c.get("text", "")
+            if SUBAGENT_MARKER not in text:
+                continue
+            
+            match = SUBAGENT_SESSION_RE.search(text)
+            if match:
+                agent_info["session_key"] = f"agent:main:subagent:{match.group(1)}"
+                agent_info["id"] = f"subagent:{match.group(1)[:8]}"
+                agent_info["name"] = f"Subagent {match.group(1)[:8]}"
+                agent_info["type"] = "subagent"
+            
+            # The requesting session's agent is the parent
+            parent_match = REQUESTER_SESSION_RE.search(text)
+            if parent_match:
+                agent_info["requester_session"] = parent_match.group(1)
+                agent_info["parent_id"] = session_key_agent(parent_match.group(1))
+            
+            label_match = LABEL_RE.search(text)
+            if label_match:
+                agent_info["name"] = label_match.group(1).strip()
+            
+            return agent_info
     
     return agent_info
 
 
-def parse_session_file(filepath: str, force: bool = False) -> dict:
-    """Parse a single session JSONL file."""
-    client = get_client()
-    session_id = Path(filepath).stem
+# Entry classifiers: each returns (action id, type, name, details) for the actions of one entry.
+# extract_actions picks one by a table lookup on the entry type, or the role for messages.
+
+def _tool_call_item(item: dict, entry_id: str) -> tuple:
+    name = item.get("name")
+    details = {"tool": name, "args_preview": str(item.get("arguments", ""))[:200]}
+    return f"{entry_id}:{name}", "tool_call", name, details
+
+
+# Assistant content item type -> classifier
+CONTENT_ITEM_ACTIONS = {
+    "toolCall": _tool_call_item,
+}
+
+
+def _assistant_actions(entry: dict, msg: dict, entry_id: str) -> list[tuple]:
+    """One tool_call per tool call item, then the completion if the turn ended."""
+    actions = []
+    content = msg.get("content")
+    if isinstance(content, list):
+        for item in content:
+            if isinstance(item, dict):
+                classify = CONTENT_ITEM_ACTIONS.get(item.get("type"))
+                if classify:
+                    actions.append(classify(item, entry_id))
+    if msg.get("stopReason") == "stop":
+        usage = msg.get("usage") or {}
+        actions.append((entry_id, "completion", "assistant_response", {
+            "model": msg.get("model"),
+            "tokens": usage.get("totalTokens"),
+            "input_tokens": usage.get("input"),
+            "output_tokens": usage.get("output"),
+            "cost": (usage.get("cost") or {}).get("total")
+        }))
+    return actions
+
+
+def _user_actions(entry: dict, msg: dict, entry_id: str) -> list[tuple]:
+    return [(entry_id, "user_message", "user_input", None)]
+
+
+def _tool_result_actions(entry: dict, msg: dict, entry_id: str) -> list[tuple]:
+    return [(entry_id, "tool_result", msg.get("toolName"), {"is_error": entry.get("isError", False)})]
+
+
+def _model_change_actions(entry: dict, msg: dict, entry_id: str) -> list[tuple]:
+    return [(entry_id, "model_change", entry.get("modelId"), {"provider": entry.get("provider")})]
+
+
+def _thinking_change_actions(entry: dict, msg: dict, entry_id: str) -> list[tuple]:
+    return [(entry_id, "thinking_change", entry.get("thinkingLevel"), None)]
+
+
+# Message role -> classifier
+MESSAGE_ACTIONS = {
+    "assistant": _assistant_actions,
+    "user": _user_actions,
+    "toolResult": _tool_result_actions,
+}
+
+# Entry type (other than "message") -> classifier
+ENTRY_ACTIONS = {
+    "model_change": _model_change_actions,
+    "thinking_level_change": _thinking_change_actions,
+}
+
+
+def extract_actions(entry: dict, prev_action_id: Optional[str], id_prefix: str = "") -> list[dict]:
+    """Turn one session entry into action dicts, chained from prev_action_id."""
+    entry_id = entry.get("id")
+    if not entry_id:
+        return []
+    
+    if entry.get("type") == "message":
+        msg = entry.get("message") or {}
+        classify = MESSAGE_ACTIONS.get(msg.get("role"))
+    else:
+        msg = None
+        classify = ENTRY_ACTIONS.get(entry.get("type"))
+    if classify is None:
+        return []
+    
+    ts = entry.get("timestamp")
+    timestamp = parse_timestamp(ts) if ts else datetime.now(timezone.utc)
+    actions = []
+    for action_id, action_type, name, details in classify(entry, msg, f"{id_prefix}{entry_id}"):
+        actions.append({
+            "id": action_id,
+            "type": action_type,
+            "name": name,
+            "timestamp": timestamp,
+            "details": details,
+            "parent_id": prev_action_id
+        })
+        prev_action_id = action_id
+    
+    return actions
+
+
+def iter_entries(filepath: str, offset: int = 0) -> Iterator[tuple[dict, int]]:
+    """Stream JSONL entries from a byte offset, one line at a time.
+
+    Yields each decoded entry with the offset just past its line. Lines that
+    are not valid UTF-8 JSON are skipped; a trailing line that is not yet
+    complete (no newline and not valid JSON) is left for the next read.
+    """
+    with open(filepath, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            line = raw.strip()
+            offset += len(raw)
+            if not line:
+                continue
+            try:
+                text = line.decode()
+                entry, end = _decode_json(text)
+                if end != len(text):
+                    raise json.JSONDecodeError("Extra data", text, end)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                if not raw.endswith(b"\n"):
+                    return
+                continue
+            yield entry, offset
+
+
+def stream_actions(records: Iterable[tuple[dict, int]], prev_action_id: Optional[str],
+                   progress: dict, instance: str = "") -> Iterator[dict]:
+    """Yield actions for a stream of entries, keeping running totals in `progress`.
+
+    `progress` ends up holding the offset of the last consumed entry, the
+    tail of the FOLLOWED_BY chain and the action/tool call counts.
+    """
+    progress.update(prev_action_id=prev_action_id, actions=0, tool_calls=0)
+    id_prefix = f"{instance}:" if instance else ""
+    for entry, end_offset in records:
+        for action in extract_actions(entry, progress["prev_action_id"], id_prefix):
+            progress["prev_action_id"] = action["id"]
+            progress["actions"] += 1
+            if action["type"] == "tool_call":
+                progress["tool_calls"] += 1
+            yield action
+        progress["offset"] = end_offset
+
+
+def _skip_reason(filepath: str, instance: str = "") -> Optional[dict]:
+    """Return a skip result for files that are never synced, else None."""
+    session_id = session_id_for(filepath, instance)
     
     # Skip deleted sessions
     if ".deleted." in filepath:
@@ -112,239 +328,507 @@ def parse_session_file(filepath: str, force: bool = False) -> dict:
     if filepath.endswith(".lock"):
         return {"session_id": session_id, "status": "skipped", "reason": "lock_file"}
     
-    # Check if already synced
-    if not force and client.session_exists(session_id):
-        return {"session_id": session_id, "status": "skipped", "reason": "already_synced"}
+    return None
+
+
+def _file_state(filepath: str, instance: str = "") -> str:
+    """Classify a file against the sync manifest (see SyncManifest.state)."""
+    return get_manifest().state(session_id_for(filepath, instance), filepath)
+
+
+def open_session(filepath: str, instance: str = "") -> tuple[Optional[dict], Optional[dict]]:
+    """Read session metadata and return (header, None) or (None, skip/error result).
+
+    The header holds agent_info, session_info and `records`, an entry stream
+    positioned at the start of the file (the look-ahead window is replayed).
+    Agent and session ids are namespaced by `instance`.
+    """
+    session_id = session_id_for(filepath, instance)
     
-    entries = []
     try:
-        with open(filepath, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    try:
-                        entries.append(json.loads(line))
-                    except json.JSONDecodeError:
-                        continue
+        records = iter_entries(filepath)
+        # Metadata only ever appears near the top of the file
+        window = list(islice(records, METADATA_WINDOW))
     except Exception as e:
-        return {"session_id": session_id, "status": "error", "reason": str(e)}
+        return None, {"session_id": session_id, "status": "error", "reason": str(e)}
+    
+    if not window:
+        return None, {"session_id": session_id, "status": "skipped", "reason": "empty"}
     
-    if not entries:
-        return {"session_id": session_id, "status": "skipped", "reason": "empty"}
+    entries = [entry for entry, _ in window]
     
-    # Extract session metadata
+    # Session metadata, model and channel in one pass over the window
     session_meta = None
+    model = None
+    channel = None
     for entry in entries:
-        if entry.get("type") == "session":
-            session_meta = entry
-            break
+        entry_type = entry.get("type")
+        if entry_type == "session":
+            session_meta = session_meta or entry
+        elif entry_type == "model_change":
+            model = entry.get("modelId")
+        elif entry_type == "custom":
+            data = entry.get("data")
+            if isinstance(data, dict) and "channel" in data:
+                channel = data["channel"]
     
     if not session_meta:
-        return {"session_id": session_id, "status": "skipped", "reason": "no_session_meta"}
+        return None, {"session_id": session_id, "status": "skipped", "reason": "no_session_meta"}
     
-    # Get agent info
+    # Get agent info; a requester is always in the same instance
     agent_info = extract_agent_info(session_id, entries)
+    if instance:
+        if agent_info["id"] == "main":
+            agent_info["name"] = namespace(instance, "main")
+        agent_info["id"] = namespace(instance, agent_info["id"])
+        agent_info["parent_id"] = namespace(instance, agent_info["parent_id"])
     
-    # Create agent
-    session_time = parse_timestamp(session_meta.get("timestamp", datetime.now().isoformat()))
-    client.create_agent(
-        agent_id=agent_info["id"],
-        name=agent_info["name"],
-        agent_type=agent_info["type"],
-        created_at=session_time,
-        parent_id=agent_info["parent_id"]
-    )
-    
-    # Extract model info
-    model = None
-    channel = None
-    for entry in entries[:20]:
-        if entry.get("type") == "model_change":
-            model = entry.get("modelId")
-        if entry.get("type") == "custom":
-            data = entry.get("data", {})
-            if "channel" in str(data):
-                channel = data.get("channel")
-    
-    # Create session
-    label = extract_session_label(session_id, entries)
-    client.create_session(
-        session_id=session_id,
-        agent_id=agent_info["id"],
-        label=label,
-        channel=channel,
-        started_at=session_time,
-        model=model,
-        cwd=session_meta.get("cwd")
-    )
-    
-    # Process actions
-    action_count = 0
-    tool_call_count = 0
-    prev_action_id = None
+    started = session_meta.get("timestamp")
+    session_time = parse_timestamp(started) if started else datetime.now(timezone.utc)
+    agent_info["created_at"] = session_time
     
-    for entry in entries:
-        entry_type = entry.get("type")
-        entry_id = entry.get("id")
-        
-        if not entry_id:
-            continue
-        
-        timestamp = parse_timestamp(entry.get("timestamp", datetime.now().isoformat()))
-        
-        # Determine action type and details
-        action_type = None
-        action_name = None
-        details = None
-        
-        if entry_type == "message":
-            msg = entry.get("message", {})
-            role = msg.get("role")
-            
-            if role == "assistant":
-                content = msg.get("content", [])
-                # Check for tool calls
-                for item in content if isinstance(content, list) else []:
-                    if isinstance(item, dict) and item.get("type") == "toolCall":
-                        action_type = "tool_call"
-                        action_name = item.get("name")
-                        tool_call_count += 1
-                        details = {"tool": action_name, "args_preview": str(item.get("arguments", ""))[:200]}
-                        
-                        client.create_action(
-                            action_id=f"{entry_id}:{action_name}",
-                            session_id=session_id,
-                            action_type=action_type,
-                            name=action_name,
-                            timestamp=timestamp,
-                            details=details,
-                            parent_id=prev_action_id
-                        )
-                        prev_action_id = f"{entry_id}:{action_name}"
-                        action_count += 1
-                
-                # Also track the completion itself
-                if msg.get("stopReason") == "stop":
-                    action_type = "completion"
-                    action_name = "assistant_response"
-                    usage = entry.get("message", {}).get("usage", {})
-                    details = {
-                        "model": entry.get("message", {}).get("model"),
-                        "tokens": usage.get("totalTokens"),
-                        "cost": usage.get("cost", {}).get("total")
-                    }
-            
-            elif role == "user":
-                action_type = "user_message"
-                action_name = "user_input"
-            
-            elif role == "toolResult":
-                action_type = "tool_result"
-                action_name = msg.get("toolName")
-                details = {"is_error": entry.get("isError", False)}
-        
-        elif entry_type == "model_change":
-            action_type = "model_change"
-            action_name = entry.get("modelId")
-            details = {"provider": entry.get("provider")}
-        
-        elif entry_type == "thinking_level_change":
-            action_type = "thinking_change"
-            action_name = entry.get("thinkingLevel")
-        
-        if action_type and action_type not in ["tool_call"]:  # tool_call already handled above
-            client.create_action(
-                action_id=entry_id,
-                session_id=session_id,
-                action_type=action_type,
-                name=action_name,
-                timestamp=timestamp,
-                details=details,
-                parent_id=prev_action_id
-            )
-            prev_action_id = entry_id
-            action_count += 1
+    session_info = {
+        "id": session_id,
+        "label": extract_session_label(session_id, entries),
+        "channel": channel,
+        "started_at": session_time,
+        "model": model,
+        "cwd": session_meta.get("cwd"),
+        "session_key": agent_info["session_key"],
+        "requester_session": agent_info["requester_session"]
+    }
+    
+    return {
+        "agent_info": agent_info,
+        "session_info": session_info,
+        "records": chain(window, records),
+        "offset": window[-1][1]
+    }, None
+
+
+def parse_session_file(filepath: str, force: bool = False, instance: str = "") -> dict:
+    """Parse a single session JSONL file."""
+    skip = _skip_reason(filepath, instance)
+    if skip:
+        return skip
+    
+    # Check if already synced
+    session_id = session_id_for(filepath, instance)
+    try:
+        if not force and _file_state(filepath, instance) != "new":
+            return {"session_id": session_id, "status": "skipped", "reason": "already_synced"}
+        stat = os.stat(filepath)
+    except OSError as e:
+        return {"session_id": session_id, "status": "error", "reason": str(e)}
+    
+    started = time.perf_counter()
+    header, skip = open_session(filepath, instance)
+    if skip:
+        return skip
+    
+    agent_info = header["agent_info"]
+    
+    # Stream the window and the rest of the file straight into one batched transaction,
+    # timing the parsing that happens inside it separately from the writes
+    timing = {"parse_seconds": time.perf_counter() - started}
+    progress = {"offset": header["offset"]}
+    actions = timed_iter(stream_actions(header["records"], None, progress, instance), timing)
+    try:
+        get_client().create_session_bundle(agent_info, header["session_info"], actions)
+    except Exception as e:
+        return {"session_id": session_id, "status": "error", "reason": str(e)}
+    get_manifest().record(session_id, filepath, progress["offset"], progress["prev_action_id"], stat)
+    
+    return {
+        "session_id": session_id,
+        "status": "synced",
+        "actions": progress["actions"],
+        "tool_calls": progress["tool_calls"],
+        "agent": agent_info["name"],
+        "parse_seconds": timing["parse_seconds"],
+        "write_seconds": time.perf_counter() - started - timing["parse_seconds"]
+    }
+
+
+def build_session_bundle(filepath: str, instance: str = "") -> dict:
+    """Parse a session file into a picklable bundle without touching the database.
+
+    Used by the parallel sync, where parsing runs in a worker pool and the
+    bundle is handed to a writer thread.
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError as e:
+        return {"session_id": session_id_for(filepath, instance), "status": "error", "reason": str(e)}
+    
+    started = time.perf_counter()
+    header, skip = open_session(filepath, instance)
+    if skip:
+        return skip
+    
+    progress = {"offset": header["offset"]}
+    try:
+        actions = list(stream_actions(header["records"], None, progress, instance))
+    except OSError as e:
+        return {"session_id": header["session_info"]["id"], "status": "error", "reason": str(e)}
+    
+    return {
+        "session_id": header["session_info"]["id"],
+        "status": "parsed",
+        "filepath": filepath,
+        "agent_info": header["agent_info"],
+        "session_info": header["session_info"],
+        "actions": actions,
+        "progress": progress,
+        "stat": stat,
+        "parse_seconds": time.perf_counter() - started
+    }
+
+
+def write_session_bundle(bundle: dict) -> dict:
+    """Write a bundle from build_session_bundle and record it in the manifest."""
+    session_id = bundle["session_id"]
+    progress = bundle["progress"]
+    started = time.perf_counter()
+    try:
+        get_client().create_session_bundle(bundle["agent_info"], bundle["session_info"],
+                                           bundle["actions"])
+        get_manifest().record(session_id, bundle["filepath"], progress["offset"],
+                              progress["prev_action_id"], bundle["stat"])
+    except Exception as e:
+        return {"session_id": session_id, "status": "error", "reason": str(e)}
     
     return {
         "session_id": session_id,
         "status": "synced",
-        "actions": action_count,
-        "tool_calls": tool_call_count,
-        "agent": agent_info["name"]
+        "actions": progress["actions"],
+        "tool_calls": progress["tool_calls"],
+        "agent": bundle["agent_info"]["name"],
+        "parse_seconds": bundle["parse_seconds"],
+        "write_seconds": time.perf_counter() - started
+    }
+
+
+def sync_session_tail(filepath: str, instance: str = "") -> dict:
+    """Sync only the lines appended to a session file since the last sync.
+
+    Falls back to a full re-sync when the file is not in the manifest yet,
+    or when it was truncated or replaced (rotation) since it was recorded.
+    """
+    skip = _skip_reason(filepath, instance)
+    if skip:
+        return skip
+    
+    session_id = session_id_for(filepath, instance)
+    manifest = get_manifest()
+    
+    try:
+        stat = os.stat(filepath)
+        state = _file_state(filepath, instance)
+    except OSError as e:
+        return {"session_id": session_id, "status": "error", "reason": str(e)}
+    
+    if state in ("new", "replaced"):
+        return parse_session_file(filepath, force=True, instance=instance)
+    
+    checkpoint = manifest.get(session_id)
+    if state == "unchanged" or stat.st_size == checkpoint["offset"]:
+        return {"session_id": session_id, "status": "skipped", "reason": "unchanged"}
+    
+    started = time.perf_counter()
+    timing = {"parse_seconds": 0.0}
+    progress = {"offset": checkpoint["offset"]}
+    actions = timed_iter(stream_actions(iter_entries(filepath, checkpoint["offset"]),
+                                        checkpoint["prev_action_id"], progress, instance), timing)
+    try:
+        get_client().upsert_actions_batch(session_id, actions)
+    except Exception as e:
+        return {"session_id": session_id, "status": "error", "reason": str(e)}
+    manifest.record(session_id, filepath, progress["offset"], progress["prev_action_id"], stat)
+    
+    return {
+        "session_id": session_id,
+        "status": "appended",
+        "actions": progress["actions"],
+        "tool_calls": progress["tool_calls"],
+        "parse_seconds": timing["parse_seconds"],
+        "write_seconds": time.perf_counter() - started - timing["parse_seconds"]
     }
 
 
-def sync_all_sessions(force: bool = False) -> list[dict]:
-    """Sync all session files."""
+def sync_session_file(filepath: str, force: bool = False, instance: str = "") -> dict:
+    """Sync a file according to its manifest state.
+
+    Unchanged files are skipped without touching the database, grown files
+    are tailed, and new or replaced files (or everything, with `force`) get
+    a full sync.
+    """
+    if force:
+        return parse_session_file(filepath, force=True, instance=instance)
+    return sync_session_tail(filepath, instance)
+
+
+def _short_id(session_id: str) -> str:
+    """A session id shortened for log lines, keeping its instance prefix."""
+    instance, _, stem = session_id.rpartition(":")
+    return f"{instance}:{stem[:8]}" if instance else stem[:8]
+
+
+def _report(result: dict):
+    """Print a one-line summary of a sync result and count it in the metrics."""
+    record_sync(result)
+    status = result.get("status")
+    short_id = _short_id(result["session_id"])
+    if status == "synced":
+        print(f"  ✓ {short_id}... ({result['actions']} actions, {result['tool_calls']} tool calls)")
+    elif status == "appended":
+        print(f"  + {short_id}... ({result['actions']} new actions)")
+    elif status == "skipped":
+        reason = result.get("reason", "unknown")
+        if reason not in ("already_synced", "unchanged"):
+            print(f"  - {short_id}... (skipped: {reason})")
+    else:
+        print(f"  ✗ {short_id}... (error: {result.get('reason')})")
+
+
+def _sync_parallel(files: list[tuple[str, str]], force: bool, workers: int, writers: int, pool: str,
+                   on_result: Callable[[dict], None], cancel: Optional[threading.Event]) -> list[dict]:
+    """Parse files in a worker pool and drain the bundles with writer threads.
+
+    At most `2 * workers` parsed bundles are held in memory at a time: the
+    bounded queue blocks the dispatcher when the writers fall behind, and no
+    new file is submitted until a pending one completes. A bundle holds every
+    action of its file, so files over SYNC_BUNDLE_MAX_BYTES are not parsed in
+    the pool; a writer streams them in bounded batches like the sequential
+    sync. Once `cancel` is set no new files are dispatched; files already
+    parsed are still written.
+    """
     results = []
+    bundles: Queue = Queue(maxsize=workers * 2)
     
-    pattern = os.path.join(SESSION_PATH, "*.jsonl")
-    files = glob.glob(pattern)
+    def writer():
+        while True:
+            bundle = bundles.get()
+            if bundle is None:
+                return
+            if bundle["status"] == "grown":
+                result = sync_session_tail(bundle["filepath"], bundle["instance"])
+            elif bundle["status"] == "large":
+                result = parse_session_file(bundle["filepath"], force=True, instance=bundle["instance"])
+            else:
+                result = write_session_bundle(bundle)
+            _report(result)
+            on_result(result)
+            results.append(result)
     
-    print(f"Found {len(files)} session files in {SESSION_PATH}")
+    threads = [threading.Thread(target=writer, daemon=True) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
     
-    for filepath in sorted(files):
-        result = parse_session_file(filepath, force=force)
-        results.append(result)
-        
-        status = result.get("status")
-        if status == "synced":
-            print(f"  ✓ {result['session_id'][:8]}... ({result['actions']} actions, {result['tool_calls']} tool calls)")
-        elif status == "skipped":
-            reason = result.get("reason", "unknown")
-            if reason != "already_synced":
-                print(f"  - {result['session_id'][:8]}... (skipped: {reason})")
-        else:
-            print(f"  ✗ {result['session_id'][:8]}... (error: {result.get('reason')})")
+    executor_cls = ProcessPoolExecutor if pool == "process" else ThreadPoolExecutor
+    pending = set()
+    
+    def drain(return_when):
+        done, still_pending = wait(pending, return_when=return_when)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"session_id": "unknown", "status": "error", "reason": str(e)}
+            if result["status"] == "parsed":
+                bundles.put(result)
+            else:
+                _report(result)
+                on_result(result)
+                results.append(result)
+        return still_pending
+    
+    with executor_cls(max_workers=workers) as executor:
+        for instance, filepath in files:
+            if cancel is not None and cancel.is_set():
+                break
+            skip = _skip_reason(filepath, instance)
+            if not skip and not force:
+                try:
+                    state = _file_state(filepath, instance)
+                except OSError as e:
+                    skip = {"session_id": session_id_for(filepath, instance), "status": "error", "reason": str(e)}
+                else:
+                    if state == "unchanged":
+                        skip = {"session_id": session_id_for(filepath, instance), "status": "skipped",
+                                "reason": "unchanged"}
+                    elif state == "grown":
+                        # Appends are cheap to read; let a writer tail them directly
+                        bundles.put({"status": "grown", "filepath": filepath, "instance": instance})
+                        continue
+            if skip:
+                _report(skip)
+                on_result(skip)
+                results.append(skip)
+                continue
+            try:
+                large = os.path.getsize(filepath) > SYNC_BUNDLE_MAX_BYTES
+            except OSError:
+                large = False  # build_session_bundle reports the error
+            if large:
+                bundles.put({"status": "large", "filepath": filepath, "instance": instance})
+                continue
+            pending.add(executor.submit(build_session_bundle, filepath, instance))
+            if len(pending) >= workers * 2:
+                pending = drain(FIRST_COMPLETED)
+        if pending:
+            drain(ALL_COMPLETED)
+    
+    for _ in threads:
+        bundles.put(None)
+    for thread in threads:
+        thread.join()
+    
+    return results
+
+
+def _interleave(roots: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """(instance, filepath) for every session file under `roots`, taking one file from each root in turn."""
+    per_root = []
+    for instance, path in roots:
+        files = sorted(glob.glob(os.path.join(path, "*.jsonl")))
+        print(f"Found {len(files)} session files in {path}" + (f" ({instance})" if instance else ""))
+        per_root.append([(instance, filepath) for filepath in files])
+    return [item for batch in zip_longest(*per_root) for item in batch if item is not None]
+
+
+def sync_all_sessions(force: bool = False, workers: int = SYNC_WORKERS,
+                      writers: int = SYNC_WRITERS, pool: str = SYNC_POOL,
+                      path: Optional[str] = None,
+                      roots: Optional[list[tuple[str, str]]] = None,
+                      on_start: Optional[Callable[[int], None]] = None,
+                      on_result: Optional[Callable[[dict], None]] = None,
+                      cancel: Optional[threading.Event] = None) -> list[dict]:
+    """Sync all session files under `roots` (default SESSION_ROOTS), or in a single `path`.
+
+    Files from several roots are interleaved, so one instance with a large
+    backlog does not hold back the others. With `workers` > 1, files are
+    parsed in a process (or thread) pool and written by `writers` threads;
+    otherwise files are streamed one by one. `on_start` gets the number of
+    files found and `on_result` each file's result (from writer threads, in
+    the parallel sync). Setting `cancel` stops the sync before the next file.
+    """
+    files = _interleave([("", path)] if path else roots or SESSION_ROOTS)
+    on_result = on_result or (lambda result: None)
     
+    if on_start:
+        on_start(len(files))
+    started = time.monotonic()
+    
+    if workers > 1:
+        results = _sync_parallel(files, force, workers, max(writers, 1), pool, on_result, cancel)
+    else:
+        results = []
+        for instance, filepath in files:
+            if cancel is not None and cancel.is_set():
+                break
+            result = sync_session_file(filepath, force=force, instance=instance)
+            _report(result)
+            on_result(result)
+            results.append(result)
+    cancelled = len(results) < len(files)
+    if cancelled:
+        print(f"Sync cancelled after {len(results)} of {len(files)} files")
+    
+    elapsed = max(time.monotonic() - started, 1e-6)
     synced = [r for r in results if r["status"] == "synced"]
-    print(f"\nSynced {len(synced)} new sessions")
+    appended = [r for r in results if r["status"] == "appended"]
+    actions = sum(r["actions"] for r in synced + appended)
+    if not cancelled:
+        record_sync_run(len(files), actions, elapsed)
+    print(f"\nSynced {len(synced)} new sessions, appended to {len(appended)}")
+    print(f"{len(files)} files in {elapsed:.1f}s "
+          f"({len(files) / elapsed:.1f} files/s, {actions / elapsed:.1f} actions/s)")
     
     return results
 
 
-def watch_and_sync():
-    """Watch for new session files and sync them."""
+def start_watcher(roots: Optional[list[tuple[str, str]]] = None):
+    """Start watching the session roots (default SESSION_ROOTS); returns (observer, event queue).
+
+    Each root gets its own watch, whose callbacks only enqueue the path
+    tagged with the root's instance. One SyncEventQueue coalesces bursts of
+    events per file and syncs them on its own worker thread, taking the
+    instances in turn; a root whose events it had to drop is rescanned.
+    Roots that are not directories are skipped with a warning.
+    """
     from watchdog.observers import Observer
     from watchdog.events import FileSystemEventHandler
     
+    roots = roots or SESSION_ROOTS
+    paths = dict(roots)
+    queue = SyncEventQueue(sync_session_tail,
+                           rescan=lambda instance: sorted(glob.glob(os.path.join(paths[instance], "*.jsonl"))))
+    
     class SessionHandler(FileSystemEventHandler):
+        def __init__(self, instance: str):
+            super().__init__()
+            self.instance = instance
+        
         def on_modified(self, event):
             if event.src_path.endswith(".jsonl") and not event.src_path.endswith(".lock"):
-                print(f"Session modified: {event.src_path}")
-                result = parse_session_file(event.src_path, force=True)
-                print(f"  Sync result: {result['status']}")
+                queue.put(event.src_path, self.instance)
         
         def on_created(self, event):
             if event.src_path.endswith(".jsonl") and not event.src_path.endswith(".lock"):
                 print(f"New session: {event.src_path}")
-                result = parse_session_file(event.src_path)
-                print(f"  Sync result: {result['status']}")
+                queue.put(event.src_path, self.instance)
     
+    queue.start()
+    watch_queue(queue)
     observer = Observer()
-    observer.schedule(SessionHandler(), SESSION_PATH, recursive=False)
+    for instance, path in roots:
+        if not os.path.isdir(path):
+            print(f"Not watching {path}: no such directory" + (f" ({instance})" if instance else ""))
+            continue
+        observer.schedule(SessionHandler(instance), path, recursive=False)
+        print(f"Watching {path} for changes..." + (f" ({instance})" if instance else ""))
     observer.start()
     
-    print(f"Watching {SESSION_PATH} for changes...")
+    return observer, queue
+
+
+def watch_and_sync():
+    """Watch for new session files and sync them."""
+    observer, queue = start_watcher()
     
     try:
-        import time
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
     
     observer.join()
+    queue.stop()
 
 
 if __name__ == "__main__":
+    import argparse
     import sys
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--watch":
-        # Initial sync then watch
-        sync_all_sessions()
+    parser = argparse.ArgumentParser(description="Sync Clawdbot session logs to Neo4j")
+    parser.add_argument("--watch", action="store_true", help="keep watching for changes after the initial sync")
+    parser.add_argument("--force", action="store_true", help="re-sync sessions that already exist")
+    parser.add_argument("--workers", type=int, default=SYNC_WORKERS, help="parser pool size (1 = sequential)")
+    parser.add_argument("--writers", type=int, default=SYNC_WRITERS, help="writer threads for the parallel sync")
+    parser.add_argument("--pool", choices=["process", "thread"], default=SYNC_POOL, help="parser pool type")
+    parser.add_argument("--reconcile-stats", action="store_true",
+                        help="recompute the /api/stats counters, Tool nodes, usage and activity rollups and exit")
+    args = parser.parse_args()
+    
+    if args.reconcile_stats:
+        get_client().reconcile_tools()
+        get_client().reconcile_usage()
+        get_client().reconcile_agents()
+        get_client().reconcile_activity()
+        print(f"Reconciled stats: {get_client().reconcile_stats()}")
+        sys.exit(0)
+    
+    sync_all_sessions(force=args.force, workers=args.workers, writers=args.writers, pool=args.pool)
+    if args.watch:
         watch_and_sync()
-    elif len(sys.argv) > 1 and sys.argv[1] == "--force":
-        sync_all_sessions(force=True)
-    else:
-        sync_all_sessions()
@@ -39,18 +39,63 @@ const API = {
         return this.fetch(`/api/sessions?limit=${limit}`);
     },
 
-    async getSession(sessionId) {
-        return this.fetch(`/api/session/${sessionId}`);
+    async getSession(sessionId, { cursor = null, types = null, limit = 50 } = {}) {
+        const params = new URLSearchParams({ limit });
+        if (cursor) params.set('cursor', cursor);
+        if (types) params.set('types', types);
+        return this.fetch(`/api/session/${sessionId}?${params}`);
     },
 
     async getGraph(limit = 100) {
-        return this.fetch(`/api/graph?limit=${limit}`);
+        return this.fromColumnar(await this.fetch(`/api/graph?limit=${limit}&format=columnar`));
+    },
+
+    async getGraphDelta(since) {
+        return this.fromColumnar(await this.fetch(`/api/graph/delta?since=${since}&format=columnar`));
+    },
+
+    // Expand a columnar graph payload back into node and edge objects
+    fromColumnar(data) {
+        const { nodes: cols, edges: ecols, strings, refs, ...rest } = data;
+        const str = i => (i === null || i === undefined ? null : strings[i]);
+        const interned = ['type', 'label', 'action_type', 'channel', 'model'];
+        const nodes = cols.id.map((id, i) => {
+            const node = {};
+            Object.keys(cols).forEach(field => {
+                const value = interned.includes(field) ? str(cols[field][i]) : cols[field][i];
+                if (value !== null) node[field] = value;
+            });
+            return node;
+        });
+        const endpoint = i => (i >= 0 ? cols.id[i] : refs[-i - 1]);
+        const edges = ecols.source.map((source, i) => ({
+            source: endpoint(source),
+            target: endpoint(ecols.target[i]),
+            type: str(ecols.type[i])
+        }));
+        delete rest.format;
+        return { ...rest, nodes, edges };
     },
 
     async getTools() {
         return this.fetch('/api/tools');
     },
 
+    async getActivity(resolution = 'hour', from = null) {
+        const params = new URLSearchParams({ resolution });
+        if (from) params.set('from', from);
+        return this.fetch(`/api/activity?${params}`);
+    },
+
+    // Server-Sent Events stream of ingest events; EventSource reconnects on its own
+    subscribe(onEvent) {
+        const source = new EventSource(`${this.baseUrl}/api/events`);
+        ['session', 'actions', 'reset', 'resync'].forEach(type => {
+            source.addEventListener(type, e => onEvent(type, JSON.parse(e.data)));
+        });
+        return source;
+    },
+
     async triggerSync(force = false) {
         return this.fetch(`/api/sync?force=${force}`, { method: 'POST' });
     }
@@ -4,6 +4,9 @@
 
 // State
 let refreshInterval = null;
+let liveEvents = null;
+let liveRefreshTimer = null;
+let liveResync = false;
 
 // Initialize dashboard
 document.addEventListener('DOMContentLoaded', async () => {
@@ -13,7 +16,8 @@ document.addEventListener('DOMContentLoaded', async () => {
     await Promise.all([
         loadStats(),
         loadSessions(),
-        loadTools()
+        loadTools(),
+        loadActivity()
     ]);
     
     // Initialize graph
@@ -27,13 +31,39 @@ document.addEventListener('DOMContentLoaded', async () => {
     // Set up event listeners
     setupEventListeners();
     
-    // Auto-refresh every 30 seconds
+    // Live updates pushed by the server as sessions are ingested
+    if (window.EventSource) {
+        liveEvents = API.subscribe(onIngestEvent);
+    }
+
+    // Fallback polling every 30 seconds while the event stream is down
     refreshInterval = setInterval(() => {
+        if (liveEvents && liveEvents.readyState === EventSource.OPEN) return;
         loadStats();
         loadSessions();
+        GraphViz.poll();
     }, 30000);
 });
 
+// Coalesce bursts of ingest events into one refresh
+function onIngestEvent(type, event) {
+    if (type === 'reset' || type === 'resync') liveResync = true;
+    if (liveRefreshTimer) return;
+    liveRefreshTimer = setTimeout(() => {
+        liveRefreshTimer = null;
+        loadStats();
+        loadSessions();
+        loadTools();
+        loadActivity();
+        if (liveResync) {
+            liveResync = false;
+            GraphViz.refresh();
+        } else {
+            GraphViz.poll();
+        }
+    }, 250);
+}
+
 function setupEventListeners() {
     // Graph controls
     document.getElementById('show-actions')?.addEventListener('change', updateGraphFilters);
@@ -131,8 +161,36 @@ async function loadTools() {
     }
 }
 
-// Show session details modal
-async function showSession(sessionId) {
+// Load the last 24 hours of actions per hour as a bar chart
+async function loadActivity() {
+    const container = document.getElementById('activity-chart');
+    
+    try {
+        const data = await API.getActivity('hour', Date.now() - 24 * 3600000);
+        const hourly = data.buckets.filter(b => b.resolution === data.resolution);
+        const counts = new Map(hourly.map(b => [b.bucket, b.count]));
+        const bars = [];
+        for (let t = data.from; t < data.to; t += 3600000) {
+            bars.push({ t, count: counts.get(t) || 0 });
+        }
+        const max = Math.max(1, ...bars.map(b => b.count));
+        
+        container.innerHTML = bars.map(b => `
+            <div class="activity-bar" style="height: ${Math.round(100 * b.count / max)}%"
+                 title="${new Date(b.t).toLocaleString()}: ${b.count} actions"></div>
+        `).join('');
+        
+    } catch (error) {
+        console.error('Failed to load activity:', error);
+        container.innerHTML = '<div class="loading">Failed to load activity</div>';
+    }
+}
+
+// Show session details modal; actions are loaded a page at a time
+const ACTION_TYPES = ['tool_call', 'tool_result', 'user_message', 'completion', 'model_change', 'thinking_change'];
+let modalSession = null;
+
+async function showSession(sessionId, types = '') {
     const modal = document.getElementById('session-modal');
     const title = document.getElementById('modal-title');
     const body = document.getElementById('modal-body');
@@ -140,47 +198,33 @@ async function showSession(sessionId) {
     modal.classList.remove('hidden');
     title.textContent = 'Loading...';
     body.innerHTML = '<div class="loading">Loading session details...</div>';
+    modalSession = { id: sessionId, types, cursor: null };
     
     try {
-        const data = await API.getSession(sessionId);
+        const data = await API.getSession(sessionId, { types });
         
         const session = data.session;
         title.textContent = session.label || `Session ${sessionId.substring(0, 8)}...`;
         
-        // Build timeline
-        const actions = data.actions || [];
+        const typeOptions = ['', ...ACTION_TYPES].map(t =>
+            `<option value="${t}" ${t === types ? 'selected' : ''}>${t || 'All actions'}</option>`
+        ).join('');
         
-        let html = `
+        body.innerHTML = `
             <div class="session-meta">
                 <p><strong>ID:</strong> ${session.id}</p>
                 <p><strong>Started:</strong> ${formatTime(session.started_at)}</p>
                 ${session.model ? `<p><strong>Model:</strong> ${session.model}</p>` : ''}
                 ${session.channel ? `<p><strong>Channel:</strong> ${session.channel}</p>` : ''}
-                <p><strong>Actions:</strong> ${actions.length}</p>
+                <p><strong>Actions:</strong> ${session.action_count ?? data.actions.length}</p>
+                ${data.summary ? summaryHtml(data.summary) : ''}
             </div>
             <h3 style="margin: 20px 0 10px;">Action Timeline</h3>
-            <div class="timeline">
+            <select id="timeline-filter" class="timeline-filter" onchange="showSession('${session.id}', this.value)">${typeOptions}</select>
+            <div id="timeline" class="timeline"></div>
+            <button id="timeline-more" class="sync-btn timeline-more" onclick="loadMoreActions()">Load more</button>
         `;
-        
-        for (const action of actions.slice(0, 50)) {
-            const typeClass = action.type === 'tool_call' ? 'tool-call' : 
-                             action.type === 'user_message' ? 'user-message' : '';
-            
-            html += `
-                <div class="timeline-item ${typeClass}">
-                    <div class="timeline-time">${formatTime(action.timestamp)}</div>
-                    <div class="timeline-type">${action.type}${action.name ? ': ' + action.name : ''}</div>
-                    ${action.details ? `<div class="timeline-details">${escapeHtml(String(action.details).substring(0, 100))}</div>` : ''}
-                </div>
-            `;
-        }
-        
-        if (actions.length > 50) {
-            html += `<div class="timeline-item"><em>... and ${actions.length - 50} more actions</em></div>`;
-        }
-        
-        html += '</div>';
-        body.innerHTML = html;
+        appendActions(data);
         
     } catch (error) {
         console.error('Failed to load session:', error);
@@ -188,6 +232,58 @@ async function showSession(sessionId) {
     }
 }
 
+// Compacted sessions keep only a summary of their older actions
+function summaryHtml(summary) {
+    const tools = Object.entries(summary.tools).sort((a, b) => b[1] - a[1]).slice(0, 5)
+        .map(([name, count]) => `${escapeHtml(name)} ${count}×`).join(', ');
+    return `
+        <p><strong>Compacted:</strong> ${summary.action_count} actions
+            (${formatTime(summary.first_at)} – ${formatTime(summary.last_at)})</p>
+        <p><strong>Usage:</strong> ${summary.tokens} tokens, $${summary.cost.toFixed(4)}</p>
+        ${tools ? `<p><strong>Top tools:</strong> ${tools}</p>` : ''}
+    `;
+}
+
+async function loadMoreActions() {
+    if (!modalSession || !modalSession.cursor) return;
+    const btn = document.getElementById('timeline-more');
+    btn.disabled = true;
+    try {
+        const { id, types, cursor } = modalSession;
+        const data = await API.getSession(id, { cursor, types });
+        if (modalSession.id === id) appendActions(data);
+    } catch (error) {
+        console.error('Failed to load actions:', error);
+    } finally {
+        btn.disabled = false;
+    }
+}
+
+function appendActions(data) {
+    const timeline = document.getElementById('timeline');
+    const actions = data.actions || [];
+    
+    if (actions.length === 0 && !timeline.children.length) {
+        timeline.innerHTML = '<div class="timeline-item"><em>No actions</em></div>';
+    }
+    
+    timeline.insertAdjacentHTML('beforeend', actions.map(action => {
+        const typeClass = action.type === 'tool_call' ? 'tool-call' : 
+                         action.type === 'user_message' ? 'user-message' : '';
+        
+        return `
+            <div class="timeline-item ${typeClass}">
+                <div class="timeline-time">${formatTime(action.timestamp)}</div>
+                <div class="timeline-type">${action.type}${action.name ? ': ' + action.name : ''}</div>
+                ${action.details ? `<div class="timeline-details">${escapeHtml(String(action.details).substring(0, 100))}</div>` : ''}
+            </div>
+        `;
+    }).join(''));
+    
+    modalSession.cursor = data.next_cursor;
+    document.getElementById('timeline-more').style.display = data.next_cursor ? '' : 'none';
+}
+
 function closeModal() {
     document.getElementById('session-modal')?.classList.add('hidden');
 }
@@ -244,6 +340,7 @@ function refreshAll() {
     loadStats();
     loadSessions();
     loadTools();
+    loadActivity();
     GraphViz.refresh();
 }
 
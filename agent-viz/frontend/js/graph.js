@@ -4,7 +4,27 @@
  */
 let networkInstance = null;
 
+// Details are JSON; actions synced by older versions hold a Python dict repr
+function parseDetails(details) {
+    if (typeof details !== 'string') return details;
+    try {
+        return JSON.parse(details);
+    } catch (e) {
+        return JSON.parse(details.replace(/'/g, '"').replace(/\bTrue\b/g, 'true')
+            .replace(/\bFalse\b/g, 'false').replace(/\bNone\b/g, 'null'));
+    }
+}
+
 const GraphViz = {
+    // Graph currently on screen, keyed by node id / edge key
+    nodes: new Map(),
+    edges: new Map(),
+    // Ingest cursor of the data above, for /api/graph/delta
+    cursor: null,
+    visNodes: null,
+    visEdges: null,
+    edgePairs: [],
+
     init() {
         this.renderFromAPI();
     },
@@ -13,6 +33,44 @@ const GraphViz = {
         this.renderFromAPI();
     },
 
+    // Fetch only what was written since the last fetch and patch it in
+    async poll() {
+        if (this.cursor === null || !networkInstance) {
+            return this.renderFromAPI();
+        }
+        try {
+            const delta = await API.getGraphDelta(this.cursor);
+            if (delta.reset) {
+                return this.renderFromAPI();
+            }
+            this.cursor = delta.cursor;
+            if (delta.nodes.length === 0) return;
+
+            const edges = delta.edges.map(e => [this.edgeKey(e), e]);
+            // Actions of sessions that are not on screen are left out
+            const parentOf = new Map(edges.filter(([, e]) => e.type === 'CONTAINS')
+                .map(([, e]) => [e.target, e.source]));
+            const known = id => this.nodes.has(id) || delta.nodes.some(n => n.id === id && n.type !== 'Action');
+            delta.nodes.forEach(n => {
+                if (n.type !== 'Action' || known(parentOf.get(n.id))) this.nodes.set(n.id, n);
+            });
+            edges.forEach(([key, e]) => this.edges.set(key, e));
+
+            const display = this.buildDisplay();
+            this.edgePairs = display.edgePairs;
+            const edgeIds = new Set(display.edges.map(e => e.id));
+            this.visEdges.remove(this.visEdges.getIds().filter(id => !edgeIds.has(id)));
+            this.visNodes.update(display.nodes);
+            this.visEdges.update(display.edges);
+        } catch (error) {
+            console.error('Failed to apply graph delta:', error);
+        }
+    },
+
+    edgeKey(e) {
+        return `${e.type}:${e.source}->${e.target}`;
+    },
+
     updateQuery(showActions, showSessions) {
         this.renderFromAPI();
     },
@@ -27,6 +85,148 @@ const GraphViz = {
         `;
     },
 
+    // Turn the graph on screen into vis-network nodes and edges
+    buildDisplay() {
+        const data = { nodes: [...this.nodes.values()], edges: [...this.edges.values()] };
+
+        // Categorize edges
+        const hasSession = [];   // Agent -> Session
+        const followedBy = [];   // Action -> Action (temporal chain)
+        const contains = [];     // Session -> Action (all actions)
+        const spawned = [];      // Agent -> Agent
+
+        // Track which actions have an incoming FOLLOWED_BY
+        const hasIncomingFollow = new Set();
+
+        data.edges.forEach(e => {
+            if (e.type === 'HAS_SESSION') hasSession.push(e);
+            else if (e.type === 'FOLLOWED_BY') {
+                followedBy.push(e);
+                hasIncomingFollow.add(e.target);
+            }
+            else if (e.type === 'CONTAINS') contains.push(e);
+            else if (e.type === 'SPAWNED') spawned.push(e);
+        });
+
+        // Build display edges:
+        // 1. Agent -> Session (HAS_SESSION)
+        // 2. Session -> first action only (CONTAINS where target has no incoming FOLLOWED_BY)
+        // 3. Action -> Action (FOLLOWED_BY chains)
+        // 4. Agent -> Agent (SPAWNED)
+        const displayEdges = [
+            ...hasSession,
+            ...spawned,
+            ...followedBy,
+            ...contains.filter(e => !hasIncomingFollow.has(e.target))
+        ];
+
+        // BFS from agent roots to assign tree depth levels
+        const nodeSet = new Set(data.nodes.map(n => n.id));
+        const childrenOf = {};
+        displayEdges.forEach(e => {
+            if (nodeSet.has(e.source) && nodeSet.has(e.target)) {
+                if (!childrenOf[e.source]) childrenOf[e.source] = [];
+                childrenOf[e.source].push(e.target);
+            }
+        });
+
+        const levelMap = {};
+        const roots = data.nodes.filter(n => n.type === 'Agent').map(n => n.id);
+        const queue = roots.map(id => ({ id, level: 0 }));
+        const visited = new Set();
+
+        while (queue.length > 0) {
+            const { id, level } = queue.shift();
+            if (visited.has(id)) continue;
+            visited.add(id);
+            levelMap[id] = level;
+            (childrenOf[id] || []).forEach(childId => {
+                if (!visited.has(childId)) {
+                    queue.push({ id: childId, level: level + 1 });
+                }
+            });
+        }
+
+        // Fallback for unvisited nodes
+        data.nodes.forEach(n => {
+            if (!(n.id in levelMap)) {
+                if (n.type === 'Agent') levelMap[n.id] = 0;
+                else if (n.type === 'Session') levelMap[n.id] = 1;
+                else levelMap[n.id] = 2;
+            }
+        });
+
+        // Build rich labels with metadata
+        function buildLabel(n) {
+            if (n.type === 'Agent') return n.label || n.id;
+            if (n.type === 'Session') {
+                let label = (n.label || n.id).substring(0, 40);
+                if (n.model) label += '\n' + n.model;
+                if (n.channel) label += ' · ' + n.channel;
+                return label;
+            }
+            // Action nodes
+            let lines = [];
+            const name = n.label || n.action_type || n.id;
+            const atype = n.action_type || '';
+            lines.push(atype !== name ? `${atype}: ${name}` : name);
+            if (n.details) {
+                try {
+                    const parsed = parseDetails(n.details);
+                    if (parsed.tool) lines[0] = parsed.tool;
+                    if (parsed.args_preview) {
+                        const args = parsed.args_preview.substring(0, 60);
+                        lines.push(args);
+                    }
+                } catch(e) {
+                    const detail = String(n.details).substring(0, 60);
+                    if (detail && detail !== '{}') lines.push(detail);
+                }
+            }
+            if (n.timestamp) {
+                const t = new Date(n.timestamp);
+                lines.push(t.toLocaleTimeString());
+            }
+            return lines.join('\n');
+        }
+
+        const nodes = data.nodes.map(n => ({
+            id: n.id,
+            label: buildLabel(n),
+            level: levelMap[n.id],
+            color: n.type === 'Agent' ? '#e94560' :
+                   n.type === 'Session' ? '#0fbcf9' : '#ffffff',
+            shape: n.type === 'Agent' ? 'dot' :
+                   n.type === 'Session' ? 'diamond' : 'dot',
+            size: n.type === 'Agent' ? 28 : n.type === 'Session' ? 16 : 6,
+            font: {
+                color: '#ffffff',
+                size: n.type === 'Action' ? 11 : 12,
+                face: 'Satoshi, sans-serif',
+                multi: 'text',
+                align: 'center'
+            }
+        }));
+
+        // Store edge pairs for the flowing animation
+        const edgePairs = displayEdges
+            .filter(e => nodeSet.has(e.source) && nodeSet.has(e.target))
+            .map(e => ({ id: this.edgeKey(e), from: e.source, to: e.target }));
+
+        const edges = edgePairs.map(e => ({
+            id: e.id,
+            from: e.from,
+            to: e.to,
+            arrows: { to: { enabled: true, scaleFactor: 0.3 } },
+            color: { color: 'rgba(255,255,255,0.7)' },
+            width: 1,
+            dashes: [4, 4],
+            smooth: { type: 'continuous' }
+        }));
+
+        return { nodes, edges, edgePairs };
+    },
+
     async renderFromAPI() {
         const container = document.getElementById('graph-container');
 
@@ -34,6 +234,11 @@ const GraphViz = {
             const data = await API.getGraph(150);
 
             if (!data.nodes || data.nodes.length === 0) {
+                if (networkInstance) {
+                    networkInstance.destroy();
+                    networkInstance = null;
+                }
+                this.cursor = data.cursor ?? null;
                 this.showFallback();
                 return;
             }
@@ -48,152 +253,20 @@ const GraphViz = {
                 });
             }
 
-            // Categorize edges
-            const hasSession = [];   // Agent -> Session
-            const followedBy = [];   // Action -> Action (temporal chain)
-            const contains = [];     // Session -> Action (all actions)
-            const spawned = [];      // Agent -> Agent
-
-            // Track which actions have an incoming FOLLOWED_BY
-            const hasIncomingFollow = new Set();
-
-            data.edges.forEach(e => {
-                if (e.type === 'HAS_SESSION') hasSession.push(e);
-                else if (e.type === 'FOLLOWED_BY') {
-                    followedBy.push(e);
-                    hasIncomingFollow.add(e.target);
-                }
-                else if (e.type === 'CONTAINS') contains.push(e);
-                else if (e.type === 'SPAWNED') spawned.push(e);
-            });
-
-            // Build display edges:
-            // 1. Agent -> Session (HAS_SESSION)
-            // 2. Session -> first action only (CONTAINS where target has no incoming FOLLOWED_BY)
-            // 3. Action -> Action (FOLLOWED_BY chains)
-            // 4. Agent -> Agent (SPAWNED)
-            const displayEdges = [
-                ...hasSession,
-                ...spawned,
-                ...followedBy,
-                ...contains.filter(e => !hasIncomingFollow.has(e.target))
-            ];
+            this.nodes = new Map(data.nodes.map(n => [n.id, n]));
+            this.edges = new Map(data.edges.map(e => [this.edgeKey(e), e]));
+            this.cursor = data.cursor;
 
-            // BFS from agent roots to assign tree depth levels
-            const nodeSet = new Set(data.nodes.map(n => n.id));
-            const childrenOf = {};
-            displayEdges.forEach(e => {
-                if (nodeSet.has(e.source) && nodeSet.has(e.target)) {
-                    if (!childrenOf[e.source]) childrenOf[e.source] = [];
-                    childrenOf[e.source].push(e.target);
-                }
-            });
-
-            const levelMap = {};
-            const roots = data.nodes.filter(n => n.type === 'Agent').map(n => n.id);
-            const queue = roots.map(id => ({ id, level: 0 }));
-            const visited = new Set();
-
-            while (queue.length > 0) {
-                const { id, level } = queue.shift();
-                if (visited.has(id)) continue;
-                visited.add(id);
-                levelMap[id] = level;
-                (childrenOf[id] || []).forEach(childId => {
-                    if (!visited.has(childId)) {
-                        queue.push({ id: childId, level: level + 1 });
-                    }
-                });
-            }
-
-            // Fallback for unvisited nodes
-            data.nodes.forEach(n => {
-                if (!(n.id in levelMap)) {
-                    if (n.type === 'Agent') levelMap[n.id] = 0;
-                    else if (n.type === 'Session') levelMap[n.id] = 1;
-                    else levelMap[n.id] = 2;
-                }
-            });
-
-            // Build rich labels with metadata
-            function buildLabel(n) {
-                if (n.type === 'Agent') return n.label || n.id;
-                if (n.type === 'Session') {
-                    let label = (n.label || n.id).substring(0, 40);
-                    if (n.model) label += '\n' + n.model;
-                    if (n.channel) label += ' · ' + n.channel;
-                    return label;
-                }
-                // Action nodes
-                let lines = [];
-                const name = n.label || n.action_type || n.id;
-                const atype = n.action_type || '';
-                lines.push(atype !== name ? `${atype}: ${name}` : name);
-                if (n.details) {
-                    try {
-                        const d = typeof n.details === 'string' ?
-                            n.details.replace(/'/g, '"') : n.details;
-                        const parsed = JSON.parse(d);
-                        if (parsed.tool) lines[0] = parsed.tool;
-                        if (parsed.args_preview) {
-                            const args = parsed.args_preview.substring(0, 60);
-                            lines.push(args);
-                        }
-                    } catch(e) {
-                        const detail = String(n.details).substring(0, 60);
-                        if (detail && detail !== '{}') lines.push(detail);
-                    }
-                }
-                if (n.timestamp) {
-                    const t = new Date(n.timestamp);
-                    lines.push(t.toLocaleTimeString());
-                }
-                return lines.join('\n');
-            }
-
-            const nodes = new vis.DataSet(
-                data.nodes.map(n => ({
-                    id: n.id,
-                    label: buildLabel(n),
-                    level: levelMap[n.id],
-                    color: n.type === 'Agent' ? '#e94560' :
-                           n.type === 'Session' ? '#0fbcf9' : '#ffffff',
-                    shape: n.type === 'Agent' ? 'dot' :
-                           n.type === 'Session' ? 'diamond' : 'dot',
-                    size: n.type === 'Agent' ? 28 : n.type === 'Session' ? 16 : 6,
-                    font: {
-                        color: '#ffffff',
-                        size: n.type === 'Action' ? 11 : 12,
-                        face: 'Satoshi, sans-serif',
-                        multi: 'text',
-                        align: 'center'
-                    }
-                }))
-            );
-
-            // Store edge pairs for the flowing animation
-            const edgePairs = displayEdges
-                .filter(e => nodeSet.has(e.source) && nodeSet.has(e.target))
-                .map(e => ({ from: e.source, to: e.target }));
-
-            const edges = new vis.DataSet(
-                edgePairs.map((e, i) => ({
-                    id: 'e' + i,
-                    from: e.from,
-                    to: e.to,
-                    arrows: { to: { enabled: true, scaleFactor: 0.3 } },
-                    color: { color: 'rgba(255,255,255,0.7)' },
-                    width: 1,
-                    dashes: [4, 4],
-                    smooth: { type: 'continuous' }
-                }))
-            );
+            const display = this.buildDisplay();
+            this.edgePairs = display.edgePairs;
+            this.visNodes = new vis.DataSet(display.nodes);
+            this.visEdges = new vis.DataSet(display.edges);
 
             if (networkInstance) {
                 networkInstance.destroy();
             }
 
-            networkInstance = new vis.Network(container, { nodes, edges }, {
+            networkInstance = new vis.Network(container, { nodes: this.visNodes, edges: this.visEdges }, {
                 layout: {
                     hierarchical: {
                         direction: 'UD',
@@ -226,12 +299,13 @@ const GraphViz = {
                 [40, 180, 0.04, 10],     // trailing fade 3
             ];
 
+            const self = this;
             networkInstance.on('afterDrawing', function(ctx) {
                 const positions = networkInstance.getPositions();
                 ctx.save();
                 ctx.lineCap = 'round';
 
-                edgePairs.forEach(e => {
+                self.edgePairs.forEach(e => {
                     const from = positions[e.from];
                     const to = positions[e.to];
                     if (!from || !to) return;